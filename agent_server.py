@@ -5,10 +5,31 @@ from quart_cors import cors
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
-from quart import Quart, request, jsonify
+from quart import Quart, Response, request, jsonify
 from datetime import datetime
 import argparse
 from injective_functions.factory import InjectiveClientFactory
+from injective_functions.utils.gas_estimator import default_gas_estimator
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.agent_registry import AgentRegistry
+from injective_functions.utils.height_tracker import get_height_tracker
+from injective_functions.utils.denom_registry import get_denom_registry
+from injective_functions.utils.market_registry import get_market_registry
+from injective_functions.utils.http_client import http_client, register_quart
+from injective_functions.utils.metadata_snapshot import warm_start
+from injective_functions.utils.price_provider import get_price_provider
+from injective_functions.utils.orderbook_service import get_orderbook_service
+from injective_functions.utils.order_tracker import order_tracker_stats
+from injective_functions.utils.tob_cache import get_tob_cache
+from injective_functions.utils.helpers import impute_market_ids
+from injective_functions.utils.market_registry import DERIVATIVE
+from injective_functions.utils.trade_history import (
+    DERIVATIVE_TRADE_FIELDS,
+    SPOT_TRADE_FIELDS,
+    csv_lines,
+    iter_trades,
+    ndjson_lines,
+)
 from injective_functions.utils.function_helper import (
     FunctionSchemaLoader,
     FunctionExecutor,
@@ -17,17 +38,19 @@ import json
 import asyncio
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
-import aiohttp
 
 # Initialize Quart app (async version of Flask)
 app = Quart(__name__)
 app = cors(app, allow_origin="*")  
+register_quart(app)
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 DATABASE_URL = os.getenv("DATABASE_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
+# seconds to collect concurrent messages of an agent into one tx, unset disables batching
+TX_BATCH_WINDOW = float(os.getenv("TX_BATCH_WINDOW", "0")) or None
 
 if not ENVIRONMENT:
             raise ValueError(
@@ -59,8 +82,8 @@ class InjectiveChatAgent:
 
         # Initialize conversation histories
         self.conversations = {}
-        # Initialize injective agents
-        self.agents = {}
+        # Initialize injective agents, bounded so idle agents are released
+        self.agents = AgentRegistry()
         #schema_paths = [
         #    "./injective_functions/account/account_schema.json",
         #    "./injective_functions/auction/auction_schema.json",
@@ -77,27 +100,36 @@ class InjectiveChatAgent:
         self, agent_id: str, private_key: str, environment: str = "mainnet"
     ) -> None:
         """Initialize Injective clients if they don't exist"""
-        if agent_id not in self.agents:
-            clients = await InjectiveClientFactory.create_all(
-                private_key=private_key, network_type=environment
-            )
-            self.agents[agent_id] = clients
+        # keyed by network too, and concurrent cold starts share one build
+        await self.agents.get_or_create(
+            (agent_id, environment),
+            lambda: InjectiveClientFactory.create_all(
+                private_key=private_key,
+                network_type=environment,
+                batch_window=TX_BATCH_WINDOW,
+            ),
+        )
 
     async def execute_function(
-        self, function_name: str, arguments: dict, agent_id: str
+        self,
+        function_name: str,
+        arguments: dict,
+        agent_id: str,
+        environment: str = "mainnet",
     ) -> dict:
         """Execute the appropriate Injective function with error handling"""
         try:
-            # Get the client dictionary for this agent
-            clients = self.agents.get(agent_id)
-            if not clients:
-                return {
-                    "error": "Agent not initialized. Please provide valid credentials."
-                }
+            # Get the client dictionary for this agent, leased so that an
+            # eviction meanwhile does not close it under this call
+            async with self.agents.lease((agent_id, environment)) as clients:
+                if not clients:
+                    return {
+                        "error": "Agent not initialized. Please provide valid credentials."
+                    }
 
-            return await FunctionExecutor.execute_function(
-                clients=clients, function_name=function_name, arguments=arguments
-            )
+                return await FunctionExecutor.execute_function(
+                    clients=clients, function_name=function_name, arguments=arguments
+                )
 
         except Exception as e:
             return {
@@ -306,6 +338,75 @@ async def ping():
         {"status": "ok", "timestamp": datetime.now().isoformat(), "version": "1.0.0"}
     )
 
+@app.before_serving
+async def warm_metadata():
+    """Serve market and denom metadata from the on-disk snapshot while it refreshes"""
+    print(f"Metadata warm start: {await warm_start(ENVIRONMENT)}")
+
+@app.route("/stats", methods=["GET"])
+async def stats():
+    """Runtime statistics of the shared caches and estimators"""
+    return jsonify(
+        {
+            "gas": default_gas_estimator.stats(),
+            "client_pool": get_client_pool(ENVIRONMENT).stats(),
+            "agents": agent.agents.stats(),
+            "block_height": get_height_tracker(ENVIRONMENT).stats(),
+            "denoms": get_denom_registry(ENVIRONMENT).stats(),
+            "markets": get_market_registry(ENVIRONMENT).stats(),
+            "http": http_client.stats(),
+            "prices": get_price_provider().stats(),
+            "orderbooks": get_orderbook_service(ENVIRONMENT).stats(),
+            "top_of_book": get_tob_cache(ENVIRONMENT).stats(),
+            "orders": order_tracker_stats(),
+        }
+    )
+
+@app.route("/trades/export", methods=["GET"])
+async def export_trades():
+    """
+    Stream historical trades, newest first, as NDJSON or CSV.
+
+    Query parameters: market_ids (comma separated ids or tickers), market_type
+    ("spot" or "derivative"), subaccount_id, account_address, start_time and
+    end_time (milliseconds), limit and format ("ndjson" or "csv").
+    """
+    args = request.args
+    export_format = args.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    market_type = args.get("market_type", "spot")
+    try:
+        start_time = args.get("start_time", type=int)
+        end_time = args.get("end_time", type=int)
+        limit = args.get("limit", type=int)
+        market_ids = await impute_market_ids(
+            [m for m in args.get("market_ids", "").split(",") if m] or None,
+            ENVIRONMENT,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    client = get_client_pool(ENVIRONMENT).get_client()
+    derivative = market_type == DERIVATIVE
+    trades = iter_trades(
+        client.fetch_derivative_trades if derivative else client.fetch_spot_trades,
+        market_ids=market_ids,
+        subaccount_ids=[args["subaccount_id"]] if args.get("subaccount_id") else None,
+        account_address=args.get("account_address"),
+        start_time=start_time,
+        end_time=end_time,
+        limit=limit,
+    )
+    if export_format == "csv":
+        body = csv_lines(trades, DERIVATIVE_TRADE_FIELDS if derivative else SPOT_TRADE_FIELDS)
+        response = Response(body, mimetype="text/csv")
+    else:
+        response = Response(ndjson_lines(trades), mimetype="application/x-ndjson")
+    # exports of deep history outlast the default response timeout
+    response.timeout = None
+    return response
+
 @app.route("/transfer_funds", methods=["POST"])
 async def transfer_funds():
     """transfer funds"""
@@ -320,6 +421,8 @@ async def transfer_funds():
     amount = data.get("amount")
     recipient_address = data.get("recipient")
     denom = data.get("denom")
+    # fire-and-forget by default, set to wait until the tx is in a block
+    wait_for_inclusion = bool(data.get("wait_for_inclusion", False))
 
     agent_id = user_id
     environment = ENVIRONMENT
@@ -356,13 +459,15 @@ async def transfer_funds():
         "to_address": f"{recipient_address}",
         "amount": f"{amount}",
         "denom": f"{denom}",
+        "wait_for_inclusion": wait_for_inclusion,
     }
     
     # Execute the query_balances function
     result = await agent.execute_function(
         function_name="transfer_funds",
         arguments=arguments,
-        agent_id=agent_id
+        agent_id=agent_id,
+        environment=environment,
     )
     
     # Print the result
@@ -370,6 +475,7 @@ async def transfer_funds():
         print("Error:", result["error"])
     else:
         print("Balances:", result)
+    return jsonify(result)
 
 @app.route("/chat", methods=["POST"])
 async def chat_endpoint():
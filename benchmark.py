@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import re
+import time
+from collections import Counter
+from decimal import Decimal
+from types import SimpleNamespace
+
+from pyinjective.proto.cosmos.bank.v1beta1 import tx_pb2 as bank_tx_pb
+from pyinjective.proto.cosmos.base.v1beta1 import coin_pb2 as coin_pb
+from injective_functions.utils.amounts import AmountFormatter
+from injective_functions.utils.initializers import ChainInteractor
+from injective_functions.utils.gas_estimator import GasEstimator
+from injective_functions.utils.height_tracker import BlockHeightTracker
+from injective_functions.utils.indexer_requests import normalize_ticker
+from injective_functions.utils.market_registry import MarketRegistry
+from injective_functions.utils.ticker_resolver import TickerResolver
+from injective_functions.utils.tx_tracker import TxConfirmationTracker
+
+# throwaway key, the fake client never talks to a node
+BENCH_PRIVATE_KEY = "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656"
+BENCH_RECIPIENT = "inj140zjcqg4pxyne9hvhgxrgnkn7mmwvu0y6d5qlq"
+
+
+class FakeComposer:
+    def coin(self, amount: int, denom: str) -> coin_pb.Coin:
+        return coin_pb.Coin(amount=str(int(amount)), denom=denom)
+
+
+class FakeAsyncClient:
+    """
+    Stands in for AsyncClient and counts every RPC it would have made.
+
+    Every latest block query produces a block with the txs broadcast since
+    the previous one, so the confirmation tracker's lookups are counted too.
+    """
+
+    def __init__(self, mismatch_every: int = 0):
+        self.calls = Counter()
+        self.timeout_height = 1
+        self.chain_sequence = 0
+        self.mismatch_every = mismatch_every
+        self.broadcasts = 0
+        self.height = 1000
+        self.blocks = {}
+        self.mempool = []
+        # tx hash -> height of the block including it
+        self.included = {}
+
+    def _block(self, height: int):
+        return {"block": {"header": {"height": str(height)}, "data": {"txs": self.blocks.get(height, [])}}}
+
+    async def fetch_latest_block(self):
+        self.calls["fetch_latest_block"] += 1
+        self.height += 1
+        self.blocks[self.height] = [base64.b64encode(tx).decode() for tx in self.mempool]
+        for tx in self.mempool:
+            self.included[hashlib.sha256(tx).hexdigest().upper()] = self.height
+        self.mempool = []
+        return self._block(self.height)
+
+    async def fetch_block_by_height(self, height: int):
+        self.calls["fetch_block_by_height"] += 1
+        return self._block(height)
+
+    async def fetch_tx(self, hash: str):
+        self.calls["fetch_tx"] += 1
+        if hash not in self.included:
+            raise LookupError(f"tx {hash} not found")
+        return {
+            "txResponse": {
+                "txhash": hash,
+                "height": str(self.included[hash]),
+                "code": 0,
+                "gasUsed": "95000",
+            }
+        }
+
+    async def fetch_account(self, address: str):
+        self.calls["fetch_account"] += 1
+        return SimpleNamespace(
+            base_account=SimpleNamespace(
+                account_number=7, sequence=self.chain_sequence
+            )
+        )
+
+    async def simulate(self, tx_bytes: bytes):
+        self.calls["simulate"] += 1
+        return {"gasInfo": {"gasUsed": "95000"}}
+
+    async def broadcast_tx_sync_mode(self, tx_bytes: bytes):
+        self.calls["broadcast_tx_sync_mode"] += 1
+        self.broadcasts += 1
+        if self.mismatch_every and self.broadcasts % self.mismatch_every == 0:
+            # somebody else used the account, our local sequence is stale
+            self.chain_sequence += 1
+            return {"txResponse": {"code": 32, "rawLog": "account sequence mismatch"}}
+        self.chain_sequence += 1
+        self.mempool.append(tx_bytes)
+        return {"txResponse": {"code": 0, "txhash": hashlib.sha256(tx_bytes).hexdigest().upper()}}
+
+
+def bench_msg() -> bank_tx_pb.MsgSend:
+    return bank_tx_pb.MsgSend(
+        from_address=BENCH_RECIPIENT,
+        to_address=BENCH_RECIPIENT,
+        amount=[coin_pb.Coin(amount="1", denom="inj")],
+    )
+
+
+def fake_interactor(
+    fake_client: FakeAsyncClient, batch_window: float = None
+) -> ChainInteractor:
+    interactor = ChainInteractor(
+        network_type="testnet",
+        private_key=BENCH_PRIVATE_KEY,
+        batch_window=batch_window,
+        # every run learns gas from scratch
+        gas_estimator=GasEstimator(),
+    )
+    interactor.client = fake_client
+    interactor.composer = FakeComposer()
+    interactor.height_tracker = BlockHeightTracker(fake_client)
+    # inclusion is tracked as in production, polling faster than real blocks
+    interactor.confirmation_tracker = TxConfirmationTracker(
+        fake_client, poll_interval=0.005, gas_estimator=interactor.gas_estimator
+    )
+    return interactor
+
+
+async def drain(interactor: ChainInteractor) -> None:
+    """Wait until every broadcast tx was confirmed so the tracker's RPCs are counted"""
+    while interactor.confirmation_tracker.pending_count:
+        await asyncio.sleep(0.005)
+    await interactor.confirmation_tracker.close()
+    await interactor.height_tracker.close()
+
+
+def report(name: str, calls: Counter, txs: int, elapsed: float) -> None:
+    """Print the RPCs per tx, including the confirmation tracker's inclusion lookups"""
+    total = sum(calls.values())
+    print(f"{name}: {txs} txs in {elapsed * 1000:.1f} ms")
+    print(f"  rpcs per tx: {total / txs:.2f}")
+    for rpc, count in sorted(calls.items()):
+        print(f"    {rpc}: {count}")
+
+
+async def bench_session(txs: int, mismatch_every: int) -> None:
+    """Compare RPCs per tx of a fresh init per tx against the persistent session"""
+    # legacy path: every tx re-syncs the timeout height and the account
+    fake_client = FakeAsyncClient(mismatch_every)
+    interactor = fake_interactor(fake_client)
+    start = time.perf_counter()
+    for _ in range(txs):
+        await interactor.height_tracker.refresh()
+        await interactor.init_client()
+        await interactor.build_and_broadcast_tx(bench_msg())
+    elapsed = time.perf_counter() - start
+    await drain(interactor)
+    report("init per tx", fake_client.calls, txs, elapsed)
+
+    fake_client = FakeAsyncClient(mismatch_every)
+    interactor = fake_interactor(fake_client)
+    start = time.perf_counter()
+    for _ in range(txs):
+        await interactor.build_and_broadcast_tx(bench_msg())
+    elapsed = time.perf_counter() - start
+    await drain(interactor)
+    report("persistent session", fake_client.calls, txs, elapsed)
+    print(f"  gas estimator: {interactor.gas_estimator.stats()}")
+
+
+async def bench_batch(txs: int, window: float) -> None:
+    """Compare concurrent callers with and without micro-batching"""
+    fake_client = FakeAsyncClient()
+    interactor = fake_interactor(fake_client)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(interactor.build_and_broadcast_tx(bench_msg()) for _ in range(txs))
+    )
+    elapsed = time.perf_counter() - start
+    await drain(interactor)
+    report("unbatched", fake_client.calls, txs, elapsed)
+
+    fake_client = FakeAsyncClient()
+    interactor = fake_interactor(fake_client, batch_window=window)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(interactor.build_and_broadcast_tx(bench_msg()) for _ in range(txs))
+    )
+    elapsed = time.perf_counter() - start
+    await drain(interactor)
+    report("batched", fake_client.calls, txs, elapsed)
+    print(f"  batcher stats: {interactor.batcher.stats}")
+
+
+def legacy_normalize_ticker(ticker_symbol: str) -> str:
+    """normalize_ticker as it was before the ticker resolver, kept for comparison"""
+    market = ticker_symbol.lower().strip()
+    is_perp = bool(re.search(r"[/-]?perp(etual)?|futures?|swap", market, re.IGNORECASE))
+    if is_perp:
+        market = re.sub(r"[/-]?(perp(etual)?|futures?|swap)[/-]?", "", market, re.IGNORECASE)
+    if "/" in market:
+        parts = market.split("/")
+    elif "-" in market:
+        parts = market.split("-")
+    elif market.endswith("usdt"):
+        parts = [market[:-4], "usdt"]
+    elif market.endswith("inj"):
+        parts = [market[:-3], "inj"]
+    else:
+        parts = [market, "usdt"]
+    base = re.sub(r"[^a-zA-Z0-9]", "", parts[0]).upper()
+    quote = re.sub(r"[^a-zA-Z0-9]", "", parts[1]).upper() or "USDT"
+    if not re.match(r"^[A-Z0-9]{2,10}$", base):
+        raise ValueError(f"Invalid base currency format: {base}")
+    return f"{base}/{quote} PERP" if is_perp else f"{base}/{quote}"
+
+
+def bench_markets(count: int) -> MarketRegistry:
+    registry = MarketRegistry()
+    markets = []
+    for index in range(count):
+        base = f"TK{index:03d}"
+        markets.append(registry._entry({"ticker": f"{base}/USDT", "market_id": f"0x{2 * index:064x}"}, "spot"))
+        markets.append(
+            registry._entry({"ticker": f"{base}/USDT PERP", "market_id": f"0x{2 * index + 1:064x}"}, "derivative")
+        )
+    registry._apply(markets)
+    return registry
+
+
+def time_calls(name: str, fn, inputs, rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for ticker in inputs:
+            fn(ticker)
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {elapsed / (rounds * len(inputs)) * 1e6:.2f} us per call")
+
+
+def bench_ticker(markets: int, rounds: int) -> None:
+    """Compare the legacy regex normalization with the memoized parser and resolver"""
+    inputs = [
+        form.format(index)
+        for index in range(0, markets, max(markets // 25, 1))
+        for form in ("tk{:03d}", "TK{:03d}-USDT-PERP", "tk{:03d}usdt", "tk{:03d} perp", "tk{:03d}/usdt")
+    ]
+    resolver = TickerResolver(bench_markets(markets))
+    time_calls("legacy normalize_ticker", legacy_normalize_ticker, inputs, rounds)
+    time_calls("normalize_ticker", normalize_ticker, inputs, rounds)
+    time_calls("resolver exact", resolver.match, inputs, rounds)
+    misspelt = [ticker.replace("tk", "tj").replace("TK", "TJ") for ticker in inputs]
+    time_calls("resolver fuzzy", resolver.match, misspelt, rounds)
+    print(f"  resolver stats: {resolver.stats()}")
+
+
+def legacy_format_supply(supply, denoms):
+    """Amount conversion of query_total_supply before the amount formatter, kept for comparison"""
+    return {
+        token["denom"]: str(int(token["amount"]) / 10 ** int(denoms[token["denom"]]))
+        for token in supply
+        if token["denom"] in denoms
+    }
+
+
+def bench_supply(denoms: int, rounds: int) -> None:
+    """Compare per-token float conversion with the precomputed formatter over a total supply list"""
+    decimals = {f"factory/inj1bench/tk{index}": (6, 8, 18)[index % 3] for index in range(denoms)}
+    supply = [
+        {"denom": denom, "amount": str(123456789 * (index + 1) ** 3 + index)}
+        for index, denom in enumerate(decimals)
+    ]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        legacy = legacy_format_supply(supply, decimals)
+    legacy_elapsed = time.perf_counter() - start
+
+    # query_total_supply reuses the formatter until the denoms are refreshed
+    start = time.perf_counter()
+    formatter = AmountFormatter(decimals)
+    build_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        exact = formatter.format_coins(supply)
+    elapsed = time.perf_counter() - start
+
+    lossy = sum(
+        1
+        for denom, amount in exact.items()
+        if Decimal(legacy[denom]) != Decimal(amount)
+    )
+    print(f"legacy float conversion: {legacy_elapsed / rounds * 1e3:.2f} ms per supply list")
+    print(f"amount formatter: {elapsed / rounds * 1e3:.2f} ms per supply list")
+    print(f"  formatter build, once per denom refresh: {build_elapsed * 1e3:.2f} ms")
+    print(f"  legacy results differing from the exact amount: {lossy} of {len(exact)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against fake clients")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    session_parser = subparsers.add_parser("session", help="RPCs per transaction")
+    session_parser.add_argument("--txs", type=int, default=100)
+    session_parser.add_argument(
+        "--mismatch-every",
+        type=int,
+        default=0,
+        help="Inject a sequence mismatch every N broadcasts",
+    )
+
+    batch_parser = subparsers.add_parser("batch", help="Micro-batching of concurrent messages")
+    batch_parser.add_argument("--txs", type=int, default=100)
+    batch_parser.add_argument("--window", type=float, default=0.02)
+
+    ticker_parser = subparsers.add_parser("ticker", help="Ticker normalization and resolution")
+    ticker_parser.add_argument("--markets", type=int, default=200)
+    ticker_parser.add_argument("--rounds", type=int, default=200)
+
+    supply_parser = subparsers.add_parser("supply", help="Amount conversion of query_total_supply")
+    supply_parser.add_argument("--denoms", type=int, default=5000)
+    supply_parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.benchmark == "session":
+        asyncio.run(bench_session(args.txs, args.mismatch_every))
+    elif args.benchmark == "batch":
+        asyncio.run(bench_batch(args.txs, args.window))
+    elif args.benchmark == "ticker":
+        bench_ticker(args.markets, args.rounds)
+    elif args.benchmark == "supply":
+        bench_supply(args.denoms, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import asyncio
 from dotenv import load_dotenv
 from injective_functions.factory import InjectiveClientFactory
+from injective_functions.utils.agent_registry import AgentRegistry
 from injective_functions.utils.function_helper import (
     FunctionExecutor,
 )
@@ -14,30 +15,38 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "mainnet")
 
 class InjectiveChainClient:
     def __init__(self):
-        self.agents = {}
+        self.agents = AgentRegistry()
         self.bank_client = None
 
     async def initialize_agent(self, agent_id: str, private_key: str, environment: str = "mainnet") -> None:
         """Initialize Injective clients if they don't exist"""
-        if agent_id not in self.agents:
-            clients = await InjectiveClientFactory.create_all(
+        # keyed by network too, and concurrent cold starts share one build
+        await self.agents.get_or_create(
+            (agent_id, environment),
+            lambda: InjectiveClientFactory.create_all(
                 private_key=private_key, network_type=environment
-            )
-            self.agents[agent_id] = clients
+            ),
+        )
+
+    async def close(self) -> None:
+        await self.agents.clear()
 
-    async def execute_function(self, function_name: str, arguments: dict, agent_id: str) -> dict:
+    async def execute_function(
+        self, function_name: str, arguments: dict, agent_id: str, environment: str = "mainnet"
+    ) -> dict:
         """Execute the appropriate Injective function with error handling"""
         try:
-            # Get the client dictionary for this agent
-            clients = self.agents.get(agent_id)
-            if not clients:
-                return {
-                    "error": "Agent not initialized. Please provide valid credentials."
-                }
-
-            return await FunctionExecutor.execute_function(
-                clients=clients, function_name=function_name, arguments=arguments
-            )
+            # Get the client dictionary for this agent, leased so that an
+            # eviction meanwhile does not close it under this call
+            async with self.agents.lease((agent_id, environment)) as clients:
+                if not clients:
+                    return {
+                        "error": "Agent not initialized. Please provide valid credentials."
+                    }
+
+                return await FunctionExecutor.execute_function(
+                    clients=clients, function_name=function_name, arguments=arguments
+                )
         except Exception as e:
             return {
                 "error": str(e),
@@ -59,6 +68,11 @@ class InjectiveTransaction:
         await chain_client.initialize_agent(agent_id, private_key, ENVIRONMENT)
         return cls(agent_id, private_key, chain_client)
 
+    async def close(self):
+        """Drop the agent's clients when it is evicted from an agent registry"""
+        await self.chain_client.close()
+        self.private_key = None
+
     async def query_balances(self):
         arguments = {
             "denom_list": ["inj", "usdt", "eth"],
@@ -68,6 +82,7 @@ class InjectiveTransaction:
                 function_name="query_balances",
                 arguments=arguments,
                 agent_id=self.agent_id,
+                environment=ENVIRONMENT,
             )
             #print(result)
             return result
@@ -75,17 +90,19 @@ class InjectiveTransaction:
             print(f"Error fetching balance: {e}")
             return {"ok": False, "message": f"Error fetching balance: {e}"}
 
-    async def transfer_funds(self, recipient, amount):
+    async def transfer_funds(self, recipient, amount, wait_for_inclusion=False):
         arguments = {
             "to_address": f"{recipient}",
             "amount": f"{amount}",
             "denom": "INJ",
+            "wait_for_inclusion": wait_for_inclusion,
         }
         try:
             result = await self.chain_client.execute_function(
                 function_name="transfer_funds",
                 arguments=arguments,
                 agent_id=self.agent_id,
+                environment=ENVIRONMENT,
             )
             print(result)
             return result
@@ -13,7 +13,11 @@ import replicate
 import traceback
 from dotenv import load_dotenv
 import os
-import aiohttp
+from injective_functions.utils.http_client import (
+    get_http_session,
+    telegram_post_init,
+    telegram_post_shutdown,
+)
 
 # Load environment variables
 load_dotenv()
@@ -103,22 +107,22 @@ def start_bot():
             backend_url = f"{BASE_URL}/chat"  # Replace with your backend server's URL
             session_id = str(user_id)  # Using user_id as the session_id
 
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {SECRET_KEY}"  # Replace with your actual secret key
-                }
-                async with session.post(backend_url, json={
-                    "message": user_message,
-                    "session_id": session_id,
-                    "agent_id": "example-agent",  # Optional, if you need to pass it
-                    "agent_key": "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656",  # Optional, if you need to pass it
-                }, headers=headers) as response:
-                    if response.status == 200:
-                        # Get the response from your backend
-                        response_data = await response.json()
-                        ai_response = response_data.get("response", "No response from AI.")
-                    else:
-                        ai_response = "An error occurred while getting a response from the AI."
+            session = get_http_session()
+            headers = {
+                "Authorization": f"Bearer {SECRET_KEY}"  # Replace with your actual secret key
+            }
+            async with session.post(backend_url, json={
+                "message": user_message,
+                "session_id": session_id,
+                "agent_id": "example-agent",  # Optional, if you need to pass it
+                "agent_key": "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656",  # Optional, if you need to pass it
+            }, headers=headers) as response:
+                if response.status == 200:
+                    # Get the response from your backend
+                    response_data = await response.json()
+                    ai_response = response_data.get("response", "No response from AI.")
+                else:
+                    ai_response = "An error occurred while getting a response from the AI."
 
             # Log the raw AI response for debugging
             logger.info(f"Raw AI response: {ai_response}")
@@ -136,7 +140,13 @@ def start_bot():
     
 
     # Create Telegram bot application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(telegram_post_init)
+        .post_shutdown(telegram_post_shutdown)
+        .build()
+    )
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_query))
 
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from injective_functions.base import InjectiveBase
 from injective_functions.utils.helpers import get_bridge_fee, detailed_exception_info
+from injective_functions.utils.price_provider import StalePriceError
 from typing import Dict
 
 
@@ -51,8 +52,10 @@ class InjectiveAccounts(InjectiveBase):
         return await self.chain_client.build_and_broadcast_tx(msg)
 
     async def send_to_eth(self, denom: str, eth_dest: str, amount: str):
-
-        bridge_fee = get_bridge_fee()
+        try:
+            bridge_fee = await get_bridge_fee()
+        except StalePriceError as e:
+            return {"success": False, "error": detailed_exception_info(e)}
         # prepare tx msg
         msg = self.chain_client.composer.MsgSendToEth(
             sender=self.chain_client.address.to_acc_bech32(),
@@ -61,7 +64,7 @@ class InjectiveAccounts(InjectiveBase):
             amount=Decimal(amount),
             bridge_fee=bridge_fee,
         )
-        await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(msg)
 
     async def fetch_tx(self, tx_hash: str) -> Dict:
         try:
@@ -1,7 +1,7 @@
 from decimal import Decimal
 from injective_functions.base import InjectiveBase
 from typing import Dict, List
-from injective_functions.utils.indexer_requests import fetch_decimal_denoms
+from injective_functions.utils.amounts import get_amount_formatter
 from injective_functions.utils.helpers import detailed_exception_info
 
 
@@ -11,7 +11,11 @@ class InjectiveBank(InjectiveBase):
         super().__init__(chain_client)
 
     async def transfer_funds(
-        self, amount: Decimal, denom: str = None, to_address: str = None
+        self,
+        amount: Decimal,
+        denom: str = None,
+        to_address: str = None,
+        wait_for_inclusion: bool = False,
     ) -> Dict:
 
         msg = self.chain_client.composer.MsgSend(
@@ -20,7 +24,9 @@ class InjectiveBank(InjectiveBase):
             amount=float(amount),
             denom=denom,
         )
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
 
     """async def query_balances(self, denom_list: List[str] = None, client_address="") -> Dict:
         try:
@@ -96,9 +102,7 @@ class InjectiveBank(InjectiveBase):
     async def query_balances(self, denom_list: List[str] = None) -> Dict:
         try:
 
-            denoms: Dict[str, int] = await fetch_decimal_denoms(
-                self.chain_client.network_type
-            )
+            formatter = await get_amount_formatter(self.chain_client.network_type)
             bank_balances = await self.chain_client.client.fetch_bank_balances(
                 address=self.chain_client.address.to_acc_bech32()
             )
@@ -106,12 +110,7 @@ class InjectiveBank(InjectiveBase):
             print("Raw bank balances:", bank_balances)
 
             # hash the bank balances as a kv pair
-            human_readable_balances = {}
-            for token in bank_balances:
-                if token["denom"] in denoms:
-                    human_readable_balances[token["denom"]] = str(
-                        int(token["amount"]) / 10 ** int(denoms[token["denom"]])
-                    )
+            human_readable_balances = formatter.format_coins(bank_balances)
             # check if denom is an arg fron the openai func calling
             filtered_balances = dict()
             if denom_list != None:
@@ -131,23 +130,15 @@ class InjectiveBank(InjectiveBase):
 
     async def query_total_supply(self, denom_list: List[str] = None) -> Dict:
         try:
-            # we request this over and over again because new tokens can be added
-            denoms: Dict[str, int] = await fetch_decimal_denoms(
-                self.chain_client.network
-            )
+            # the formatter follows the denom registry, which picks up new tokens
+            formatter = await get_amount_formatter(self.chain_client.network_type)
             total_supply = await self.chain_client.client.fetch_total_supply()
             total_supply = total_supply["supply"]
-            human_readable_supply = {
-                token["denom"]: str(
-                    int(token["amount"]) / 10 ** int(denoms[token["denom"]])
-                )
-                for token in total_supply
-                if token["denom"] in denoms
-            }
+            human_readable_supply = formatter.format_coins(total_supply)
 
             # check if denom is an arg fron the openai func calling
             filtered_supply = dict()
-            if denom_list != 0:
+            if denom_list is not None:
                 # filter the balances
                 # TODO: replace with lambda func
                 for denom in denom_list:
@@ -1,14 +1,27 @@
+import asyncio
 from decimal import Decimal
 from injective_functions.base import InjectiveBase
-from injective_functions.utils.indexer_requests import fetch_decimal_denoms
+from injective_functions.utils.amounts import get_amount_formatter
 from injective_functions.utils.helpers import (
     impute_market_id,
     impute_market_ids,
     detailed_exception_info,
+    fan_out,
 )
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.order_tracker import (
+    OrderTrackerNotReady,
+    chain_order,
+    chain_subaccount_orders,
+    get_order_tracker,
+)
+from injective_functions.utils.orderbook_service import get_orderbook_service
+from injective_functions.utils.portfolio import portfolio_snapshot
+from injective_functions.utils.tob_cache import get_tob_cache
+from injective_functions.utils.trade_history import iter_trades
 from pyinjective.client.model.pagination import PaginationOption
 
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 
 class InjectiveExchange(InjectiveBase):
     def __init__(self, chain_client) -> None:
@@ -27,22 +40,20 @@ class InjectiveExchange(InjectiveBase):
                 )
             )
             deposits = deposits_response["deposits"]
-            denom_decimals = await fetch_decimal_denoms(self.chain_client.network_type)
+            formatter = await get_amount_formatter(self.chain_client.network_type)
             human_readable_deposits = {}
             # checks if the denoms are specified
             if denoms:
                 # iterate through the specified denoms
                 for denom in denoms:
                     # Corner case 1: denom might not be in deposits found in chain data a case when gpt function calling parses wrong args
-                    if denom in deposits and denom in denom_decimals:
+                    if denom in deposits and denom in formatter:
                         human_readable_deposits[denom] = {
-                            "available_balance": str(
-                                int(deposits[denom]["availableBalance"])
-                                / 10 ** int(denom_decimals[denom])
+                            "available_balance": formatter.to_human(
+                                denom, deposits[denom]["availableBalance"]
                             ),
-                            "total_balance": str(
-                                int(deposits[denom]["totalBalance"])
-                                / 10 ** int(denom_decimals[denom])
+                            "total_balance": formatter.to_human(
+                                denom, deposits[denom]["totalBalance"]
                             ),
                         }
                     else:
@@ -53,15 +64,14 @@ class InjectiveExchange(InjectiveBase):
             # Otherwise we iterate through all the denoms
             else:
                 for denom, deposit in deposits.items():
-                    if denom in denom_decimals:
+                    if denom in formatter:
                         human_readable_deposits[denom] = {}
-                        human_readable_deposits[denom]["available_balance"] = str(
-                            int(deposit["availableBalance"])
-                            / 10 ** denom_decimals[denom]
+                        human_readable_deposits[denom]["available_balance"] = formatter.to_human(
+                            denom, deposit["availableBalance"]
                         )
 
-                        human_readable_deposits[denom]["total_balance"] = str(
-                            int(deposit["totalBalance"]) / 10 ** denom_decimals[denom]
+                        human_readable_deposits[denom]["total_balance"] = formatter.to_human(
+                            denom, deposit["totalBalance"]
                         )
             return {"success": True, "result": human_readable_deposits}
         except Exception as e:
@@ -69,7 +79,9 @@ class InjectiveExchange(InjectiveBase):
 
     async def get_aggregate_market_volumes(self, market_ids=List[str]) -> Dict:
         try:
-            market_ids = await impute_market_ids(market_ids)
+            market_ids = await impute_market_ids(
+                market_ids, self.chain_client.network_type
+            )
             res = await self.chain_client.client.fetch_aggregate_market_volumes(
                 market_ids=market_ids
             )
@@ -81,7 +93,9 @@ class InjectiveExchange(InjectiveBase):
         self, market_ids: List[str], addresses: List[str]
     ) -> Dict:
         try:
-            market_ids = await impute_market_ids(market_ids)
+            market_ids = await impute_market_ids(
+                market_ids, self.chain_client.network_type
+            )
             res = await self.chain_client.client.fetch_aggregate_volumes(
                 accounts=addresses,
                 market_ids=market_ids,
@@ -92,13 +106,17 @@ class InjectiveExchange(InjectiveBase):
 
     async def get_subaccount_orders(self, subaccount_idx: int, market_id: str) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
-            orders = await self.chain_client.client.fetch_chain_subaccount_orders(
-                subaccount_id=subaccount_id,
-                market_id=market_id,
-            )
+            orders = await self._local_orders(subaccount_id, market_id)
+            if orders is None:
+                orders = await self.chain_client.client.fetch_chain_subaccount_orders(
+                    subaccount_id=subaccount_id,
+                    market_id=market_id,
+                )
             return {"success": True, "result": orders}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
@@ -106,7 +124,9 @@ class InjectiveExchange(InjectiveBase):
     async def get_historical_orders(self, market_id: str) -> Dict:
 
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             res = await self.chain_client.client.fetch_historical_trade_records(
                 market_id=market_id
@@ -115,23 +135,95 @@ class InjectiveExchange(InjectiveBase):
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
-    async def get_mid_price_and_tob_derivatives_market(self, market_id: str) -> Dict:
+    async def iter_historical_trades(
+        self,
+        market_ids: List[str] = None,
+        market_type: str = SPOT,
+        subaccount_idx: int = None,
+        start_time: int = None,
+        end_time: int = None,
+        limit: int = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Historical trades from newest to oldest, paged from the indexer as they are consumed.
+
+        Args:
+            market_ids (List[str], optional): Markets or tickers to list. Defaults to every market.
+            market_type (str, optional): "spot" or "derivative". Defaults to "spot".
+            subaccount_idx (int, optional): Only list this subaccount's trades. Defaults to every trader.
+            start_time (int, optional): Oldest trade to list, in milliseconds
+            end_time (int, optional): Newest trade to list, in milliseconds
+            limit (int, optional): Stop after this many trades. Defaults to no limit.
+        """
+        if market_ids:
+            market_ids = await impute_market_ids(
+                market_ids, self.chain_client.network_type
+            )
+        subaccount_ids = (
+            [self.chain_client.address.get_subaccount_id(subaccount_idx)]
+            if subaccount_idx is not None
+            else None
+        )
+        fetch = (
+            self.chain_client.client.fetch_derivative_trades
+            if market_type == DERIVATIVE
+            else self.chain_client.client.fetch_spot_trades
+        )
+        async for trade in iter_trades(
+            fetch,
+            market_ids=market_ids,
+            subaccount_ids=subaccount_ids,
+            start_time=start_time,
+            end_time=end_time,
+            limit=limit,
+        ):
+            yield trade
+
+    async def get_historical_trades(
+        self,
+        market_ids: List[str] = None,
+        market_type: str = SPOT,
+        subaccount_idx: int = None,
+        start_time: int = None,
+        end_time: int = None,
+        limit: int = 100,
+    ) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
+            trades = [
+                trade
+                async for trade in self.iter_historical_trades(
+                    market_ids, market_type, subaccount_idx, start_time, end_time, limit
+                )
+            ]
+            return {"success": True, "result": trades}
+        except Exception as e:
+            return {"success": False, "error": detailed_exception_info(e)}
 
-            res = await self.chain_client.client.fetch_derivative_mid_price_and_tob(
-                market_id=market_id,
+    async def get_mid_price_and_tob_derivatives_market(
+        self, market_id: str, max_age: float = None
+    ) -> Dict:
+        try:
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
+
+            res = await get_tob_cache(self.chain_client.network_type).get(
+                market_id, DERIVATIVE, max_age
             )
             return {"success": True, "result": res}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
-    async def get_mid_price_and_tob_spot_market(self, market_id: str) -> Dict:
+    async def get_mid_price_and_tob_spot_market(
+        self, market_id: str, max_age: float = None
+    ) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
-            res = await self.chain_client.client.fetch_spot_mid_price_and_tob(
-                market_id=market_id,
+            res = await get_tob_cache(self.chain_client.network_type).get(
+                market_id, SPOT, max_age
             )
             return {"success": True, "result": res}
         except Exception as e:
@@ -141,53 +233,123 @@ class InjectiveExchange(InjectiveBase):
         self, market_id: str, limit: int = None
     ) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
-            pagination = PaginationOption(limit)
-            orderbook = await self.chain_client.client.fetch_chain_derivative_orderbook(
-                market_id=market_id,
-                pagination=pagination,
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
             )
+            orderbook = await self._local_orderbook(market_id, DERIVATIVE, limit)
+            if orderbook is None:
+                orderbook = await self.chain_client.client.fetch_chain_derivative_orderbook(
+                    market_id=market_id,
+                    pagination=PaginationOption(limit),
+                )
             return {"success": True, "result": orderbook}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
     async def get_spot_orderbook(self, market_id: str, limit: int = None) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
-            pagination = PaginationOption(limit)
-            orderbook = await self.chain_client.client.fetch_chain_spot_orderbook(
-                market_id=market_id,
-                pagination=pagination,
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
             )
+            orderbook = await self._local_orderbook(market_id, SPOT, limit)
+            if orderbook is None:
+                orderbook = await self.chain_client.client.fetch_chain_spot_orderbook(
+                    market_id=market_id,
+                    pagination=PaginationOption(limit),
+                )
             return {"success": True, "result": orderbook}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
+    async def _local_orderbook(self, market_id: str, market_type: str, limit: int = None):
+        """Orderbook from the shared replica in the chain query's shape, or None while it is not loaded"""
+        try:
+            return await get_orderbook_service(
+                self.chain_client.network_type
+            ).get_orderbook(market_id, market_type, depth=limit)
+        except asyncio.TimeoutError:
+            return None
+
+    async def get_mid_price_and_tob_markets(
+        self,
+        market_ids: List[str],
+        market_type: str = SPOT,
+        max_age: float = None,
+        max_concurrency: int = None,
+    ) -> Dict:
+        """Mid price and top of book of many markets of one type in a single call"""
+        query = (
+            self.get_mid_price_and_tob_derivatives_market
+            if market_type == DERIVATIVE
+            else self.get_mid_price_and_tob_spot_market
+        )
+        return await fan_out(
+            market_ids, lambda market_id: query(market_id, max_age), max_concurrency
+        )
+
+    async def get_orderbooks(
+        self,
+        market_ids: List[str],
+        market_type: str = SPOT,
+        limit: int = None,
+        max_concurrency: int = None,
+    ) -> Dict:
+        """Orderbooks of many markets of one type in a single call"""
+        query = (
+            self.get_derivatives_orderbook
+            if market_type == DERIVATIVE
+            else self.get_spot_orderbook
+        )
+        return await fan_out(
+            market_ids, lambda market_id: query(market_id, limit), max_concurrency
+        )
+
+    async def get_subaccount_orders_in_markets(
+        self,
+        market_ids: List[str],
+        subaccount_idx: int = 0,
+        max_concurrency: int = None,
+    ) -> Dict:
+        """Orders of a subaccount across many markets in a single call"""
+        return await fan_out(
+            market_ids,
+            lambda market_id: self.get_subaccount_orders(subaccount_idx, market_id),
+            max_concurrency,
+        )
+
     async def trader_derivative_orders(self, market_id: str, subaccount_idx: int):
         try:
 
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
-            orders = (
-                await self.chain_client.client.fetch_chain_trader_derivative_orders(
-                    market_id=market_id,
-                    subaccount_id=subaccount_id,
+            orders = await self._local_orders(subaccount_id, market_id, DERIVATIVE)
+            if orders is None:
+                orders = (
+                    await self.chain_client.client.fetch_chain_trader_derivative_orders(
+                        market_id=market_id,
+                        subaccount_id=subaccount_id,
+                    )
                 )
-            )
             return {"success": True, "result": orders}
         except Exception as e:
             return {"success": False, "result": detailed_exception_info(e)}
 
     async def trader_spot_orders(self, market_id: str, subaccount_idx: int):
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
-            orders = await self.chain_client.client.fetch_chain_trader_spot_orders(
-                market_id=market_id,
-                subaccount_id=subaccount_id,
-            )
+            orders = await self._local_orders(subaccount_id, market_id, SPOT)
+            if orders is None:
+                orders = await self.chain_client.client.fetch_chain_trader_spot_orders(
+                    market_id=market_id,
+                    subaccount_id=subaccount_id,
+                )
             return {"success": True, "result": orders}
         except Exception as e:
             return {"success": False, "result": detailed_exception_info(e)}
@@ -196,16 +358,22 @@ class InjectiveExchange(InjectiveBase):
         self, market_id: str, subaccount_idx: int, order_hashes: List[str]
     ) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
-            orders = (
-                await self.chain_client.client.fetch_chain_derivative_orders_by_hashes(
-                    market_id=market_id,
-                    subaccount_id=subaccount_id,
-                    order_hashes=order_hashes,
-                )
+            orders = await self._local_orders(
+                subaccount_id, market_id, DERIVATIVE, order_hashes
             )
+            if orders is None:
+                orders = (
+                    await self.chain_client.client.fetch_chain_derivative_orders_by_hashes(
+                        market_id=market_id,
+                        subaccount_id=subaccount_id,
+                        order_hashes=order_hashes,
+                    )
+                )
             return {"success": True, "result": orders}
         except Exception as e:
             return {"success": False, "result": detailed_exception_info(e)}
@@ -214,39 +382,129 @@ class InjectiveExchange(InjectiveBase):
         self, market_id: str, subaccount_idx: int, order_hashes: List[str]
     ) -> Dict:
         try:
-            market_id = await impute_market_id(market_id)
+            market_id = await impute_market_id(
+                market_id, self.chain_client.network_type
+            )
 
             subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
-            orders = await self.chain_client.client.fetch_chain_spot_orders_by_hashes(
-                market_id=market_id,
-                subaccount_id=subaccount_id,
-                order_hashes=order_hashes,
-            )
+            orders = await self._local_orders(subaccount_id, market_id, SPOT, order_hashes)
+            if orders is None:
+                orders = await self.chain_client.client.fetch_chain_spot_orders_by_hashes(
+                    market_id=market_id,
+                    subaccount_id=subaccount_id,
+                    order_hashes=order_hashes,
+                )
             return {"success": True, "result": orders}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
-    async def get_subaccount_positions_in_markets(self, market_ids: List[str]) -> Dict:
+    async def _local_orders(
+        self,
+        subaccount_id: str,
+        market_id: str,
+        market_type: str = None,
+        order_hashes: List[str] = None,
+    ):
+        """
+        Open orders from the subaccount's order tracker in the shape of the chain
+        query they replace, or None while it is not synced.
+
+        Orders broadcast but not reported by the indexer yet are listed apart under
+        "submitted", as the chain would not return them either.
+        """
+        tracker = get_order_tracker(self.chain_client.network_type, subaccount_id)
         try:
-            market_ids = await impute_market_ids(market_ids)
+            if order_hashes is not None:
+                orders = await tracker.orders_by_hash(order_hashes, market_id)
+            else:
+                orders = await tracker.open_orders([market_id], market_type)
+        except OrderTrackerNotReady:
+            return None
+        submitted = tracker.submitted_orders([market_id], market_type)
+        if order_hashes is not None:
+            hashes = {order_hash.lower() for order_hash in order_hashes}
+            submitted = [
+                order
+                for order in submitted
+                if order["orderHash"] and order["orderHash"].lower() in hashes
+            ]
+        result = (
+            chain_subaccount_orders(orders)
+            if market_type is None
+            else {"orders": [chain_order(order) for order in orders]}
+        )
+        return {
+            **result,
+            "submitted": [chain_order(order) for order in submitted],
+            "source": "order_tracker",
+        }
+
+    async def get_subaccount_positions_in_markets(
+        self, market_ids: List[str] = None, subaccount_idx: int = 0
+    ) -> Dict:
+        try:
+            if market_ids:
+                market_ids = await impute_market_ids(
+                    market_ids, self.chain_client.network_type
+                )
 
-            subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_id)
-            positions = await self.chain_client.client.fetch_chain_subaccount_positions(
+            subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
+            res = await self.chain_client.client.fetch_chain_subaccount_positions(
                 subaccount_id=subaccount_id,
-            )["state"]
+            )
             position_map = {}
-            for position in positions:
-                position_map[position["market_id"]] = position["position"]
-
-            filtered_positions = dict()
-            if market_ids != None:
-                for market_id in market_ids:
-                    filtered_positions["market_id"] = position_map[market_id]
-                return {"success": True, "result": position_map}
+            for position in res.get("state", []):
+                position_map[position["marketId"].lower()] = position["position"]
+
+            if market_ids:
+                filtered_positions = {
+                    market_id: position_map[market_id]
+                    for market_id in market_ids
+                    if market_id in position_map
+                }
+                return {"success": True, "result": filtered_positions}
             return {"success": True, "result": position_map}
         except Exception as e:
             return {"success": False, "error": detailed_exception_info(e)}
 
+    async def get_portfolio_snapshot(
+        self,
+        market_ids: List[str] = None,
+        subaccount_idxs: List[int] = None,
+        max_concurrency: int = None,
+    ) -> Dict:
+        """
+        Derivative positions of the agent across its subaccounts and markets,
+        with unrealized PnL, margin and leverage per position, market, subaccount and overall.
+
+        Args:
+            market_ids (List[str], optional): Markets or tickers to include. Defaults to every market.
+            subaccount_idxs (List[int], optional): Subaccounts to include. Defaults to every subaccount
+                the indexer knows of, plus the default one.
+            max_concurrency (int, optional): Subaccount queries in flight. Defaults to FAN_OUT_CONCURRENCY.
+        """
+        try:
+            if market_ids:
+                market_ids = await impute_market_ids(
+                    market_ids, self.chain_client.network_type
+                )
+            address = self.chain_client.address
+            client = self.chain_client.client
+            if subaccount_idxs:
+                subaccount_ids = [address.get_subaccount_id(idx) for idx in subaccount_idxs]
+            else:
+                listed = await client.fetch_subaccounts_list(address.to_acc_bech32())
+                subaccount_ids = [address.get_subaccount_id(0)] + [
+                    subaccount_id.lower() for subaccount_id in listed.get("subaccounts", [])
+                ]
+            formatter = await get_amount_formatter(self.chain_client.network_type)
+            snapshot = await portfolio_snapshot(
+                client, subaccount_ids, formatter, market_ids, max_concurrency
+            )
+            return {"success": True, "result": snapshot}
+        except Exception as e:
+            return {"success": False, "error": detailed_exception_info(e)}
+
     async def launch_instant_spot_market(
         self,
         ticker: str,
@@ -257,7 +515,7 @@ class InjectiveExchange(InjectiveBase):
         min_notional: str,
     ) -> Dict:
         try:
-            await self.chain_client.init_client()
+            await self.chain_client.ensure_session()
             msg = self.chain_client.composer.msg_instant_spot_market_launch(
                 sender=self.chain_client.address.to_acc_bech32(),
                 ticker=ticker,
@@ -290,7 +548,7 @@ class InjectiveExchange(InjectiveBase):
     ) -> Dict:
         try:
 
-            await self.chain_client.init_client()
+            await self.chain_client.ensure_session()
             msg = self.chain_client.composer.msg_instant_perpetual_market_launch(
                 sender=self.chain_client.address.to_acc_bech32(),
                 ticker=ticker,
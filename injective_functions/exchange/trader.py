@@ -1,7 +1,24 @@
+import asyncio
 import uuid
 from decimal import Decimal
+from typing import Dict, List
+from google.protobuf.message import DecodeError
+from pyinjective.proto.cosmos.base.abci.v1beta1 import abci_pb2 as abci_pb
+from pyinjective.proto.injective.exchange.v1beta1 import tx_pb2 as exchange_tx_pb
 from injective_functions.base import InjectiveBase
-from injective_functions.utils.helpers import impute_market_id, base64convert
+from injective_functions.utils.helpers import (
+    impute_market_id,
+    impute_market_ids,
+    base64convert,
+)
+from injective_functions.utils.tx_batcher import is_accepted
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.order_tracker import (
+    fetch_open_orders,
+    get_order_tracker,
+    indexer_order,
+)
+from injective_functions.utils.tob_cache import get_tob_cache
 
 # TODO: serve endpoints of trader functions via an api
 # to isolate functions as much as possible
@@ -21,12 +38,23 @@ class InjectiveTrading(InjectiveBase):
         market_id: str,
         subaccount_idx: int,
         leverage: str,
+        wait_for_inclusion: bool = False,
     ):
         """Place a limit order"""
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
+        await self.chain_client.ensure_markets([market_id])
         self.subaccount_id = self.chain_client.address.get_subaccount_id(
             index=subaccount_idx
         )
+        cid = str(uuid.uuid4())
+        margin = self.chain_client.composer.calculate_margin(
+            quantity=Decimal(str(quantity)),
+            price=Decimal(str(price)),
+            leverage=Decimal(leverage),
+            is_reduce_only=False,
+        )
         msg = self.chain_client.composer.msg_create_derivative_limit_order(
             sender=self.chain_client.address.to_acc_bech32(),
             fee_recipient=self.chain_client.address.to_acc_bech32(),
@@ -34,17 +62,30 @@ class InjectiveTrading(InjectiveBase):
             subaccount_id=self.subaccount_id,
             price=Decimal(str(price)),
             quantity=Decimal(str(quantity)),
-            margin=self.chain_client.composer.calculate_margin(
-                quantity=Decimal(str(quantity)),
-                price=Decimal(str(price)),
-                leverage=Decimal(leverage),
-                is_reduce_only=False,
-            ),
+            margin=margin,
             order_type=side,
-            cid=str(uuid.uuid4()),
+            cid=cid,
         )
 
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        result = await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
+        self._record_submitted(
+            result,
+            self.subaccount_id,
+            [
+                {
+                    "market_type": DERIVATIVE,
+                    "market_id": market_id,
+                    "side": side,
+                    "price": price,
+                    "quantity": quantity,
+                    "margin": margin,
+                    "cid": cid,
+                }
+            ],
+        )
+        return result
 
     async def place_derivative_market_order(
         self,
@@ -53,18 +94,21 @@ class InjectiveTrading(InjectiveBase):
         market_id: str,
         subaccount_idx: int,
         leverage: str,
+        wait_for_inclusion: bool = False,
     ):
         """Place a market order"""
 
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
+        await self.chain_client.ensure_markets([market_id])
         self.subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
         # For market orders, we'll use the current price as an estimate
-        # this gets bbo and mid from composer.
-        estimated_price = (
-            await self.chain_client.client.fetch_derivative_mid_price_and_tob(
-                market_id=market_id
-            )["midPrice"]
+        # this reads bbo and mid from the shared top-of-book cache.
+        tob = await get_tob_cache(self.chain_client.network_type).get(
+            market_id, DERIVATIVE
         )
+        estimated_price = tob["midPrice"]
 
         msg = self.chain_client.composer.msg_create_derivative_market_order(
             sender=self.chain_client.address.to_acc_bech32(),
@@ -83,12 +127,20 @@ class InjectiveTrading(InjectiveBase):
             cid=str(uuid.uuid4()),
         )
 
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
 
     async def cancel_derivative_limit_order(
-        self, market_id: str, subaccount_idx: int, order_hash: str
+        self,
+        market_id: str,
+        subaccount_idx: int,
+        order_hash: str,
+        wait_for_inclusion: bool = False,
     ):
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
         converted_order_hash = base64convert(order_hash)
         subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
         msg = self.chain_client.composer.msg_cancel_derivative_order(
@@ -97,7 +149,9 @@ class InjectiveTrading(InjectiveBase):
             subaccount_id=subaccount_id,
             order_hash=converted_order_hash,
         )
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
 
     async def place_spot_limit_order(
         self,
@@ -106,13 +160,18 @@ class InjectiveTrading(InjectiveBase):
         side: str,
         market_id: str,
         subaccount_idx: int,
+        wait_for_inclusion: bool = False,
     ):
         """Place a limit order"""
 
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
+        await self.chain_client.ensure_markets([market_id])
         self.subaccount_id = self.chain_client.address.get_subaccount_id(
             index=subaccount_idx
         )
+        cid = str(uuid.uuid4())
         msg = self.chain_client.composer.msg_create_spot_limit_order(
             sender=self.chain_client.address.to_acc_bech32(),
             fee_recipient=self.chain_client.address.to_acc_bech32(),
@@ -121,25 +180,47 @@ class InjectiveTrading(InjectiveBase):
             price=Decimal(str(price)),
             quantity=Decimal(str(quantity)),
             order_type=side,
-            cid=str(uuid.uuid4()),
+            cid=cid,
         )
 
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        result = await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
+        self._record_submitted(
+            result,
+            self.subaccount_id,
+            [
+                {
+                    "market_type": SPOT,
+                    "market_id": market_id,
+                    "side": side,
+                    "price": price,
+                    "quantity": quantity,
+                    "cid": cid,
+                }
+            ],
+        )
+        return result
 
     async def place_spot_market_order(
-        self, quantity: float, side: str, market_id: str, subaccount_idx: int
+        self,
+        quantity: float,
+        side: str,
+        market_id: str,
+        subaccount_idx: int,
+        wait_for_inclusion: bool = False,
     ):
         """Place a market order"""
 
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
+        await self.chain_client.ensure_markets([market_id])
         self.subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
         # For market orders, we'll use the current price as an estimate
-        # this gets bbo and mid from composer.
-        estimated_price = (
-            await self.chain_client.client.fetch_derivative_mid_price_and_tob(
-                market_id=market_id
-            )["midPrice"]
-        )
+        # this reads bbo and mid from the shared top-of-book cache.
+        tob = await get_tob_cache(self.chain_client.network_type).get(market_id, SPOT)
+        estimated_price = tob["midPrice"]
 
         msg = self.chain_client.composer.msg_create_spot_market_order(
             sender=self.chain_client.address.to_acc_bech32(),
@@ -152,13 +233,21 @@ class InjectiveTrading(InjectiveBase):
             cid=str(uuid.uuid4()),
         )
 
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
 
     async def cancel_spot_limit_order(
-        self, market_id: str, subaccount_idx: int, order_hash: str
+        self,
+        market_id: str,
+        subaccount_idx: int,
+        order_hash: str,
+        wait_for_inclusion: bool = False,
     ):
         converted_order_hash = base64convert(order_hash)
-        market_id = await impute_market_id(market_id)
+        market_id = await impute_market_id(
+            market_id, self.chain_client.network_type
+        )
         subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
         msg = self.chain_client.composer.msg_cancel_spot_order(
             sender=self.chain_client.address.to_acc_bech32(),
@@ -166,4 +255,359 @@ class InjectiveTrading(InjectiveBase):
             subaccount_id=subaccount_id,
             order_hash=converted_order_hash,
         )
-        return await self.chain_client.build_and_broadcast_tx(msg)
+        return await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
+
+    async def batch_place_orders(
+        self,
+        orders: List[Dict],
+        subaccount_idx: int = 0,
+        wait_for_inclusion: bool = False,
+    ):
+        """Place many spot and derivative limit orders in one transaction"""
+        return await self.batch_update_orders(
+            subaccount_idx=subaccount_idx,
+            orders_to_create=orders,
+            wait_for_inclusion=wait_for_inclusion,
+        )
+
+    async def batch_cancel_orders(
+        self,
+        orders: List[Dict],
+        subaccount_idx: int = 0,
+        wait_for_inclusion: bool = False,
+    ):
+        """Cancel many spot and derivative orders by hash in one transaction"""
+        return await self.batch_update_orders(
+            subaccount_idx=subaccount_idx,
+            orders_to_cancel=orders,
+            wait_for_inclusion=wait_for_inclusion,
+        )
+
+    async def cancel_and_replace_orders(
+        self,
+        orders_to_cancel: List[Dict],
+        orders_to_create: List[Dict],
+        subaccount_idx: int = 0,
+        wait_for_inclusion: bool = False,
+    ):
+        """Cancel orders and place their replacements atomically in one transaction"""
+        return await self.batch_update_orders(
+            subaccount_idx=subaccount_idx,
+            orders_to_cancel=orders_to_cancel,
+            orders_to_create=orders_to_create,
+            wait_for_inclusion=wait_for_inclusion,
+        )
+
+    async def batch_update_orders(
+        self,
+        subaccount_idx: int = 0,
+        orders_to_create: List[Dict] = None,
+        orders_to_cancel: List[Dict] = None,
+        spot_market_ids_to_cancel_all: List[str] = None,
+        derivative_market_ids_to_cancel_all: List[str] = None,
+        wait_for_inclusion: bool = False,
+    ):
+        """
+        Create and cancel many orders with a single MsgBatchUpdateOrders.
+
+        Args:
+            subaccount_idx (int, optional): Subaccount of every order. Defaults to 0.
+            orders_to_create (List[Dict], optional): market_type ("spot" or "derivative"),
+                market_id, price, quantity, side and, for derivatives, leverage
+            orders_to_cancel (List[Dict], optional): market_type, market_id and order_hash
+            spot_market_ids_to_cancel_all (List[str], optional): Spot markets to cancel every order in
+            derivative_market_ids_to_cancel_all (List[str], optional): Derivative markets to cancel every order in
+            wait_for_inclusion (bool, optional): Wait for the block and report each order's outcome
+
+        Returns:
+            the broadcast result with "orders": per-order "created" and "cancelled" entries
+            in input order, whose status is "submitted" until the tx is included
+        """
+        orders_to_create = orders_to_create or []
+        orders_to_cancel = orders_to_cancel or []
+        spot_market_ids_to_cancel_all = spot_market_ids_to_cancel_all or []
+        derivative_market_ids_to_cancel_all = derivative_market_ids_to_cancel_all or []
+
+        # resolve every ticker of the batch against one market snapshot
+        market_ids = await impute_market_ids(
+            [order["market_id"] for order in orders_to_create + orders_to_cancel]
+            + spot_market_ids_to_cancel_all
+            + derivative_market_ids_to_cancel_all,
+            self.chain_client.network_type,
+        )
+        await self.chain_client.ensure_markets(market_ids)
+        market_ids = iter(market_ids)
+
+        composer = self.chain_client.composer
+        sender = self.chain_client.address.to_acc_bech32()
+        subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
+
+        spot_create, derivative_create, created = [], [], []
+        margins = {}
+        for index, order in enumerate(orders_to_create):
+            market_id = next(market_ids)
+            market_type = order.get("market_type", SPOT)
+            price = Decimal(str(order["price"]))
+            quantity = Decimal(str(order["quantity"]))
+            cid = str(uuid.uuid4())
+            if market_type == DERIVATIVE:
+                margins[cid] = composer.calculate_margin(
+                    quantity=quantity,
+                    price=price,
+                    leverage=Decimal(str(order.get("leverage", 1))),
+                    is_reduce_only=False,
+                )
+                derivative_create.append(
+                    composer.derivative_order(
+                        market_id=market_id,
+                        subaccount_id=subaccount_id,
+                        fee_recipient=sender,
+                        price=price,
+                        quantity=quantity,
+                        margin=margins[cid],
+                        order_type=order["side"],
+                        cid=cid,
+                    )
+                )
+            else:
+                spot_create.append(
+                    composer.spot_order(
+                        market_id=market_id,
+                        subaccount_id=subaccount_id,
+                        fee_recipient=sender,
+                        price=price,
+                        quantity=quantity,
+                        order_type=order["side"],
+                        cid=cid,
+                    )
+                )
+            created.append(
+                {
+                    "index": index,
+                    "market_type": market_type,
+                    "market_id": market_id,
+                    "side": order["side"],
+                    "price": str(price),
+                    "quantity": str(quantity),
+                    "cid": cid,
+                    "status": "submitted",
+                }
+            )
+
+        spot_cancel, derivative_cancel, cancelled = [], [], []
+        for index, order in enumerate(orders_to_cancel):
+            market_id = next(market_ids)
+            market_type = order.get("market_type", SPOT)
+            order_data = composer.order_data_without_mask(
+                market_id=market_id,
+                subaccount_id=subaccount_id,
+                order_hash=base64convert(order["order_hash"]),
+            )
+            if market_type == DERIVATIVE:
+                derivative_cancel.append(order_data)
+            else:
+                spot_cancel.append(order_data)
+            cancelled.append(
+                {
+                    "index": index,
+                    "market_type": market_type,
+                    "market_id": market_id,
+                    "order_hash": order["order_hash"],
+                    "status": "submitted",
+                }
+            )
+
+        spot_cancel_all = [next(market_ids) for _ in spot_market_ids_to_cancel_all]
+        derivative_cancel_all = [next(market_ids) for _ in derivative_market_ids_to_cancel_all]
+
+        msg = composer.msg_batch_update_orders(
+            sender=sender,
+            # only read by the chain for the cancel-all market lists
+            subaccount_id=subaccount_id if spot_cancel_all or derivative_cancel_all else None,
+            spot_market_ids_to_cancel_all=spot_cancel_all,
+            derivative_market_ids_to_cancel_all=derivative_cancel_all,
+            spot_orders_to_cancel=spot_cancel,
+            derivative_orders_to_cancel=derivative_cancel,
+            spot_orders_to_create=spot_create,
+            derivative_orders_to_create=derivative_create,
+        )
+        result = await self.chain_client.build_and_broadcast_tx(
+            msg, wait_for_inclusion=wait_for_inclusion
+        )
+        self._resolve_batch_orders(result, created, cancelled)
+        self._record_submitted(
+            result,
+            subaccount_id,
+            [
+                {**order, "margin": margins.get(order["cid"], 0)}
+                for order in created
+                if order["status"] in ("submitted", "created")
+            ],
+        )
+        return {**result, "orders": {"created": created, "cancelled": cancelled}}
+
+    def _record_submitted(self, result: Dict, subaccount_id: str, orders: List[Dict]):
+        """Hand limit orders accepted into the mempool to the subaccount's order tracker"""
+        if not orders or not is_accepted(result):
+            return
+        composer = self.chain_client.composer
+        markets = {
+            market_type: {market_id.lower(): market for market_id, market in by_id.items()}
+            for market_type, by_id in (
+                (SPOT, composer.spot_markets),
+                (DERIVATIVE, composer.derivative_markets),
+            )
+        }
+        tx_hash = result.get("result", {}).get("txResponse", {}).get("txhash", "")
+        get_order_tracker(self.chain_client.network_type, subaccount_id).record_submitted(
+            indexer_order(
+                markets[order["market_type"]][order["market_id"].lower()],
+                order["market_type"],
+                order,
+                subaccount_id,
+                fee_recipient=self.chain_client.address.to_acc_bech32(),
+                tx_hash=tx_hash,
+            )
+            for order in orders
+            # the streams still report orders of markets the composer could not load
+            if order["market_id"].lower() in markets[order["market_type"]]
+        )
+
+    @staticmethod
+    def _resolve_batch_orders(result: Dict, created: List[Dict], cancelled: List[Dict]):
+        """Fill each order's status in from the batch update response"""
+        if not is_accepted(result):
+            for order in created + cancelled:
+                order["status"] = "rejected"
+            return
+        inclusion = result.get("inclusion")
+        if not inclusion or not inclusion.get("included"):
+            return
+        if inclusion.get("code"):
+            for order in created + cancelled:
+                order["status"] = "failed"
+            return
+        response = decode_batch_update_response(
+            inclusion.get("data", ""), result.get("msg_index", 0)
+        )
+        if response is None:
+            return
+
+        for market_type, created_cids, failed_cids, hashes in (
+            (
+                SPOT,
+                response.created_spot_orders_cids,
+                response.failed_spot_orders_cids,
+                response.spot_order_hashes,
+            ),
+            (
+                DERIVATIVE,
+                response.created_derivative_orders_cids,
+                response.failed_derivative_orders_cids,
+                response.derivative_order_hashes,
+            ),
+        ):
+            hash_by_cid = (
+                dict(zip(created_cids, hashes))
+                if len(created_cids) == len(hashes)
+                else {}
+            )
+            for order in created:
+                if order["market_type"] != market_type:
+                    continue
+                if order["cid"] in created_cids:
+                    order["status"] = "created"
+                    order["order_hash"] = hash_by_cid.get(order["cid"])
+                elif order["cid"] in failed_cids:
+                    order["status"] = "failed"
+
+        for market_type, successes in (
+            (SPOT, list(response.spot_cancel_success)),
+            (DERIVATIVE, list(response.derivative_cancel_success)),
+        ):
+            orders = [order for order in cancelled if order["market_type"] == market_type]
+            if len(orders) == len(successes):
+                for order, success in zip(orders, successes):
+                    order["status"] = "cancelled" if success else "not_cancelled"
+
+    async def cancel_all_orders(
+        self,
+        market_ids: List[str] = None,
+        subaccount_idx: int = 0,
+        wait_for_inclusion: bool = True,
+    ):
+        """
+        Cancel every open order of a subaccount, in the given markets or in all of them,
+        with a single transaction.
+
+        The gas of a cancel-all grows with the orders on the book, so the tx is
+        always simulated, and by default the call waits for the block so that a
+        cancel-all failing there is reported rather than assumed done.
+
+        Args:
+            market_ids (List[str], optional): Markets or tickers to flatten. Defaults to every market.
+            subaccount_idx (int, optional): Subaccount to flatten. Defaults to 0.
+            wait_for_inclusion (bool, optional): Wait for the block before returning. Defaults to True.
+
+        Returns:
+            the broadcast result with "markets": the spot and derivative markets cancelled
+            and the number of open orders found in each. "success" is False if the
+            tx failed in the block.
+        """
+        if market_ids:
+            market_ids = await impute_market_ids(
+                market_ids, self.chain_client.network_type
+            )
+        subaccount_id = self.chain_client.address.get_subaccount_id(subaccount_idx)
+        client = self.chain_client.client
+
+        # discover both market types at once
+        spot_orders, derivative_orders = await asyncio.gather(
+            self._open_orders_by_market(client.fetch_spot_orders, subaccount_id, market_ids),
+            self._open_orders_by_market(client.fetch_derivative_orders, subaccount_id, market_ids),
+        )
+        markets = {SPOT: spot_orders, DERIVATIVE: derivative_orders}
+        if not spot_orders and not derivative_orders:
+            return {"success": True, "result": "No open orders to cancel", "markets": markets}
+
+        result = await self.batch_update_orders(
+            subaccount_idx=subaccount_idx,
+            spot_market_ids_to_cancel_all=list(spot_orders),
+            derivative_market_ids_to_cancel_all=list(derivative_orders),
+            wait_for_inclusion=wait_for_inclusion,
+        )
+        result.pop("orders", None)
+        inclusion = result.get("inclusion") or {}
+        if inclusion.get("included") and inclusion.get("code"):
+            result = {
+                **result,
+                "success": False,
+                "error": f"Cancel-all failed in block with code {inclusion['code']}: "
+                f"{inclusion.get('raw_log', '')}",
+            }
+        return {**result, "markets": markets}
+
+    @staticmethod
+    async def _open_orders_by_market(
+        fetch, subaccount_id: str, market_ids: List[str] = None, page_size: int = 100
+    ) -> Dict[str, int]:
+        """Number of open orders of a subaccount per market, across every page"""
+        counts: Dict[str, int] = {}
+        for order in await fetch_open_orders(fetch, subaccount_id, market_ids, page_size):
+            market_id = order["marketId"].lower()
+            counts[market_id] = counts.get(market_id, 0) + 1
+        return counts
+
+
+def decode_batch_update_response(data: str, msg_index: int = 0):
+    """MsgBatchUpdateOrdersResponse of a message from hex encoded TxMsgData, or None"""
+    try:
+        msg_responses = abci_pb.TxMsgData.FromString(bytes.fromhex(data)).msg_responses
+        response = exchange_tx_pb.MsgBatchUpdateOrdersResponse()
+        if not msg_responses[msg_index].Unpack(response):
+            return None
+        return response
+    except (ValueError, IndexError, DecodeError):
+        return None
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Any, Dict, List
 from injective_functions.utils.initializers import ChainInteractor
 from injective_functions.account import InjectiveAccounts
 from injective_functions.auction import InjectiveAuction
@@ -9,38 +9,97 @@ from injective_functions.exchange.trader import InjectiveTrading
 from injective_functions.staking import InjectiveStaking
 from injective_functions.token_factory import InjectiveTokenFactory
 
+# client type used in FUNCTION_MAP -> module class
+MODULE_CLASSES: Dict[str, type] = {
+    "account": InjectiveAccounts,
+    "auction": InjectiveAuction,
+    "authz": InjectiveAuthz,
+    "bank": InjectiveBank,
+    "exchange": InjectiveExchange,
+    "trader": InjectiveTrading,
+    "staking": InjectiveStaking,
+    "token_factory": InjectiveTokenFactory,
+}
+
+
+class LazyClients:
+    """
+    Client container of one agent that builds each Injective module the first
+    time a mapped function needs it.
+
+    It is a drop-in for the clients dict handed to FunctionExecutor.
+    """
+
+    def __init__(self, chain_client: ChainInteractor):
+        self.chain_client = chain_client
+        self._modules: Dict[str, Any] = {}
+
+    def get(self, client_type: str, default=None):
+        module = self._modules.get(client_type)
+        if module is None:
+            module_class = MODULE_CLASSES.get(client_type)
+            if module_class is None:
+                return default
+            module = self._modules[client_type] = module_class(self.chain_client)
+        return module
+
+    def __getitem__(self, client_type: str):
+        module = self.get(client_type)
+        if module is None:
+            raise KeyError(client_type)
+        return module
+
+    def __contains__(self, client_type: str) -> bool:
+        return client_type in MODULE_CLASSES
+
+    def keys(self):
+        return MODULE_CLASSES.keys()
+
+    def loaded_modules(self) -> List[str]:
+        """Client types that were actually built for this agent"""
+        return list(self._modules)
+
+    async def close(self) -> None:
+        """Release the agent's session when it leaves the agent registry"""
+        await self.chain_client.close()
+        self._modules.clear()
+
+    def __repr__(self) -> str:
+        return f"LazyClients(loaded={self.loaded_modules()})"
+
 
 class InjectiveClientFactory:
     """Factory for creating Injective client instances."""
 
     @staticmethod
-    async def create_all(private_key: str, network_type: str = "mainnet") -> Dict:
+    async def create_all(
+        private_key: str, network_type: str = "mainnet", batch_window: float = None
+    ) -> LazyClients:
         """
-        Create instances of all Injective modules sharing one ChainInteractor.
+        Create a lazy container of all Injective modules sharing one ChainInteractor.
+
+        The ChainInteractor only holds the agent's signing identity and account
+        state, its network clients come from the pool shared by all agents.
+        Modules are built on first use and the account is only fetched before
+        the first transaction.
 
         Args:
             private_key (str): Private key for blockchain interactions
             network_type (str, optional): Network type. Defaults to "mainnet".
+            batch_window (float, optional): Seconds to collect concurrent messages
+                into one transaction. Batching is disabled when not set.
 
         Returns:
-            Dict: Dictionary containing all initialized clients
+            LazyClients: Container building the modules on demand
         """
-        # Create and initialize the chain client
+        # Create and connect the chain client
         chain_client = ChainInteractor(
-            network_type=network_type, private_key=private_key
+            network_type=network_type,
+            private_key=private_key,
+            batch_window=batch_window,
         )
-        await chain_client.init_client()  # This line is crucial!
-
-        # Create instances with the initialized chain client
-        clients = {
-            "account": InjectiveAccounts(chain_client),
-            "auction": InjectiveAuction(chain_client),
-            "authz": InjectiveAuthz(chain_client),
-            "bank": InjectiveBank(chain_client),
-            "exchange": InjectiveExchange(chain_client),
-            "trader": InjectiveTrading(chain_client),
-            "staking": InjectiveStaking(chain_client),
-            "token_factory": InjectiveTokenFactory(chain_client),
-        }
+        await chain_client.connect()
+
+        clients = LazyClients(chain_client)
         print(clients)
         return clients
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+# Defaults for every registry, overridable per deployment
+DEFAULT_MAX_AGENTS = int(os.getenv("AGENT_REGISTRY_MAX_SIZE", "1000"))
+DEFAULT_IDLE_TTL = float(os.getenv("AGENT_REGISTRY_IDLE_TTL", "1800"))
+
+
+async def close_agent(agent: Any) -> None:
+    """Release whatever an evicted agent holds open"""
+    close = getattr(agent, "close", None)
+    if close is not None:
+        await close()
+
+
+class _Entry:
+    def __init__(self, agent: Any) -> None:
+        self.agent = agent
+        self.last_used = time.monotonic()
+        # calls currently using the agent
+        self.leases = 0
+        # dropped from the registry while leased, closed on the last release
+        self.retired = False
+
+
+class AgentRegistry:
+    """
+    Bounded store of initialized agents.
+
+    Entries are evicted least-recently-used first once max_size is reached,
+    and dropped after idle_ttl seconds without use. Evicted agents are closed
+    so their sessions and decrypted keys do not outlive the entry.
+
+    Callers using an agent hold a lease on it (acquire and release, or the
+    lease context manager). Leased agents never expire, are evicted only
+    when every agent is leased, and an evicted agent that is still leased
+    is closed when its last lease is released rather than under its users.
+
+    Concurrent get_or_create calls for the same key share one in-flight
+    initialization instead of each building their own agent.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_AGENTS,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        on_evict: Callable[[Any], Awaitable[None]] = close_agent,
+    ) -> None:
+        """
+        Args:
+            max_size (int, optional): Maximum number of agents kept. Defaults to DEFAULT_MAX_AGENTS.
+            idle_ttl (float, optional): Seconds an unused agent is kept. Defaults to DEFAULT_IDLE_TTL.
+            on_evict (Callable, optional): Coroutine called with every evicted agent. Defaults to close_agent.
+        """
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+        # least recently used first
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        # id(agent) -> entry of every agent with leases, evicted or not
+        self._leased: Dict[int, _Entry] = {}
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.creations = 0
+        self.coalesced = 0
+        self.deferred_closes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._is_expired(entry)
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        """Return the agent for a key and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if self._is_expired(entry):
+            self.misses += 1
+            self.expirations += 1
+            await self._drop(key)
+            return None
+        self.hits += 1
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry.agent
+
+    async def put(self, key: Hashable, agent: Any) -> None:
+        """Store an agent, evicting idle and least recently used ones if needed"""
+        if key in self._entries:
+            await self._drop(key)
+        await self.purge_expired()
+        while len(self._entries) >= self.max_size:
+            # agents in use go last, and are then closed once released
+            oldest = next(
+                (key for key, entry in self._entries.items() if not entry.leases),
+                next(iter(self._entries)),
+            )
+            self.evictions += 1
+            await self._drop(oldest)
+        self._entries[key] = _Entry(agent)
+
+    async def acquire(
+        self, key: Hashable, create: Callable[[], Awaitable[Any]] = None
+    ) -> Optional[Any]:
+        """
+        Return the agent for a key with a lease on it, building it with create if given.
+
+        Every agent returned must be handed back to release once the call using it is done.
+        """
+        while True:
+            if create is None:
+                agent = await self.get(key)
+            else:
+                agent = await self.get_or_create(key, create)
+            if agent is None:
+                return None
+            entry = self._entries.get(key)
+            # evicted by another caller while this one was waiting for it
+            if entry is not None and entry.agent is agent:
+                entry.leases += 1
+                self._leased[id(agent)] = entry
+                return agent
+            if create is None:
+                return None
+
+    async def release(self, agent: Any) -> None:
+        """Give back a lease taken by acquire, closing the agent if it was evicted meanwhile"""
+        entry = self._leased.get(id(agent))
+        if entry is None:
+            return
+        entry.leases -= 1
+        entry.last_used = time.monotonic()
+        if entry.leases > 0:
+            return
+        del self._leased[id(agent)]
+        if entry.retired:
+            await self._close(agent)
+
+    @asynccontextmanager
+    async def lease(
+        self, key: Hashable, create: Callable[[], Awaitable[Any]] = None
+    ) -> AsyncIterator[Optional[Any]]:
+        """Hold a lease on the agent of a key for the duration of the block"""
+        agent = await self.acquire(key, create)
+        try:
+            yield agent
+        finally:
+            if agent is not None:
+                await self.release(agent)
+
+    async def get_or_create(
+        self, key: Hashable, create: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the stored agent or build and store a new one"""
+        agent = await self.get(key)
+        if agent is not None:
+            return agent
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            self.creations += 1
+            in_flight = asyncio.ensure_future(self._create(key, create))
+            self._in_flight[key] = in_flight
+        else:
+            self.coalesced += 1
+        # a cancelled caller must not cancel the initialization for the others
+        return await asyncio.shield(in_flight)
+
+    async def _create(self, key: Hashable, create: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            agent = await create()
+            await self.put(key, agent)
+            return agent
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def evict(self, key: Hashable) -> None:
+        if key in self._entries:
+            self.evictions += 1
+            await self._drop(key)
+
+    async def purge_expired(self) -> None:
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry)]
+        for key in expired:
+            self.expirations += 1
+            await self._drop(key)
+
+    async def clear(self) -> None:
+        for key in list(self._entries):
+            await self._drop(key)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "idle_ttl": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "creations": self.creations,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "leased": len(self._leased),
+            "deferred_closes": self.deferred_closes,
+        }
+
+    def _is_expired(self, entry: _Entry) -> bool:
+        return not entry.leases and time.monotonic() - entry.last_used > self.idle_ttl
+
+    async def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        if entry.leases:
+            entry.retired = True
+            self.deferred_closes += 1
+            return
+        await self._close(entry.agent)
+
+    async def _close(self, agent: Any) -> None:
+        if self.on_evict is not None:
+            await self.on_evict(agent)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Union
+
+from pyinjective.core.network import Network
+
+from injective_functions.utils.denom_registry import get_denom_registry
+from injective_functions.utils.metadata_registry import network_key
+
+
+def format_amount(amount: Union[int, str], decimals: int) -> str:
+    """
+    Exact human readable form of an integer chain amount, without float rounding.
+
+    The decimal point is placed by shifting the digits, which is cheaper than
+    dividing big integers and cannot lose precision.
+
+    Args:
+        amount (Union[int, str]): Amount in the denom's smallest unit
+        decimals (int): Decimals of the denom
+    """
+    digits = amount if isinstance(amount, str) and amount.isdigit() else str(int(amount))
+    if not decimals:
+        return digits
+    sign = ""
+    if digits[0] == "-":
+        sign, digits = "-", digits[1:]
+    if len(digits) <= decimals:
+        digits = digits.zfill(decimals + 1)
+    fraction = digits[-decimals:].rstrip("0")
+    whole = digits[:-decimals]
+    return f"{sign}{whole}.{fraction}" if fraction else f"{sign}{whole}"
+
+
+class AmountFormatter:
+    """
+    Converts chain amounts of one network's denoms to human readable strings,
+    with the decimals of every denom normalized once per denom registry snapshot.
+    """
+
+    def __init__(self, decimals: Dict[str, int]) -> None:
+        """
+        Args:
+            decimals (Dict[str, int]): denom -> decimals mapping of the network
+        """
+        self.decimals = decimals
+        self._decimals: Dict[str, int] = {
+            denom: int(places) for denom, places in decimals.items()
+        }
+
+    def __contains__(self, denom: str) -> bool:
+        return denom in self._decimals
+
+    def decimals_for(self, denom: str) -> Optional[int]:
+        return self._decimals.get(denom)
+
+    def to_human(self, denom: str, amount: Union[int, str]) -> Optional[str]:
+        """Human readable amount, or None if the denom's decimals are unknown"""
+        places = self._decimals.get(denom)
+        if places is None:
+            return None
+        return format_amount(amount, places)
+
+    def to_decimal(self, denom: str, amount: Union[int, str]) -> Optional[Decimal]:
+        human = self.to_human(denom, amount)
+        return None if human is None else Decimal(human)
+
+    def to_chain(self, denom: str, amount: Union[Decimal, float, str]) -> int:
+        """
+        Integer chain amount of a human readable amount.
+
+        Raises:
+            KeyError: if the denom's decimals are unknown
+        """
+        return int(Decimal(str(amount)).scaleb(self._decimals[denom]))
+
+    def format_coins(self, coins: Iterable[Dict]) -> Dict[str, str]:
+        """
+        Convert a whole balances or supply list in one pass.
+
+        Args:
+            coins (Iterable[Dict]): {"denom", "amount"} entries as returned by the bank queries
+
+        Returns:
+            Dict[str, str]: denom -> human readable amount, skipping denoms with unknown decimals
+        """
+        decimals = self._decimals
+        formatted = {}
+        for coin in coins:
+            places = decimals.get(coin["denom"])
+            if places is not None:
+                formatted[coin["denom"]] = format_amount(coin["amount"], places)
+        return formatted
+
+
+_formatters: Dict[str, AmountFormatter] = {}
+
+
+async def get_amount_formatter(
+    network: Union[str, bool, Network, None] = "mainnet"
+) -> AmountFormatter:
+    """Return the amount formatter of a network, rebuilt whenever its denoms are refreshed"""
+    key = network_key(network)
+    decimals = await get_denom_registry(key).get_decimals()
+    formatter = _formatters.get(key)
+    if formatter is None or formatter.decimals is not decimals:
+        formatter = _formatters[key] = AmountFormatter(decimals)
+    return formatter
@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Set
+
+from pyinjective.async_client import AsyncClient
+from pyinjective.core.network import Network
+
+from injective_functions.utils.market_registry import MarketRegistry, get_market_registry
+
+logger = logging.getLogger(__name__)
+
+# Number of AsyncClients (and so gRPC channel sets) opened per network
+DEFAULT_POOL_SIZE = int(os.getenv("INJECTIVE_CLIENT_POOL_SIZE", "2"))
+# Shortest time between two composer rebuilds triggered by unknown markets
+COMPOSER_REBUILD_INTERVAL = float(os.getenv("COMPOSER_REBUILD_INTERVAL", "60"))
+
+
+def network_for(network_type: str) -> Network:
+    return Network.testnet() if network_type == "testnet" else Network.mainnet()
+
+
+class NetworkClientPool:
+    """
+    A fixed set of AsyncClients shared by every agent on one network.
+
+    The clients only carry connections and public chain data. Signing keys,
+    account numbers and sequences stay on each agent's ChainInteractor.
+    Transactions take their timeout height from the network's
+    BlockHeightTracker, never from the clients' own timeout_height.
+
+    The composer is shared as well and its markets are reloaded in place
+    whenever the market registry lists markets it does not know, so every
+    agent holding it sees newly listed markets.
+    """
+
+    def __init__(
+        self,
+        network_type: str = "mainnet",
+        size: int = DEFAULT_POOL_SIZE,
+        rebuild_interval: float = COMPOSER_REBUILD_INTERVAL,
+    ):
+        """
+        Args:
+            network_type (str, optional): Network type ("mainnet" or "testnet"). Defaults to "mainnet".
+            size (int, optional): Number of clients to open. Defaults to DEFAULT_POOL_SIZE.
+            rebuild_interval (float, optional): Shortest seconds between composer rebuilds for unknown markets. Defaults to COMPOSER_REBUILD_INTERVAL.
+        """
+        if size < 1:
+            raise ValueError("Client pool size must be at least 1")
+        self.network_type = network_type
+        self.network = network_for(network_type)
+        self.size = size
+        self.rebuild_interval = rebuild_interval
+        self._clients: List[AsyncClient] = []
+        self._round_robin = None
+        self._composer = None
+        self._composer_lock = asyncio.Lock()
+        self._composer_built_at = None
+        # markets still unknown after a rebuild, e.g. inactive ones, not worth another
+        self._unloadable: Set[str] = set()
+        self.composer_rebuilds = 0
+
+    def get_client(self) -> AsyncClient:
+        """Hand out the pooled clients in round-robin order"""
+        if not self._clients:
+            # AsyncClient schedules its timeout height task, so it needs a running loop
+            self._clients = [AsyncClient(self.network) for _ in range(self.size)]
+            self._round_robin = itertools.cycle(self._clients)
+        return next(self._round_robin)
+
+    async def composer(self, market_ids: Iterable[str] = None):
+        """
+        Build the composer, and load markets and tokens, once per network.
+
+        Args:
+            market_ids (Iterable[str], optional): Markets the caller is about to use. The
+                composer is rebuilt first if one of them is unknown to it, at most
+                once per rebuild_interval.
+        """
+        if self._composer is None:
+            async with self._composer_lock:
+                if self._composer is None:
+                    self._composer = await self.get_client().composer()
+                    self._composer_built_at = time.monotonic()
+                    get_market_registry(self.network_type).add_refresh_listener(
+                        self._on_markets_refreshed
+                    )
+        elif market_ids and self._unknown_markets(market_ids):
+            await self.rebuild_composer(only_if_due=True)
+        return self._composer
+
+    def _known_markets(self) -> Set[str]:
+        composer = self._composer
+        return {
+            market_id.lower()
+            for markets in (composer.spot_markets, composer.derivative_markets)
+            for market_id in markets
+        }
+
+    def _unknown_markets(self, market_ids: Iterable[str]) -> Set[str]:
+        requested = {market_id.lower() for market_id in market_ids}
+        return requested - self._known_markets() - self._unloadable
+
+    def _on_markets_refreshed(self, registry: MarketRegistry) -> None:
+        if self._composer is not None and self._unknown_markets(registry.by_id):
+            asyncio.ensure_future(self._safe_rebuild())
+
+    async def _safe_rebuild(self) -> None:
+        try:
+            await self.rebuild_composer()
+        except Exception as e:
+            logger.error(f"Rebuilding the {self.network_type} composer failed: {e}")
+
+    async def rebuild_composer(self, only_if_due: bool = False) -> None:
+        """
+        Reload the composer's markets and tokens from the chain, in place.
+
+        A short-lived client loads them, since the pooled clients cache their
+        markets for good once loaded.
+        """
+        async with self._composer_lock:
+            if (
+                only_if_due
+                and time.monotonic() - self._composer_built_at < self.rebuild_interval
+            ):
+                return
+            listed = get_market_registry(self.network_type).by_id.keys()
+            client = AsyncClient(self.network)
+            try:
+                fresh = await client.composer()
+            finally:
+                await client.close_chain_channel()
+                await client.close_exchange_channel()
+            composer = self._composer
+            composer.spot_markets = fresh.spot_markets
+            composer.derivative_markets = fresh.derivative_markets
+            composer.binary_option_markets = fresh.binary_option_markets
+            composer.tokens = fresh.tokens
+            self._unloadable = set(listed) - self._known_markets()
+            self._composer_built_at = time.monotonic()
+            self.composer_rebuilds += 1
+
+    def stats(self) -> Dict:
+        return {
+            "network": self.network_type,
+            "size": self.size,
+            "open_clients": len(self._clients),
+            "composer_rebuilds": self.composer_rebuilds,
+        }
+
+    async def close(self) -> None:
+        for client in self._clients:
+            await client.close_chain_channel()
+            await client.close_exchange_channel()
+        self._clients = []
+        self._round_robin = None
+
+
+_pools: Dict[str, NetworkClientPool] = {}
+
+
+def get_client_pool(network_type: str = "mainnet") -> NetworkClientPool:
+    """Return the client pool shared by every agent on a network"""
+    network_type = "testnet" if network_type == "testnet" else "mainnet"
+    pool = _pools.get(network_type)
+    if pool is None:
+        pool = _pools[network_type] = NetworkClientPool(network_type)
+    return pool
+
+
+def configure_client_pool(network_type: str, size: int) -> NetworkClientPool:
+    """Replace the pool of a network with one of the given size, before first use"""
+    network_type = "testnet" if network_type == "testnet" else "mainnet"
+    _pools[network_type] = NetworkClientPool(network_type, size)
+    return _pools[network_type]
+
+
+async def close_client_pools() -> None:
+    for pool in _pools.values():
+        await pool.close()
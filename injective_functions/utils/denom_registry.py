@@ -0,0 +1,75 @@
+import json
+import logging
+from typing import Dict, Optional, Union
+
+from pyinjective.core.network import Network
+
+from injective_functions.utils.http_client import get_http_session
+from injective_functions.utils.metadata_registry import MetadataRegistry, network_key
+
+logger = logging.getLogger(__name__)
+
+DENOM_DECIMALS_URLS = {
+    "mainnet": "https://sentry.lcd.injective.network/injective/exchange/v1beta1/exchange/denom_decimals",
+    "testnet": "https://testnet.lcd.injective.network/injective/exchange/v1beta1/exchange/denom_decimals",
+}
+
+
+class DenomRegistry(MetadataRegistry):
+    """Decimals of every denom on a network, for O(1) amount conversion"""
+
+    def __init__(self, network_type: str = "mainnet", ttl: float = 300.0) -> None:
+        super().__init__(network_type, ttl)
+        self.decimals: Dict[str, int] = {}
+
+    async def get_decimals(self) -> Dict[str, int]:
+        """Return the denom -> decimals mapping, loading it on first use"""
+        await self.ensure_loaded()
+        return self.decimals
+
+    async def decimals_for(self, denom: str) -> Optional[int]:
+        await self.ensure_loaded()
+        return self.decimals.get(denom)
+
+    async def _load(self) -> Dict[str, int]:
+        request_url = DENOM_DECIMALS_URLS[self.network_type]
+        logger.info(f"Fetching denoms from: {request_url}")
+
+        async with get_http_session().get(request_url) as response:
+            if response.status != 200:
+                logger.error(f"Error status code: {response.status}")
+                logger.error(f"Error response: {await response.text()}")
+                return {}
+
+            denom_data = json.loads(await response.text())
+
+        if "denom_decimals" not in denom_data:
+            logger.error("No 'denom_decimals' key in response")
+            logger.error(f"Response keys: {denom_data.keys()}")
+            return {}
+
+        denom_data = denom_data["denom_decimals"]
+        logger.info(f"Number of denoms found: {len(denom_data)}")
+        return {denom["denom"]: int(denom["decimals"]) for denom in denom_data}
+
+    def _apply(self, data: Dict[str, int]) -> None:
+        # swap the whole mapping so readers never see a half-built one
+        self.decimals = data
+
+    def export(self) -> Dict[str, int]:
+        return dict(self.decimals)
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "denoms": len(self.decimals)}
+
+
+_registries: Dict[str, DenomRegistry] = {}
+
+
+def get_denom_registry(network: Union[str, bool, Network, None] = "mainnet") -> DenomRegistry:
+    """Return the denom registry of a network, whichever way it is named"""
+    key = network_key(network)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = DenomRegistry(key)
+    return registry
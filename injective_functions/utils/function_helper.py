@@ -15,12 +15,17 @@ class InjectiveFunctionMapper:
         "place_spot_market_order": ("trader", "place_spot_market_order"),
         "cancel_derivative_limit_order": ("trader", "cancel_derivative_limit_order"),
         "cancel_spot_limit_order": ("trader", "cancel_spot_limit_order"),
+        "batch_place_orders": ("trader", "batch_place_orders"),
+        "batch_cancel_orders": ("trader", "batch_cancel_orders"),
+        "cancel_and_replace_orders": ("trader", "cancel_and_replace_orders"),
+        "cancel_all_orders": ("trader", "cancel_all_orders"),
         # Exchange functions
         "get_subaccount_deposits": ("exchange", "get_subaccount_deposits"),
         "get_aggregate_market_volumes": ("exchange", "get_aggregate_market_volumes"),
         "get_aggregate_account_volumes": ("exchange", "get_aggregate_account_volumes"),
         "get_subaccount_orders": ("exchange", "get_subaccount_orders"),
         "get_historical_orders": ("exchange", "get_historical_orders"),
+        "get_historical_trades": ("exchange", "get_historical_trades"),
         "get_mid_price_and_tob_derivatives_market": (
             "exchange",
             "get_mid_price_and_tob_derivatives_market",
@@ -38,6 +43,17 @@ class InjectiveFunctionMapper:
         ),
         "trader_spot_orders": ("exchange", "trader_spot_orders"),
         "trader_spot_orders_by_hash": ("exchange", "trader_spot_orders_by_hash"),
+        "get_mid_price_and_tob_markets": ("exchange", "get_mid_price_and_tob_markets"),
+        "get_orderbooks": ("exchange", "get_orderbooks"),
+        "get_subaccount_orders_in_markets": (
+            "exchange",
+            "get_subaccount_orders_in_markets",
+        ),
+        "get_subaccount_positions_in_markets": (
+            "exchange",
+            "get_subaccount_positions_in_markets",
+        ),
+        "get_portfolio_snapshot": ("exchange", "get_portfolio_snapshot"),
         # Bank functions
         "query_balances": ("bank", "query_balances"),
         "transfer_funds": ("bank", "transfer_funds"),
@@ -0,0 +1,168 @@
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+GasKey = Tuple[str, int, str]
+
+# cosmos-sdk ErrOutOfGas
+OUT_OF_GAS_CODE = 11
+
+# Fields whose gas depends on chain state the message does not carry, such
+# as the number of open orders a cancel-all removes
+STATE_DEPENDENT_FIELDS = (
+    "spot_market_ids_to_cancel_all",
+    "derivative_market_ids_to_cancel_all",
+    "binary_options_market_ids_to_cancel_all",
+)
+
+
+def gas_key(msgs: List) -> GasKey:
+    """
+    Key a list of messages by their sorted type URLs, the message count and
+    the length of every list field they set.
+
+    Messages carrying lists, such as a batch update with any number of
+    orders, use more gas the more items they carry, so they only share
+    estimates with messages carrying exactly as many.
+    """
+    type_urls = sorted(f"/{msg.DESCRIPTOR.full_name}" for msg in msgs)
+    lengths = sorted(
+        f"{field.name}={len(value)}"
+        for msg in msgs
+        for field, value in msg.ListFields()
+        if field.label == field.LABEL_REPEATED
+    )
+    return ",".join(type_urls), len(msgs), ",".join(lengths)
+
+
+def needs_simulation(msgs: List) -> bool:
+    """Check whether the gas of the messages cannot be learned from earlier ones"""
+    return any(
+        field.name in STATE_DEPENDENT_FIELDS
+        for msg in msgs
+        for field, _ in msg.ListFields()
+    )
+
+
+class GasEstimator:
+    """
+    Learns the gas used by well-known message types so that transactions can
+    skip simulation once the observed gas is stable enough.
+    """
+
+    def __init__(
+        self,
+        min_samples: int = 20,
+        max_relative_spread: float = 0.05,
+        margin: float = 0.05,
+        window: int = 200,
+    ) -> None:
+        """
+        Args:
+            min_samples (int, optional): Observations needed before an estimate is trusted. Defaults to 20.
+            max_relative_spread (float, optional): Largest (max - min) / mean of the window that still counts as stable. Defaults to 0.05.
+            margin (float, optional): Headroom added on top of the largest observation. Defaults to 0.05.
+            window (int, optional): Number of recent observations kept per key. Defaults to 200.
+        """
+        self.min_samples = min_samples
+        self.max_relative_spread = max_relative_spread
+        self.margin = margin
+        self.window = window
+        self._samples: Dict[GasKey, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        # keys whose last observation ate into the margin, simulated once more
+        self._verify: Set[GasKey] = set()
+        # included txs per key since it last ran out of gas
+        self._receipts: Dict[GasKey, int] = defaultdict(int)
+        self._stats: Dict[GasKey, Dict] = defaultdict(
+            lambda: {
+                "hits": 0,
+                "misses": 0,
+                "out_of_gas": 0,
+                "band_hits": 0,
+                "receipts": 0,
+                "abs_error_sum": 0.0,
+            }
+        )
+
+    def estimate(self, key: GasKey, min_receipts: int = 0) -> Optional[int]:
+        """
+        Return a confident gas estimate for the key, or None to simulate.
+
+        Args:
+            key (GasKey): Key of the messages, from gas_key
+            min_receipts (int, optional): Included txs the key needs on top of min_samples
+                observations, as simulations alone do not prove a limit holds in the block.
+                Defaults to 0.
+        """
+        samples = self._samples.get(key)
+        if self._receipts.get(key, 0) < min_receipts:
+            self._stats[key]["misses"] += 1
+            return None
+        if key in self._verify:
+            self._verify.discard(key)
+            self._stats[key]["misses"] += 1
+            return None
+        if not samples or len(samples) < self.min_samples:
+            self._stats[key]["misses"] += 1
+            return None
+        mean = sum(samples) / len(samples)
+        if (max(samples) - min(samples)) / mean > self.max_relative_spread:
+            self._stats[key]["misses"] += 1
+            return None
+        self._stats[key]["hits"] += 1
+        return int(max(samples) * (1 + self.margin))
+
+    def record(self, key: GasKey, gas_used: int) -> None:
+        """
+        Record the gas used by a simulation or an included transaction.
+
+        An observation above every sample so far lands inside the margin band
+        of the current estimate, so the next tx of the key is simulated again
+        instead of trusting a margin that is being used up.
+        """
+        samples = self._samples[key]
+        if len(samples) >= self.min_samples and int(gas_used) > max(samples):
+            self._verify.add(key)
+            self._stats[key]["band_hits"] += 1
+        samples.append(int(gas_used))
+
+    def record_receipt(self, key: GasKey, gas_wanted: int, gas_used: int) -> None:
+        """Record an included tx and how far its gas limit was from the gas used"""
+        self.record(key, gas_used)
+        self._receipts[key] += 1
+        stats = self._stats[key]
+        stats["receipts"] += 1
+        stats["abs_error_sum"] += abs(int(gas_wanted) - int(gas_used)) / int(gas_wanted)
+
+    def record_out_of_gas(self, key: GasKey) -> None:
+        """Forget what was learned for a key so the next tx simulates again"""
+        self._stats[key]["out_of_gas"] += 1
+        self._samples.pop(key, None)
+        self._receipts.pop(key, None)
+        self._verify.discard(key)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-key hit rate and accuracy of the estimates"""
+        report = {}
+        for key, stats in self._stats.items():
+            type_urls, count, lengths = key
+            lookups = stats["hits"] + stats["misses"]
+            report[f"{type_urls} x{count}" + (f" [{lengths}]" if lengths else "")] = {
+                "samples": len(self._samples.get(key, ())),
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+                "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                "out_of_gas": stats["out_of_gas"],
+                "band_hits": stats["band_hits"],
+                "receipts": stats["receipts"],
+                "mean_relative_error": (
+                    stats["abs_error_sum"] / stats["receipts"]
+                    if stats["receipts"]
+                    else None
+                ),
+            }
+        return report
+
+
+# Gas usage depends on the message type, not on the agent, so one
+# estimator is shared by every ChainInteractor in the process
+default_gas_estimator = GasEstimator()
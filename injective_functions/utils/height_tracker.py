@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from pyinjective.async_client import DEFAULT_TIMEOUTHEIGHT
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.metadata_registry import network_key
+
+
+class BlockHeightTracker:
+    """
+    Latest block height of one network, refreshed in the background and read
+    by every ChainInteractor on that network to set tx timeout heights.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        refresh_interval: float = 5.0,
+        max_staleness: float = 15.0,
+        timeout_blocks: int = DEFAULT_TIMEOUTHEIGHT,
+    ) -> None:
+        """
+        Args:
+            client: AsyncClient used to fetch the latest block
+            refresh_interval (float, optional): Seconds between background refreshes. Defaults to 5.0.
+            max_staleness (float, optional): Age in seconds after which readers refresh inline. Defaults to 15.0.
+            timeout_blocks (int, optional): Blocks added to the height for the tx timeout. Defaults to DEFAULT_TIMEOUTHEIGHT.
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.timeout_blocks = timeout_blocks
+        self.latest_height: Optional[int] = None
+        self.updated_at: Optional[float] = None
+        self.refreshes = 0
+        self._refresh_lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return (
+            self.updated_at is None
+            or time.monotonic() - self.updated_at > self.max_staleness
+        )
+
+    async def get_height(self) -> int:
+        """Latest known block height, refreshed inline only when too old"""
+        self.start()
+        if self.is_stale:
+            await self.refresh(only_if_stale=True)
+        return self.latest_height
+
+    async def get_timeout_height(self) -> int:
+        return await self.get_height() + self.timeout_blocks
+
+    async def refresh(self, only_if_stale: bool = False) -> None:
+        async with self._refresh_lock:
+            # readers queued behind another refresh reuse its result
+            if only_if_stale and not self.is_stale:
+                return
+            block = await self.client.fetch_latest_block()
+            self.latest_height = int(block["block"]["header"]["height"])
+            self.updated_at = time.monotonic()
+            self.refreshes += 1
+
+    def start(self) -> None:
+        """Start the background refresher if it is not running"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                # keep the last height, readers refresh inline once it is stale
+                pass
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict:
+        return {
+            "latest_height": self.latest_height,
+            "age": (
+                time.monotonic() - self.updated_at
+                if self.updated_at is not None
+                else None
+            ),
+            "refreshes": self.refreshes,
+        }
+
+
+_trackers: Dict[str, BlockHeightTracker] = {}
+
+
+def get_height_tracker(network_type: str) -> BlockHeightTracker:
+    """Return the height tracker shared by every agent on a network"""
+    key = network_key(network_type)
+    tracker = _trackers.get(key)
+    if tracker is None:
+        tracker = _trackers[key] = BlockHeightTracker(get_client_pool(key).get_client())
+    return tracker
@@ -1,26 +1,25 @@
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List
+import asyncio
 import json
+import os
 import re
 import base64
-import requests
-from injective_functions.utils.indexer_requests import get_market_id
+from injective_functions.utils.price_provider import INJ_ASSET, get_price_provider
+from injective_functions.utils.indexer_requests import get_market_id, resolve_market_ids
 
 
 def base64convert(s):
     try:
         int(s.replace("0x", ""), 16)
-        return ("0x" + s).upper()
+        # already hex, only make sure it carries a single 0x prefix
+        return "0x" + s.replace("0x", "", 1).upper()
     except:
         # If not hex, convert base64 to hex with 0x
         return "0x" + base64.b64decode(s).hex().upper()
 
 
-def get_bridge_fee() -> float:
-    asset = "injective-protocol"
-    coingecko_endpoint = (
-        f"https://api.coingecko.com/api/v3/simple/price?ids={asset}&vs_currencies=usd"
-    )
-    token_price = requests.get(coingecko_endpoint).json()[asset]["usd"]
+async def get_bridge_fee() -> float:
+    token_price = await get_price_provider().get_price(INJ_ASSET)
     minimum_bridge_fee_usd = 10
     return float(minimum_bridge_fee_usd / token_price)
 
@@ -58,21 +57,97 @@ def combine_function_schemas(input_files: List[str]) -> Dict:
     return combined_data
 
 
-async def impute_market_ids(market_ids):
-    lst = []
-    for market_id in market_ids:
-        if validate_market_id(market_id):
-            lst.append(market_id)
-        else:
-            lst.append(await get_market_id(market_id))
-    return lst
+class MarketIdImputationError(ValueError):
+    """Raised when some tickers of a batch do not resolve to a market id"""
+
+    def __init__(self, errors: Dict[str, str]) -> None:
+        self.errors = errors
+        super().__init__(
+            "Could not resolve market ids: "
+            + "; ".join(f"{ticker}: {error}" for ticker, error in errors.items())
+        )
+
+
+async def impute_market_ids(market_ids, network_type: str = "mainnet"):
+    """
+    Replace every ticker in market_ids by its market id, keeping input order.
+
+    Tickers are deduplicated and resolved together against one market snapshot.
+
+    Args:
+        market_ids (List[str]): Market ids and/or tickers
+        network_type (str, optional): Network whose markets are searched. Defaults to "mainnet".
 
+    Raises:
+        MarketIdImputationError: listing the error of each ticker that did not resolve
+    """
+    if market_ids is None:
+        return None
+    tickers = [market_id for market_id in market_ids if not validate_market_id(market_id)]
+    if not tickers:
+        return list(market_ids)
 
-async def impute_market_id(market_id):
+    resolved = await resolve_market_ids(tickers, network_type)
+    errors = {
+        ticker: result["error"] for ticker, result in resolved.items() if result["error"]
+    }
+    if errors:
+        raise MarketIdImputationError(errors)
+    return [
+        market_id if validate_market_id(market_id) else resolved[market_id]["market_id"]
+        for market_id in market_ids
+    ]
+
+
+async def impute_market_id(market_id, network_type: str = "mainnet"):
     if validate_market_id(market_id):
         return market_id
     else:
-        return await get_market_id(market_id)
+        return await get_market_id(market_id, network_type)
+
+
+# Per-market queries a fan-out call runs at once, unless the caller asks otherwise
+FAN_OUT_CONCURRENCY = int(os.getenv("FAN_OUT_CONCURRENCY", "8"))
+
+
+async def fan_out(
+    keys: List[str],
+    query: Callable[[str], Awaitable[Dict]],
+    max_concurrency: int = None,
+) -> Dict:
+    """
+    Run query(key) for every distinct key concurrently, at most max_concurrency at a time.
+
+    Args:
+        keys (List[str]): Keys to query, e.g. market ids or tickers
+        query (Callable): Coroutine function returning a {"success", "result"/"error"} dict
+        max_concurrency (int, optional): Queries in flight. Defaults to FAN_OUT_CONCURRENCY.
+
+    Returns:
+        Dict: per-key results and per-key errors, succeeding if any key succeeded
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or FAN_OUT_CONCURRENCY)
+
+    async def run(key):
+        async with semaphore:
+            try:
+                return await query(key)
+            except Exception as e:
+                return detailed_exception_info(e)
+
+    unique_keys = list(dict.fromkeys(keys))
+    responses = await asyncio.gather(*(run(key) for key in unique_keys))
+    results, errors = {}, {}
+    for key, response in zip(unique_keys, responses):
+        if response.get("success"):
+            results[key] = response["result"]
+        else:
+            errors[key] = response.get("error")
+    return {
+        "success": bool(results) or not errors,
+        "result": results,
+        "errors": errors,
+    }
 
 
 def detailed_exception_info(e) -> Dict:
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Dict, Optional, Set
+
+import aiohttp
+
+# Connection pool and timeout settings, overridable per deployment
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+
+class HttpClient:
+    """
+    Process-wide aiohttp session with per-host keep-alive connection pools
+    and DNS caching, shared by every outbound HTTP call.
+
+    The session belongs to the event loop it was opened on. Used from a new
+    loop, it is replaced and the previous one is closed, and pool usage is
+    counted from aiohttp's request tracing hooks.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        total_timeout: float = HTTP_TOTAL_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+    ) -> None:
+        """
+        Args:
+            limit (int, optional): Open connections across all hosts. Defaults to HTTP_POOL_LIMIT.
+            limit_per_host (int, optional): Open connections per host. Defaults to HTTP_POOL_LIMIT_PER_HOST.
+            dns_cache_ttl (int, optional): Seconds resolved addresses are cached. Defaults to HTTP_DNS_CACHE_TTL.
+            total_timeout (float, optional): Seconds for a whole request. Defaults to HTTP_TOTAL_TIMEOUT.
+            connect_timeout (float, optional): Seconds to open a connection. Defaults to HTTP_CONNECT_TIMEOUT.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout, connect=connect_timeout
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+        # closes of sessions left behind by a previous event loop
+        self._closing: Set[asyncio.Future] = set()
+        self.requests = 0
+        self.in_flight = 0
+        self.in_flight_per_host: Counter = Counter()
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.replaced_sessions = 0
+
+    def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, opening it on the running event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                self._close_stale(self._session, self._loop)
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._trace_config()],
+            )
+            self._loop = loop
+        return self._session
+
+    async def start(self) -> None:
+        self.session()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def _close_stale(self, session: aiohttp.ClientSession, loop) -> None:
+        """Close a session opened on another event loop"""
+        self.replaced_sessions += 1
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            # still serving another thread, its connections close on their own loop
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        # the loop is gone and its transports with it, this releases the session
+        closing = asyncio.ensure_future(session.close())
+        self._closing.add(closing)
+        closing.add_done_callback(self._closing.discard)
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+            self.in_flight += 1
+            self.in_flight_per_host[params.url.host] += 1
+
+        async def on_request_done(session, context, params):
+            self.in_flight -= 1
+            self.in_flight_per_host[params.url.host] -= 1
+            if not self.in_flight_per_host[params.url.host]:
+                del self.in_flight_per_host[params.url.host]
+
+        async def on_connection_queued(session, context, params):
+            self.queued += 1
+
+        async def on_connection_create(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuse(session, context, params):
+            self.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        trace_config.on_connection_queued_start.append(on_connection_queued)
+        trace_config.on_connection_create_end.append(on_connection_create)
+        trace_config.on_connection_reuseconn.append(on_connection_reuse)
+        return trace_config
+
+    def stats(self) -> Dict:
+        """Connection pool usage of the shared session"""
+        connections = self.connections_created + self.connections_reused
+        return {
+            "open": self._session is not None and not self._session.closed,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "in_flight_per_host": dict(self.in_flight_per_host),
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": self.connections_reused / connections if connections else 0.0,
+            "queued_for_connection": self.queued,
+            "replaced_sessions": self.replaced_sessions,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+        }
+
+
+http_client = HttpClient()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session for outbound requests, never close it per call"""
+    return http_client.session()
+
+
+def register_quart(app) -> None:
+    """Open the shared session with the Quart app and close it on shutdown"""
+
+    @app.before_serving
+    async def start_http_client():
+        await http_client.start()
+
+    @app.after_serving
+    async def close_http_client():
+        await http_client.close()
+
+
+async def telegram_post_init(application) -> None:
+    """post_init hook for a telegram Application"""
+    await http_client.start()
+
+
+async def telegram_post_shutdown(application) -> None:
+    """post_shutdown hook for a telegram Application"""
+    await http_client.close()
@@ -1,54 +1,227 @@
+import asyncio
 from grpc import RpcError
-from pyinjective.async_client import AsyncClient
 from pyinjective.constant import GAS_FEE_BUFFER_AMOUNT, GAS_PRICE
-from pyinjective.core.network import Network
 from pyinjective.core.broadcaster import MsgBroadcasterWithPk
 from pyinjective.transaction import Transaction
 from pyinjective.wallet import PrivateKey
 from injective_functions.utils.helpers import detailed_exception_info
+from injective_functions.utils.tx_batcher import TxBatcher, is_accepted
+from injective_functions.utils.tx_tracker import get_confirmation_tracker
+from injective_functions.utils.client_pool import get_client_pool, network_for
+from injective_functions.utils.height_tracker import get_height_tracker
+from injective_functions.utils.gas_estimator import (
+    GasEstimator,
+    default_gas_estimator,
+    gas_key,
+    needs_simulation,
+)
+
+# cosmos-sdk ErrWrongSequence, returned by CheckTx when the signed sequence is stale
+SEQUENCE_MISMATCH_CODE = 32
+SEQUENCE_MISMATCH_MESSAGE = "account sequence mismatch"
+
+
+class AccountSyncError(RuntimeError):
+    """Raised when the account number and sequence could not be read from the chain"""
 
 
 class ChainInteractor:
-    def __init__(self, network_type: str = "mainnet", private_key: str = None) -> None:
+    def __init__(
+        self,
+        network_type: str = "mainnet",
+        private_key: str = None,
+        batch_window: float = None,
+        gas_estimator: GasEstimator = None,
+    ) -> None:
         self.private_key = private_key
         self.network_type = network_type
         if not self.private_key:
             raise ValueError("No private key found in environment variables")
 
-        self.network = (
-            Network.testnet() if network_type == "testnet" else Network.mainnet()
-        )
+        self.network = network_for(network_type)
+        # client and composer are borrowed from the network-wide pool
         self.client = None
         self.composer = None
-        self.message_broadcaster = None
+        self._message_broadcaster = None
 
         # Initialize account
         self.priv_key = PrivateKey.from_hex(self.private_key)
         self.pub_key = self.priv_key.to_public_key()
         self.address = self.pub_key.to_address()
 
+        # Account state is fetched once per session and the sequence is then
+        # advanced locally after every accepted broadcast
+        self.account_number = None
+        self.sequence = None
+        self._session_lock = asyncio.Lock()
+        self._tx_lock = asyncio.Lock()
+
+        # Opt-in micro-batching of concurrent messages into one tx
+        self.batcher = (
+            TxBatcher(
+                self.broadcast_msgs, window=batch_window, track=self.wait_for_inclusion
+            )
+            if batch_window
+            else None
+        )
+        self.gas_estimator = gas_estimator or default_gas_estimator
+        self.confirmation_tracker = None
+        self.height_tracker = None
+
+    async def connect(self):
+        """Attach the pooled network client and composer without any account RPC"""
+        if self.client is None:
+            pool = get_client_pool(self.network_type)
+            self.client = pool.get_client()
+            self.composer = await pool.composer()
+            self.confirmation_tracker = get_confirmation_tracker(self.network_type)
+        if self.height_tracker is None:
+            self.height_tracker = get_height_tracker(self.network_type)
+
+    async def ensure_markets(self, market_ids: list):
+        """Make sure the shared composer knows the markets orders are about to be composed for"""
+        await self.connect()
+        self.composer = await get_client_pool(self.network_type).composer(market_ids)
+
     async def init_client(self):
         """Initialize the Injective client and required components"""
-        self.client = AsyncClient(self.network)
-        self.composer = await self.client.composer()
-        await self.client.sync_timeout_height()
-        await self.client.fetch_account(self.address.to_acc_bech32())
-        self.message_broadcaster = MsgBroadcasterWithPk.new_using_simulation(
-            network=self.network, private_key=self.private_key
-        )
+        await self.connect()
+        await self.sync_account()
 
-    async def build_and_broadcast_tx(self, msg):
-        """Common function to build and broadcast transactions"""
-        try:
-            await self.init_client()
-            tx = (
-                Transaction()
-                .with_messages(msg)
-                .with_sequence(self.client.get_sequence())
-                .with_account_num(self.client.get_number())
-                .with_chain_id(self.network.chain_id)
+    @property
+    def message_broadcaster(self) -> MsgBroadcasterWithPk:
+        """Broadcaster with its own client, only opened by the few modules using it"""
+        if self._message_broadcaster is None:
+            self._message_broadcaster = MsgBroadcasterWithPk.new_using_simulation(
+                network=self.network, private_key=self.private_key
             )
+        return self._message_broadcaster
+
+    async def ensure_session(self):
+        """Open the chain session on first use and reuse it afterwards"""
+        if self.client is not None and self.sequence is not None:
+            return
+        async with self._session_lock:
+            if self.client is None or self.sequence is None:
+                await self.init_client()
+
+    async def sync_account(self):
+        """
+        Fetch the account number and sequence from the chain.
+
+        Raises:
+            AccountSyncError: if the account could not be read, in which case the
+                previously synced account number and sequence are kept
+        """
+        address = self.address.to_acc_bech32()
+        account = await self.client.fetch_account(address)
+        if account is not None:
+            self.account_number = int(account.base_account.account_number)
+            self.sequence = int(account.base_account.sequence)
+            return
+        # fetch_account also returns None when the query itself failed, so only
+        # an account confirmed to hold nothing is treated as unknown to the chain
+        try:
+            balances = await self.client.fetch_bank_balances(address)
+        except Exception as e:
+            raise AccountSyncError(f"Could not fetch account {address}: {e}") from e
+        if balances.get("balances"):
+            raise AccountSyncError(f"Could not fetch account {address}")
+        self.account_number, self.sequence = 0, 0
+
+    @staticmethod
+    def is_sequence_mismatch(result: dict) -> bool:
+        """Check whether a tx result was rejected because of a stale sequence"""
+        if "error" in result:
+            return SEQUENCE_MISMATCH_MESSAGE in str(result["error"])
+        tx_response = result.get("result", {}).get("txResponse", {})
+        return int(tx_response.get("code", 0)) == SEQUENCE_MISMATCH_CODE
+
+    async def build_and_broadcast_tx(self, msg, wait_for_inclusion: bool = False):
+        """
+        Common function to build and broadcast transactions.
+
+        The call returns as soon as the tx is accepted into the mempool unless
+        wait_for_inclusion is set, in which case the block inclusion receipt is
+        added to the result under "inclusion".
+
+        A result with "gas_simulated" False was only checked by CheckTx, which
+        validates the signature, sequence and fee but does not execute the
+        messages. Running out of gas, insufficient funds, a bad tick size or a
+        closed market then only fail the tx in the block. The fee is still
+        charged, "success" stays True and only the receipt under "inclusion"
+        shows the failure, so set wait_for_inclusion when it matters.
+        """
+        if self.batcher is not None:
+            # the batcher waits for inclusion itself, to retry a batch failing in the block
+            return await self.batcher.submit(msg, wait_for_inclusion)
+        result = await self.broadcast_msgs([msg])
+        if wait_for_inclusion and is_accepted(result):
+            result = {
+                **result,
+                "inclusion": await self.wait_for_inclusion(result["tx_hash"]),
+            }
+        return result
+
+    async def wait_for_inclusion(self, tx_hash: str) -> dict:
+        """Wait until a broadcast tx is included in a block"""
+        return await self.confirmation_tracker.track(tx_hash)
+
+    async def broadcast_msgs(self, msgs: list) -> dict:
+        """Sign and broadcast one transaction carrying all the given messages"""
+        try:
+            await self.ensure_session()
+            # sequence numbers must be consumed one transaction at a time
+            async with self._tx_lock:
+                result = await self._sign_and_broadcast(msgs)
+                if self.is_sequence_mismatch(result):
+                    await self.sync_account()
+                    result = await self._sign_and_broadcast(msgs)
+                return result
+        except Exception as e:
+            return {"success": False, "error": detailed_exception_info(e)}
+
+    async def close(self):
+        """Flush queued messages and close the channels owned by this agent"""
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self._message_broadcaster is not None:
+            # the broadcaster opened its own client, unlike the pooled one
+            await self._message_broadcaster._client.close_chain_channel()
+            await self._message_broadcaster._client.close_exchange_channel()
+            self._message_broadcaster = None
+        self.client = None
+        self.sequence = None
+
+    async def _sign_and_broadcast(self, msgs: list) -> dict:
+        """
+        Sign and broadcast in sync mode, simulating only when no learned gas estimate is trusted.
+
+        A tx signed with a learned estimate is never simulated, so it can pass
+        CheckTx and still run out of gas in the block (code 11). That failure
+        only shows in the inclusion receipt of the confirmation tracker, which
+        also makes the next tx with the same messages simulate again. Messages
+        whose gas depends on chain state, such as cancel-all market lists,
+        always simulate.
+        """
+        tx = (
+            Transaction()
+            .with_messages(*msgs)
+            .with_sequence(self.sequence)
+            .with_account_num(self.account_number)
+            .with_chain_id(self.network.chain_id)
+        )
 
+        key = gas_key(msgs)
+        if needs_simulation(msgs):
+            gas_used = None
+        else:
+            # a batch fails in the block as a whole, so batches keep simulating
+            # until enough of them were included, not just simulated
+            gas_used = self.gas_estimator.estimate(
+                key, min_receipts=self.gas_estimator.min_samples if len(msgs) > 1 else 0
+            )
+        if gas_used is None:
             sim_sign_doc = tx.get_sign_doc(self.pub_key)
             sim_sig = self.priv_key.sign(sim_sign_doc.SerializeToString())
             sim_tx_raw_bytes = tx.get_tx_data(sim_sig, self.pub_key)
@@ -57,39 +230,54 @@ class ChainInteractor:
                 sim_res = await self.client.simulate(sim_tx_raw_bytes)
             except RpcError as ex:
                 return {"error": str(ex)}
+            gas_used = int(sim_res["gasInfo"]["gasUsed"])
+            self.gas_estimator.record(key, gas_used)
+            simulated = True
+        else:
+            simulated = False
 
-            gas_price = GAS_PRICE
-            gas_limit = (
-                int(sim_res["gasInfo"]["gasUsed"]) + int(2) * GAS_FEE_BUFFER_AMOUNT
-            )
-            gas_fee = "{:.18f}".format((gas_price * gas_limit) / pow(10, 18)).rstrip(
-                "0"
+        # the pooled clients' own timeout_height is never used for signing
+        timeout_height = await self.height_tracker.get_timeout_height()
+        gas_price = GAS_PRICE
+        gas_limit = gas_used + int(2) * GAS_FEE_BUFFER_AMOUNT
+        gas_fee = "{:.18f}".format((gas_price * gas_limit) / pow(10, 18)).rstrip("0")
+
+        fee = [
+            self.composer.coin(
+                amount=gas_price * gas_limit,
+                denom=self.network.fee_denom,
             )
+        ]
 
-            fee = [
-                self.composer.coin(
-                    amount=gas_price * gas_limit,
-                    denom=self.network.fee_denom,
-                )
-            ]
+        tx = (
+            tx.with_gas(gas_limit)
+            .with_fee(fee)
+            .with_memo("")
+            .with_timeout_height(timeout_height)
+        )
+        sign_doc = tx.get_sign_doc(self.pub_key)
+        sig = self.priv_key.sign(sign_doc.SerializeToString())
+        tx_raw_bytes = tx.get_tx_data(sig, self.pub_key)
 
-            tx = (
-                tx.with_gas(gas_limit)
-                .with_fee(fee)
-                .with_memo("")
-                .with_timeout_height(self.client.timeout_height)
-            )
-            sign_doc = tx.get_sign_doc(self.pub_key)
-            sig = self.priv_key.sign(sign_doc.SerializeToString())
-            tx_raw_bytes = tx.get_tx_data(sig, self.pub_key)
-
-            res = await self.client.broadcast_tx_sync_mode(tx_raw_bytes)
-            # standardized return arguments
-            return {
-                "success": True,
-                "result": res,
-                "gas_wanted": gas_limit,
-                "gas_fee": f"{gas_fee} INJ",
-            }
-        except Exception as e:
-            return {"success": False, "error": detailed_exception_info(e)}
+        res = await self.client.broadcast_tx_sync_mode(tx_raw_bytes)
+        code = int(res.get("txResponse", {}).get("code", 0))
+        tx_hash = res.get("txResponse", {}).get("txhash")
+        # a tx accepted by CheckTx consumes the sequence even if it later fails
+        if code == 0:
+            self.sequence += 1
+            if self.confirmation_tracker is not None:
+                self.confirmation_tracker.track(
+                    tx_hash,
+                    key,
+                    gas_limit,
+                    broadcast_height=timeout_height - self.height_tracker.timeout_blocks,
+                )
+        # standardized return arguments
+        return {
+            "success": True,
+            "result": res,
+            "tx_hash": tx_hash,
+            "gas_wanted": gas_limit,
+            "gas_fee": f"{gas_fee} INJ",
+            "gas_simulated": simulated,
+        }
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Union
+
+import aiohttp
+from pyinjective.core.network import Network
+
+from injective_functions.utils.http_client import get_http_session
+from injective_functions.utils.metadata_registry import MetadataRegistry, network_key
+
+logger = logging.getLogger(__name__)
+
+LCD_URLS = {
+    "mainnet": "https://sentry.lcd.injective.network",
+    "testnet": "https://testnet.sentry.lcd.injective.network",
+}
+SPOT_MARKETS_PATH = "/injective/exchange/v1beta1/spot/markets"
+DERIVATIVE_MARKETS_PATH = "/injective/exchange/v1beta1/derivative/markets"
+
+SPOT = "spot"
+DERIVATIVE = "derivative"
+
+
+def split_ticker(ticker: str):
+    """Split an exchange ticker like 'BTC/USDT PERP' into (base, quote)"""
+    pair = ticker.upper().split(" ")[0]
+    base, _, quote = pair.partition("/")
+    return base, quote
+
+
+class MarketRegistry(MetadataRegistry):
+    """
+    Spot and derivative markets of a network indexed by normalized ticker,
+    market id, base and quote symbol and market type.
+    """
+
+    def __init__(self, network_type: str = "mainnet", ttl: float = 300.0) -> None:
+        super().__init__(network_type, ttl)
+        self.by_id: Dict[str, Dict] = {}
+        self.by_ticker: Dict[str, str] = {}
+        self.by_base: Dict[str, List[str]] = {}
+        self.by_quote: Dict[str, List[str]] = {}
+        self.by_type: Dict[str, List[str]] = {SPOT: [], DERIVATIVE: []}
+
+    def resolve(self, normalized_ticker: str) -> Optional[str]:
+        """Market id of a normalized ticker such as 'BTC/USDT PERP' or 'INJ/USDT'"""
+        return self.by_ticker.get(normalized_ticker.upper())
+
+    def get_market(self, market_id: str) -> Optional[Dict]:
+        return self.by_id.get(market_id.lower())
+
+    def markets_with_base(self, base: str) -> List[Dict]:
+        return [self.by_id[market_id] for market_id in self.by_base.get(base.upper(), [])]
+
+    def markets_with_quote(self, quote: str) -> List[Dict]:
+        return [self.by_id[market_id] for market_id in self.by_quote.get(quote.upper(), [])]
+
+    def markets_of_type(self, market_type: str) -> List[Dict]:
+        return [self.by_id[market_id] for market_id in self.by_type.get(market_type, [])]
+
+    async def _load(self) -> List[Dict]:
+        base_url = LCD_URLS[self.network_type]
+        session = get_http_session()
+        spot, derivative = await asyncio.gather(
+            self._fetch(session, base_url + SPOT_MARKETS_PATH),
+            self._fetch(session, base_url + DERIVATIVE_MARKETS_PATH),
+        )
+
+        markets = []
+        for market in spot.get("markets", []):
+            markets.append(self._entry(market, SPOT))
+        for market_info in derivative.get("markets", []):
+            markets.append(self._entry(market_info.get("market", {}), DERIVATIVE))
+        return [market for market in markets if market["ticker"] and market["market_id"]]
+
+    @staticmethod
+    async def _fetch(session: aiohttp.ClientSession, request_url: str) -> Dict:
+        async with session.get(request_url) as response:
+            if response.status != 200:
+                logger.error(f"Error status code {response.status} from {request_url}")
+                return {}
+            return await response.json()
+
+    @staticmethod
+    def _entry(market: Dict, market_type: str) -> Dict:
+        ticker = market.get("ticker", "").upper()
+        market_id = market.get("market_id")
+        # Ensure market_id does not have extra quotes
+        if isinstance(market_id, str):
+            market_id = market_id.strip("'\"").lower()
+        base, quote = split_ticker(ticker)
+        return {
+            "market_id": market_id,
+            "ticker": ticker,
+            "market_type": market_type,
+            "base": base,
+            "quote": quote,
+            "base_denom": market.get("base_denom"),
+            "quote_denom": market.get("quote_denom"),
+        }
+
+    def _apply(self, markets: List[Dict]) -> None:
+        by_id, by_ticker = {}, {}
+        by_base, by_quote = {}, {}
+        by_type = {SPOT: [], DERIVATIVE: []}
+        for market in markets:
+            market_id = market["market_id"]
+            by_id[market_id] = market
+            by_ticker[market["ticker"]] = market_id
+            by_base.setdefault(market["base"], []).append(market_id)
+            by_quote.setdefault(market["quote"], []).append(market_id)
+            by_type[market["market_type"]].append(market_id)
+        # swap whole indexes so readers never see a half-built one
+        self.by_id, self.by_ticker = by_id, by_ticker
+        self.by_base, self.by_quote, self.by_type = by_base, by_quote, by_type
+
+    def export(self) -> List[Dict]:
+        return list(self.by_id.values())
+
+    def stats(self) -> Dict:
+        return {
+            **super().stats(),
+            "spot_markets": len(self.by_type[SPOT]),
+            "derivative_markets": len(self.by_type[DERIVATIVE]),
+        }
+
+
+_registries: Dict[str, MarketRegistry] = {}
+
+
+def get_market_registry(network: Union[str, bool, Network, None] = "mainnet") -> MarketRegistry:
+    """Return the market registry of a network, whichever way it is named"""
+    key = network_key(network)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = MarketRegistry(key)
+    return registry
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pyinjective.core.network import Network
+
+logger = logging.getLogger(__name__)
+
+
+def network_key(network: Union[str, bool, Network, None]) -> str:
+    """
+    Normalize the ways callers name a network to "mainnet" or "testnet".
+
+    Accepts a network type string, a pyinjective Network or an is_mainnet bool.
+    """
+    if isinstance(network, bool):
+        return "mainnet" if network else "testnet"
+    if isinstance(network, Network):
+        network = network.string()
+    return "testnet" if str(network).lower() == "testnet" else "mainnet"
+
+
+class MetadataRegistry:
+    """
+    Per-network chain metadata loaded once and kept fresh with
+    stale-while-revalidate: once loaded, readers always get the current
+    snapshot immediately and a stale snapshot only triggers a background refresh.
+
+    Subclasses implement _load() and build their lookup indexes from its result,
+    and export() to hand the current snapshot back in the shape _load() returns.
+    """
+
+    def __init__(self, network_type: str = "mainnet", ttl: float = 300.0) -> None:
+        """
+        Args:
+            network_type (str, optional): Network type ("mainnet" or "testnet"). Defaults to "mainnet".
+            ttl (float, optional): Seconds after which the snapshot is refreshed. Defaults to 300.
+        """
+        self.network_type = network_key(network_type)
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.seeded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[["MetadataRegistry"], None]] = []
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return not self.is_loaded or time.monotonic() - self.loaded_at > self.ttl
+
+    async def ensure_loaded(self) -> None:
+        """Wait for the first load, and revalidate stale data in the background"""
+        if not self.is_loaded:
+            await self._refresh_once()
+        elif self.is_stale:
+            self._schedule_refresh()
+
+    def seed(self, data: Any) -> None:
+        """
+        Serve previously exported data right away, marked stale so the first
+        read revalidates it against the chain in the background.
+        """
+        if not data or self.is_loaded:
+            return
+        self._apply(data)
+        self.loaded_at = time.monotonic() - self.ttl - 1
+        self.seeded = True
+
+    def add_refresh_listener(self, callback: Callable[["MetadataRegistry"], None]) -> None:
+        """Call callback(registry) after every successful refresh"""
+        self._listeners.append(callback)
+
+    async def refresh(self) -> None:
+        """Reload the metadata now"""
+        await self._refresh_once()
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def _refresh_once(self) -> None:
+        # concurrent callers share the refresh that is already running
+        self._schedule_refresh()
+        await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> None:
+        try:
+            data = await self._load()
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Refreshing {type(self).__name__} ({self.network_type}) failed: {e}")
+            return
+        if not data:
+            # keep serving the previous snapshot rather than an empty one
+            self.failures += 1
+            return
+        self._apply(data)
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+        for callback in self._listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Refresh listener of {type(self).__name__} failed: {e}")
+
+    async def _load(self) -> Any:
+        raise NotImplementedError
+
+    def _apply(self, data: Any) -> None:
+        raise NotImplementedError
+
+    def export(self) -> Any:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {
+            "network": self.network_type,
+            "age": time.monotonic() - self.loaded_at if self.is_loaded else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "seeded": self.seeded,
+        }
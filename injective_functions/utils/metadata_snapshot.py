@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from injective_functions.utils.denom_registry import get_denom_registry
+from injective_functions.utils.market_registry import get_market_registry
+from injective_functions.utils.metadata_registry import network_key
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the exported shape of a registry changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.getenv("METADATA_SNAPSHOT_DIR", ".metadata_snapshots")
+
+_save_tasks: Dict[str, asyncio.Task] = {}
+_save_requested: Dict[str, bool] = {}
+
+
+def snapshot_path(network_type: str = "mainnet") -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{network_key(network_type)}-v{SNAPSHOT_VERSION}.json")
+
+
+def read_snapshot(network_type: str = "mainnet") -> Optional[Dict]:
+    """Read the snapshot of a network, or None if it is missing or unusable"""
+    path = snapshot_path(network_type)
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring unreadable metadata snapshot {path}: {e}")
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def write_snapshot(network_type: str = "mainnet") -> None:
+    """Write the current denom and market metadata of a network to disk"""
+    key = network_key(network_type)
+    denoms = get_denom_registry(key)
+    markets = get_market_registry(key)
+    if not denoms.is_loaded and not markets.is_loaded:
+        return
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "network": key,
+        "saved_at": time.time(),
+        "denoms": denoms.export() if denoms.is_loaded else {},
+        "markets": markets.export() if markets.is_loaded else [],
+    }
+    path = snapshot_path(key)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # write then rename, so a reader never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+async def save_snapshot(network_type: str = "mainnet") -> None:
+    key = network_key(network_type)
+    # refreshes that land during a write are folded into one more write
+    while True:
+        _save_requested.pop(key, None)
+        try:
+            await asyncio.to_thread(write_snapshot, key)
+        except OSError as e:
+            logger.error(f"Writing metadata snapshot failed: {e}")
+            return
+        if not _save_requested.get(key):
+            return
+
+
+def _schedule_save(registry) -> None:
+    key = registry.network_type
+    task = _save_tasks.get(key)
+    if task is None or task.done():
+        _save_tasks[key] = asyncio.ensure_future(save_snapshot(key))
+    else:
+        _save_requested[key] = True
+
+
+async def warm_start(network_type: str = "mainnet") -> Dict:
+    """
+    Seed the denom and market registries of a network from its snapshot so
+    they serve right away, then reconcile them with the chain in the background.
+    Every later refresh rewrites the snapshot.
+
+    Args:
+        network_type (str, optional): Network type ("mainnet" or "testnet"). Defaults to "mainnet".
+
+    Returns:
+        Dict: whether a snapshot was used and its age in seconds
+    """
+    key = network_key(network_type)
+    denoms = get_denom_registry(key)
+    markets = get_market_registry(key)
+
+    snapshot = await asyncio.to_thread(read_snapshot, key)
+    if snapshot is not None:
+        denoms.seed(snapshot.get("denoms"))
+        markets.seed(snapshot.get("markets"))
+
+    for registry in (denoms, markets):
+        if _schedule_save not in registry._listeners:
+            registry.add_refresh_listener(_schedule_save)
+        # seeded registries are stale, so this only starts the background refresh
+        asyncio.ensure_future(registry.ensure_loaded())
+
+    return {
+        "network": key,
+        "seeded": snapshot is not None,
+        "age": time.time() - snapshot["saved_at"] if snapshot else None,
+    }
@@ -0,0 +1,430 @@
+import asyncio
+import logging
+import os
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pyinjective.client.model.pagination import PaginationOption
+from pyinjective.constant import ADDITIONAL_CHAIN_FORMAT_DECIMALS
+
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.metadata_registry import network_key
+from injective_functions.utils.orderbook_service import to_chain_dec
+
+logger = logging.getLogger(__name__)
+
+ORDER_RECONCILE_INTERVAL = float(os.getenv("ORDER_RECONCILE_INTERVAL", "30"))
+
+# Indexer states of orders still resting on the book
+OPEN_STATES = ("booked", "partial_filled")
+# State of orders broadcast by this process that the indexer has not reported yet
+SUBMITTED = "submitted"
+
+
+class OrderTrackerNotReady(RuntimeError):
+    """The tracker has not loaded the subaccount's open orders yet"""
+
+
+def _indexer_value(extended_value: Decimal) -> str:
+    # the indexer reports chain values without the extra LegacyDec decimals
+    value = extended_value.scaleb(-ADDITIONAL_CHAIN_FORMAT_DECIMALS)
+    return f"{value.normalize():f}"
+
+
+def indexer_order(
+    market,
+    market_type: str,
+    order: Dict,
+    subaccount_id: str,
+    fee_recipient: str = "",
+    tx_hash: str = "",
+) -> Dict:
+    """
+    An order placed by this process, in the shape and units the indexer reports it.
+
+    Args:
+        market: Composer SpotMarket or DerivativeMarket of the order
+        market_type (str): SPOT or DERIVATIVE
+        order (Dict): side, price, quantity and cid in human units, margin for
+            derivative orders and order_hash when already known
+        subaccount_id (str): Subaccount that placed the order
+        fee_recipient (str, optional): Fee recipient of the order. Defaults to "".
+        tx_hash (str, optional): Hash of the transaction that placed it. Defaults to "".
+    """
+    quantity = _indexer_value(market.quantity_to_chain_format(Decimal(str(order["quantity"]))))
+    created_at = str(int(time.time() * 1000))
+    indexed = {
+        "orderHash": order.get("order_hash"),
+        "orderSide": order["side"].lower().split("_")[0],
+        "marketId": market.id.lower(),
+        "subaccountId": subaccount_id,
+        "price": _indexer_value(market.price_to_chain_format(Decimal(str(order["price"])))),
+        "quantity": quantity,
+        "unfilledQuantity": quantity,
+        "triggerPrice": "0",
+        "feeRecipient": fee_recipient,
+        "state": SUBMITTED,
+        "createdAt": created_at,
+        "updatedAt": created_at,
+        "txHash": tx_hash,
+        "cid": order["cid"],
+    }
+    if market_type == DERIVATIVE:
+        indexed.update(
+            {
+                "isReduceOnly": False,
+                "margin": _indexer_value(
+                    market.margin_to_chain_format(Decimal(str(order.get("margin", 0))))
+                ),
+                "orderNumber": "0",
+                "orderType": order["side"].lower(),
+                "isConditional": False,
+                "triggerAt": "0",
+                "placedOrderHash": "",
+                "executionType": "limit",
+            }
+        )
+    return {**indexed, "marketType": market_type}
+
+
+async def fetch_open_orders(
+    fetch: Callable,
+    subaccount_id: str,
+    market_ids: List[str] = None,
+    page_size: int = 100,
+) -> List[Dict]:
+    """
+    Every open order of a subaccount from an indexer order query, across every page.
+
+    Args:
+        fetch (Callable): client.fetch_spot_orders or client.fetch_derivative_orders
+        subaccount_id (str): Subaccount whose orders are listed
+        market_ids (List[str], optional): Markets to list. Defaults to every market.
+        page_size (int, optional): Orders per page. Defaults to 100.
+    """
+    orders: List[Dict] = []
+    skip = 0
+    while True:
+        res = await fetch(
+            market_ids=market_ids,
+            subaccount_id=subaccount_id,
+            pagination=PaginationOption(skip=skip, limit=page_size),
+        )
+        page = res.get("orders", [])
+        orders.extend(page)
+        if len(page) < page_size:
+            return orders
+        skip += page_size
+
+
+def chain_order(order: Dict) -> Dict:
+    """An indexer order in the shape and LegacyDec units of the chain's trader order queries"""
+    trimmed = {
+        "price": to_chain_dec(Decimal(order["price"])),
+        "quantity": to_chain_dec(Decimal(order["quantity"])),
+        "fillable": to_chain_dec(Decimal(order.get("unfilledQuantity", order["quantity"]))),
+        "isBuy": order["orderSide"] == "buy",
+        "orderHash": order.get("orderHash") or "",
+        "cid": order.get("cid", ""),
+    }
+    if order.get("marketType") == DERIVATIVE:
+        trimmed["margin"] = to_chain_dec(Decimal(order.get("margin", "0")))
+    return trimmed
+
+
+def chain_subaccount_orders(orders: Iterable[Dict]) -> Dict:
+    """Indexer orders in the shape of the chain's subaccount orders query"""
+    by_side: Dict[str, List[Dict]] = {"buyOrders": [], "sellOrders": []}
+    for order in orders:
+        side = "buyOrders" if order["orderSide"] == "buy" else "sellOrders"
+        by_side[side].append(
+            {
+                "order": {
+                    "price": to_chain_dec(Decimal(order["price"])),
+                    "quantity": to_chain_dec(Decimal(order["quantity"])),
+                    "isReduceOnly": bool(order.get("isReduceOnly", False)),
+                    "cid": order.get("cid", ""),
+                },
+                "orderHash": order.get("orderHash") or "",
+            }
+        )
+    return by_side
+
+
+class OrderTracker:
+    """
+    Open orders of one subaccount, kept in memory so open-order queries do
+    not reach the chain.
+
+    Orders broadcast through InjectiveTrading are recorded as "submitted"
+    right away. The indexer's spot and derivative order streams then report
+    them as booked, fill them or cancel them, and a periodic reconciliation
+    against the indexer repairs anything the streams missed.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        subaccount_id: str = None,
+        reconcile_interval: float = ORDER_RECONCILE_INTERVAL,
+        reconnect_delay: float = 1.0,
+        submitted_ttl: float = 60.0,
+        idle_ttl: float = 900.0,
+    ) -> None:
+        """
+        Args:
+            client: AsyncClient used for order queries and streams
+            subaccount_id (str): Subaccount whose orders are tracked
+            reconcile_interval (float, optional): Seconds between reconciliations. Defaults to ORDER_RECONCILE_INTERVAL.
+            reconnect_delay (float, optional): Seconds before a dropped stream is reopened. Defaults to 1.
+            submitted_ttl (float, optional): Seconds a submitted order the indexer never reported is kept. Defaults to 60.
+            idle_ttl (float, optional): Seconds without reads or orders before the tracker stops. Defaults to 900.
+        """
+        self.client = client
+        self.subaccount_id = subaccount_id
+        self.reconcile_interval = reconcile_interval
+        self.reconnect_delay = reconnect_delay
+        self.submitted_ttl = submitted_ttl
+        self.idle_ttl = idle_ttl
+        # order hash -> open order as reported by the indexer
+        self._orders: Dict[str, Dict] = {}
+        # cid -> order broadcast by this process and not reported yet
+        self._submitted: Dict[str, Dict] = {}
+        # cid -> monotonic time the submitted order was recorded
+        self._submitted_at: Dict[str, float] = {}
+        # events received while a reconciliation is loading, replayed on top of it
+        self._buffer: Optional[List[Tuple[str, Dict]]] = None
+        self.ready = asyncio.Event()
+        self._reconcile_lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        self._tasks: List[asyncio.Task] = []
+        self.events = 0
+        self.reconciliations = 0
+        self.corrections = 0
+        self.hits = 0
+
+    def start(self) -> None:
+        """Open the order streams and the reconciliation loop if they are not running"""
+        self.last_used = time.monotonic()
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        self.ready.clear()
+        self._tasks = [
+            asyncio.ensure_future(self._stream(SPOT)),
+            asyncio.ensure_future(self._stream(DERIVATIVE)),
+            asyncio.ensure_future(self._reconcile_forever()),
+        ]
+
+    async def open_orders(
+        self, market_ids: Iterable[str] = None, market_type: str = None
+    ) -> List[Dict]:
+        """
+        Open orders the indexer reported, optionally limited to some markets and one market type.
+
+        Raises:
+            OrderTrackerNotReady: until the first reconciliation has finished
+        """
+        self._check_ready()
+        self.hits += 1
+        return _matching(self._orders.values(), market_ids, market_type)
+
+    async def orders_by_hash(
+        self, order_hashes: Iterable[str], market_id: str = None
+    ) -> List[Dict]:
+        """Open orders among order_hashes, optionally only those of one market"""
+        self._check_ready()
+        self.hits += 1
+        orders = []
+        for order_hash in order_hashes:
+            order = self._orders.get(order_hash.lower())
+            if order is not None and (
+                market_id is None or order["marketId"].lower() == market_id.lower()
+            ):
+                orders.append(dict(order))
+        return orders
+
+    def submitted_orders(
+        self, market_ids: Iterable[str] = None, market_type: str = None
+    ) -> List[Dict]:
+        """Orders broadcast by this process that the indexer has not reported yet"""
+        return _matching(self._submitted.values(), market_ids, market_type)
+
+    def _check_ready(self) -> None:
+        # reads never wait for the first load, callers query the chain meanwhile
+        self.start()
+        if not self.ready.is_set():
+            raise OrderTrackerNotReady(f"Orders of {self.subaccount_id} are still loading")
+
+    def record_submitted(self, orders: Iterable[Dict]) -> None:
+        """
+        Record orders accepted into the mempool until the streams report them.
+
+        Args:
+            orders (Iterable[Dict]): Orders as built by indexer_order
+        """
+        now = time.monotonic()
+        for order in orders:
+            self._submitted[order["cid"]] = order
+            self._submitted_at[order["cid"]] = now
+        self.start()
+
+    def _on_event(self, market_type: str, event: Dict) -> None:
+        order = event.get("order")
+        if not order:
+            return
+        self.events += 1
+        if self._buffer is not None:
+            self._buffer.append((market_type, order))
+        self._apply(market_type, order)
+
+    def _apply(self, market_type: str, order: Dict) -> None:
+        order_hash = order.get("orderHash", "").lower()
+        if order.get("cid"):
+            self._forget_submitted(order["cid"])
+        if order.get("state") in OPEN_STATES:
+            self._orders[order_hash] = {**order, "marketType": market_type}
+        else:
+            # filled or cancelled
+            self._orders.pop(order_hash, None)
+
+    async def _stream(self, market_type: str) -> None:
+        listen = (
+            self.client.listen_derivative_orders_updates
+            if market_type == DERIVATIVE
+            else self.client.listen_spot_orders_updates
+        )
+
+        async def on_event(event: Dict) -> None:
+            self._on_event(market_type, event)
+
+        while True:
+            try:
+                await listen(callback=on_event, subaccount_id=self.subaccount_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Order stream of {self.subaccount_id} failed: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+            # events were missed while the stream was down
+            await self._safe_reconcile()
+
+    async def _reconcile_forever(self) -> None:
+        while True:
+            await self._safe_reconcile()
+            await asyncio.sleep(self.reconcile_interval)
+            if time.monotonic() - self.last_used > self.idle_ttl:
+                # nobody reads or places orders here anymore
+                _release(self)
+                await self.close()
+                return
+
+    async def _safe_reconcile(self) -> None:
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logger.error(f"Reconciling orders of {self.subaccount_id} failed: {e}")
+
+    async def reconcile(self) -> None:
+        """Replace the open orders with the indexer's, keeping events that arrived meanwhile"""
+        async with self._reconcile_lock:
+            await self._reconcile()
+
+    async def _reconcile(self) -> None:
+        self._buffer = []
+        try:
+            spot_orders, derivative_orders = await asyncio.gather(
+                fetch_open_orders(self.client.fetch_spot_orders, self.subaccount_id),
+                fetch_open_orders(self.client.fetch_derivative_orders, self.subaccount_id),
+            )
+            buffered = self._buffer
+        finally:
+            self._buffer = None
+
+        orders = {}
+        for market_type, fetched in ((SPOT, spot_orders), (DERIVATIVE, derivative_orders)):
+            for order in fetched:
+                orders[order["orderHash"].lower()] = {**order, "marketType": market_type}
+        if self.ready.is_set() and orders.keys() != self._orders.keys():
+            self.corrections += 1
+        self._orders = orders
+        for order in orders.values():
+            if order.get("cid"):
+                self._forget_submitted(order["cid"])
+        for market_type, order in buffered:
+            self._apply(market_type, order)
+
+        now = time.monotonic()
+        for cid, submitted_at in list(self._submitted_at.items()):
+            # rejected in the block, or filled and gone before it was ever reported
+            if now - submitted_at > self.submitted_ttl:
+                self._forget_submitted(cid)
+        self.reconciliations += 1
+        self.ready.set()
+
+    def _forget_submitted(self, cid: str) -> None:
+        self._submitted.pop(cid, None)
+        self._submitted_at.pop(cid, None)
+
+    async def close(self) -> None:
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        self._tasks = []
+        self.ready.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "open_orders": len(self._orders),
+            "submitted": len(self._submitted),
+            "ready": self.ready.is_set(),
+            "events": self.events,
+            "reconciliations": self.reconciliations,
+            "corrections": self.corrections,
+            "hits": self.hits,
+        }
+
+
+def _matching(
+    orders: Iterable[Dict], market_ids: Iterable[str] = None, market_type: str = None
+) -> List[Dict]:
+    markets = {market_id.lower() for market_id in market_ids} if market_ids else None
+    return [
+        dict(order)
+        for order in orders
+        if (markets is None or order["marketId"].lower() in markets)
+        and (market_type is None or order["marketType"] == market_type)
+    ]
+
+
+_trackers: Dict[Tuple[str, str], OrderTracker] = {}
+
+
+def get_order_tracker(network_type: str, subaccount_id: str) -> OrderTracker:
+    """Return the order tracker of a subaccount, shared by every agent trading it"""
+    key = (network_key(network_type), subaccount_id.lower())
+    tracker = _trackers.get(key)
+    if tracker is None:
+        tracker = _trackers[key] = OrderTracker(
+            get_client_pool(key[0]).get_client(), subaccount_id
+        )
+    return tracker
+
+
+def _release(tracker: OrderTracker) -> None:
+    """Drop an idle tracker from the registry, the next read opens a fresh one"""
+    for key, registered in list(_trackers.items()):
+        if registered is tracker:
+            del _trackers[key]
+
+
+def order_tracker_stats() -> Dict:
+    return {
+        "subaccounts": len(_trackers),
+        "running": sum(1 for tracker in _trackers.values() if tracker._tasks),
+        "open_orders": sum(len(tracker._orders) for tracker in _trackers.values()),
+        "hits": sum(tracker.hits for tracker in _trackers.values()),
+        "corrections": sum(tracker.corrections for tracker in _trackers.values()),
+    }
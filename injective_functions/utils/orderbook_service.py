@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.metadata_registry import network_key
+
+logger = logging.getLogger(__name__)
+
+# LegacyDec amounts of the chain exchange queries are integers scaled by 10^18
+CHAIN_DEC_PLACES = 18
+
+
+def to_chain_dec(value: Decimal) -> str:
+    """Encode an indexer price or quantity the way chain orderbook levels carry it"""
+    return str(int(value.scaleb(CHAIN_DEC_PLACES).to_integral_value()))
+
+
+class OrderbookSide:
+    """Price levels of one side of a book, kept sorted by price"""
+
+    def __init__(self, descending: bool) -> None:
+        self.descending = descending
+        self.levels: Dict[Decimal, Decimal] = {}
+        self._prices: List[Decimal] = []
+
+    def set(self, price: Decimal, quantity: Decimal) -> None:
+        if quantity <= 0:
+            self.remove(price)
+            return
+        if price not in self.levels:
+            insort(self._prices, price)
+        self.levels[price] = quantity
+
+    def remove(self, price: Decimal) -> None:
+        if self.levels.pop(price, None) is not None:
+            del self._prices[bisect_left(self._prices, price)]
+
+    def clear(self) -> None:
+        self.levels.clear()
+        self._prices.clear()
+
+    def best(self) -> Optional[Decimal]:
+        if not self._prices:
+            return None
+        return self._prices[-1] if self.descending else self._prices[0]
+
+    def top(self, depth: Optional[int] = None) -> List[Dict[str, str]]:
+        """Best depth levels as {"p", "q"} entries of a chain orderbook query"""
+        prices = reversed(self._prices) if self.descending else iter(self._prices)
+        levels = []
+        for price in prices:
+            if depth is not None and len(levels) >= depth:
+                break
+            levels.append({"p": to_chain_dec(price), "q": to_chain_dec(self.levels[price])})
+        return levels
+
+
+class OrderbookReplica:
+    """In-memory copy of one market's order book, kept current by sequence number"""
+
+    def __init__(self, market_id: str, market_type: str) -> None:
+        self.market_id = market_id
+        self.market_type = market_type
+        self.buys = OrderbookSide(descending=True)
+        self.sells = OrderbookSide(descending=False)
+        self.sequence: Optional[int] = None
+        self.updated_at: Optional[float] = None
+        self.last_used = time.monotonic()
+
+    def apply_snapshot(self, orderbook: Dict) -> None:
+        self.buys.clear()
+        self.sells.clear()
+        for level in orderbook.get("buys", []):
+            self.buys.set(Decimal(level["price"]), Decimal(level["quantity"]))
+        for level in orderbook.get("sells", []):
+            self.sells.set(Decimal(level["price"]), Decimal(level["quantity"]))
+        self.sequence = int(orderbook.get("sequence", 0))
+        self.updated_at = time.monotonic()
+
+    def apply_update(self, update: Dict) -> bool:
+        """
+        Apply a level update on top of the book.
+
+        Returns:
+            bool: False if updates were missed and the book needs a new snapshot
+        """
+        sequence = int(update.get("sequence", 0))
+        if self.sequence is not None and sequence <= self.sequence:
+            # already contained in the snapshot
+            return True
+        if self.sequence is None or sequence != self.sequence + 1:
+            return False
+        for side, levels in ((self.buys, update.get("buys", [])), (self.sells, update.get("sells", []))):
+            for level in levels:
+                price = Decimal(level["price"])
+                if level.get("isActive", True):
+                    side.set(price, Decimal(level["quantity"]))
+                else:
+                    side.remove(price)
+        self.sequence = sequence
+        self.updated_at = time.monotonic()
+        return True
+
+    def chain_orderbook(self, depth: Optional[int] = None) -> Dict:
+        """
+        Top depth levels in the shape and units of fetch_chain_spot_orderbook
+        and fetch_chain_derivative_orderbook.
+
+        The indexer streams the same chain prices and quantities as plain
+        decimals, so only the LegacyDec encoding differs.
+        """
+        return {
+            "buysPriceLevel": self.buys.top(depth),
+            "sellsPriceLevel": self.sells.top(depth),
+        }
+
+
+class MarketSubscription:
+    def __init__(self, replica: OrderbookReplica) -> None:
+        self.replica = replica
+        self.ready = asyncio.Event()
+        self.buffer: Optional[List[Dict]] = []
+        self.task: Optional[asyncio.Task] = None
+        self.resync_task: Optional[asyncio.Task] = None
+        # snapshot loads in a row that failed or were outdated by the buffer
+        self.failed_loads = 0
+
+
+class OrderbookService:
+    """
+    Order book replicas of the markets in use on one network, fed by the
+    indexer's orderbook update streams.
+
+    The first read of a market subscribes to its updates and loads a snapshot.
+    A gap in the update sequence reloads the snapshot, and markets nobody has
+    read for idle_ttl seconds are unsubscribed. A market whose snapshot keeps
+    failing is unsubscribed after max_snapshot_attempts, and the next read
+    subscribes it again.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        idle_ttl: float = 300.0,
+        ready_timeout: float = 1.0,
+        reconnect_delay: float = 1.0,
+        max_backoff: float = 30.0,
+        max_snapshot_attempts: int = 6,
+    ) -> None:
+        """
+        Args:
+            client: AsyncClient used for snapshots and streams
+            idle_ttl (float, optional): Seconds without reads before a market is unsubscribed. Defaults to 300.
+            ready_timeout (float, optional): Seconds a read waits for a snapshot before the caller falls back to the chain. Defaults to 1.
+            reconnect_delay (float, optional): Seconds before a dropped stream is reopened or a snapshot retried, doubled per failed snapshot. Defaults to 1.
+            max_backoff (float, optional): Longest delay between snapshot retries. Defaults to 30.
+            max_snapshot_attempts (int, optional): Snapshot loads in a row before the market is unsubscribed. Defaults to 6.
+        """
+        self.client = client
+        self.idle_ttl = idle_ttl
+        self.ready_timeout = ready_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_backoff = max_backoff
+        self.max_snapshot_attempts = max_snapshot_attempts
+        self._subscriptions: Dict[str, MarketSubscription] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.resyncs = 0
+        self.gaps = 0
+        self.unsubscribes = 0
+        self.abandoned = 0
+
+    async def get_orderbook(
+        self, market_id: str, market_type: str = SPOT, depth: Optional[int] = None
+    ) -> Dict:
+        """
+        Top depth levels of a market from its local replica, as the chain orderbook queries return them.
+
+        Raises:
+            asyncio.TimeoutError: if no snapshot is loaded within ready_timeout
+        """
+        subscription = self._subscribe(market_id.lower(), market_type)
+        subscription.replica.last_used = time.monotonic()
+        if not subscription.ready.is_set():
+            await asyncio.wait_for(subscription.ready.wait(), self.ready_timeout)
+        return subscription.replica.chain_orderbook(depth)
+
+    def _subscribe(self, market_id: str, market_type: str) -> MarketSubscription:
+        subscription = self._subscriptions.get(market_id)
+        if subscription is None:
+            subscription = MarketSubscription(OrderbookReplica(market_id, market_type))
+            self._subscriptions[market_id] = subscription
+            subscription.task = asyncio.ensure_future(self._stream(subscription))
+            self._resync(subscription)
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.ensure_future(self._sweep_idle())
+        return subscription
+
+    async def _stream(self, subscription: MarketSubscription) -> None:
+        replica = subscription.replica
+        listen = (
+            self.client.listen_derivative_orderbook_updates
+            if replica.market_type == DERIVATIVE
+            else self.client.listen_spot_orderbook_updates
+        )
+
+        async def on_update(event: Dict) -> None:
+            self._on_update(subscription, event.get("orderbookLevelUpdates", {}))
+
+        while True:
+            try:
+                await listen(market_ids=[replica.market_id], callback=on_update)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Orderbook stream of {replica.market_id} failed: {e}")
+            # updates were missed while the stream was down
+            await asyncio.sleep(self.reconnect_delay)
+            self._resync(subscription)
+
+    def _on_update(self, subscription: MarketSubscription, update: Dict) -> None:
+        self.updates += 1
+        if subscription.buffer is not None:
+            # a snapshot is loading, replay this once it is in
+            subscription.buffer.append(update)
+            return
+        if not subscription.replica.apply_update(update):
+            self.gaps += 1
+            self._resync(subscription)
+
+    def _resync(self, subscription: MarketSubscription) -> None:
+        if subscription.resync_task is not None and not subscription.resync_task.done():
+            return
+        if subscription.buffer is None:
+            subscription.buffer = []
+        # readers wait for the new snapshot rather than read a book with holes
+        subscription.ready.clear()
+        subscription.resync_task = asyncio.ensure_future(self._load_snapshot(subscription))
+
+    async def _load_snapshot(self, subscription: MarketSubscription) -> None:
+        replica = subscription.replica
+        fetch = (
+            self.client.fetch_derivative_orderbook_v2
+            if replica.market_type == DERIVATIVE
+            else self.client.fetch_spot_orderbook_v2
+        )
+        while True:
+            if subscription.failed_loads >= self.max_snapshot_attempts:
+                logger.error(
+                    f"Giving up on the orderbook of {replica.market_id} "
+                    f"after {subscription.failed_loads} snapshots"
+                )
+                self.abandoned += 1
+                self._unsubscribe(replica.market_id)
+                return
+            if subscription.failed_loads:
+                await asyncio.sleep(
+                    min(self.reconnect_delay * 2 ** (subscription.failed_loads - 1), self.max_backoff)
+                )
+            try:
+                response = await fetch(market_id=replica.market_id)
+            except Exception as e:
+                logger.error(f"Orderbook snapshot of {replica.market_id} failed: {e}")
+                subscription.failed_loads += 1
+                continue
+
+            replica.apply_snapshot(response.get("orderbook", {}))
+            self.resyncs += 1
+            buffered, subscription.buffer = subscription.buffer or [], []
+            if all(replica.apply_update(update) for update in buffered):
+                break
+            # the snapshot is older than the buffered updates, load another
+            self.gaps += 1
+            subscription.failed_loads += 1
+
+        subscription.buffer = None
+        subscription.failed_loads = 0
+        subscription.ready.set()
+
+    async def _sweep_idle(self) -> None:
+        while self._subscriptions:
+            await asyncio.sleep(self.idle_ttl / 2)
+            now = time.monotonic()
+            for market_id, subscription in list(self._subscriptions.items()):
+                if now - subscription.replica.last_used > self.idle_ttl:
+                    self._unsubscribe(market_id)
+
+    def _unsubscribe(self, market_id: str) -> None:
+        subscription = self._subscriptions.pop(market_id, None)
+        if subscription is None:
+            return
+        current = asyncio.current_task()
+        for task in (subscription.task, subscription.resync_task):
+            if task is not None and task is not current:
+                task.cancel()
+        self.unsubscribes += 1
+
+    async def close(self) -> None:
+        for market_id in list(self._subscriptions):
+            self._unsubscribe(market_id)
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def stats(self) -> Dict:
+        return {
+            "markets": len(self._subscriptions),
+            "ready": sum(1 for s in self._subscriptions.values() if s.ready.is_set()),
+            "updates": self.updates,
+            "resyncs": self.resyncs,
+            "gaps": self.gaps,
+            "unsubscribes": self.unsubscribes,
+            "abandoned": self.abandoned,
+        }
+
+
+_services: Dict[str, OrderbookService] = {}
+
+
+def get_orderbook_service(network_type: str = "mainnet") -> OrderbookService:
+    """Return the orderbook service shared by every agent on a network"""
+    key = network_key(network_type)
+    service = _services.get(key)
+    if service is None:
+        service = _services[key] = OrderbookService(get_client_pool(key).get_client())
+    return service
@@ -0,0 +1,210 @@
+import logging
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from pyinjective.client.model.pagination import PaginationOption
+
+from injective_functions.utils.amounts import AmountFormatter
+from injective_functions.utils.helpers import fan_out
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_positions(
+    client, subaccount_id: str, market_ids: List[str] = None, page_size: int = 100
+) -> Dict:
+    """
+    Every open derivative position of a subaccount from the indexer, across every page.
+
+    Returns:
+        Dict: {"success", "result"} with the indexer's positions, as fan_out expects
+    """
+    positions: List[Dict] = []
+    skip = 0
+    while True:
+        res = await client.fetch_derivative_positions_v2(
+            market_ids=market_ids,
+            subaccount_id=subaccount_id,
+            pagination=PaginationOption(skip=skip, limit=page_size),
+        )
+        page = res.get("positions", [])
+        positions.extend(page)
+        if len(page) < page_size:
+            return {"success": True, "result": positions}
+        skip += page_size
+
+
+def mark_prices(positions: List[Dict]) -> Dict[str, str]:
+    """One mark price per market, the latest the indexer reported across subaccounts"""
+    marks: Dict[str, tuple] = {}
+    for position in positions:
+        updated_at = int(position.get("updatedAt", 0))
+        market_id = position["marketId"]
+        if market_id not in marks or updated_at > marks[market_id][0]:
+            marks[market_id] = (updated_at, position["markPrice"])
+    return {market_id: mark for market_id, (_, mark) in marks.items()}
+
+
+def priced_positions(
+    positions: List[Dict], formatter: AmountFormatter
+) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Split positions into those whose quote denom decimals are known and errors for the rest.
+
+    Returns:
+        Tuple[List[Dict], Dict[str, Dict]]: the positions that can be valued, and an error
+            per "<subaccount_id>/<market_id>" position that cannot
+    """
+    priced, errors = [], {}
+    for position in positions:
+        denom = position.get("denom")
+        if denom in formatter:
+            priced.append(position)
+            continue
+        logger.warning(
+            f"Skipping position of {position['subaccountId']} in {position['marketId']}, "
+            f"decimals of {denom} are unknown"
+        )
+        errors[f"{position['subaccountId']}/{position['marketId']}"] = {
+            "message": f"Decimals of quote denom {denom} are unknown",
+            "type": "UnknownDenom",
+        }
+    return priced, errors
+
+
+def position_metrics(positions: List[Dict], formatter: AmountFormatter) -> List[Dict]:
+    """
+    Unrealized PnL, notional, equity and leverage of many positions.
+
+    Every column is scaled to human units once and the metrics are computed
+    column-wise over all positions, with every position of a market valued
+    at the same mark price. The decimals of every quote denom must be known,
+    see priced_positions.
+    """
+    marks = mark_prices(positions)
+    # prices and margins are in the quote denom's smallest unit
+    scales = [
+        Decimal(1).scaleb(-formatter.decimals_for(position.get("denom")))
+        for position in positions
+    ]
+    quantities = [Decimal(position["quantity"]) for position in positions]
+    signs = [1 if position["direction"] == "long" else -1 for position in positions]
+    entries = [Decimal(p["entryPrice"]) * s for p, s in zip(positions, scales)]
+    marks_human = [Decimal(marks[p["marketId"]]) * s for p, s in zip(positions, scales)]
+    margins = [Decimal(p["margin"]) * s for p, s in zip(positions, scales)]
+
+    notionals = [q * m for q, m in zip(quantities, marks_human)]
+    pnls = [q * (m - e) * d for q, m, e, d in zip(quantities, marks_human, entries, signs)]
+    equities = [margin + pnl for margin, pnl in zip(margins, pnls)]
+    leverages = [round(n / eq, 4) if eq > 0 else None for n, eq in zip(notionals, equities)]
+
+    return [
+        {
+            "market_id": position["marketId"],
+            "ticker": position.get("ticker"),
+            "subaccount_id": position["subaccountId"],
+            "direction": position["direction"],
+            "quantity": quantity,
+            "entry_price": entry,
+            "mark_price": mark,
+            "margin": margin,
+            "notional": notional,
+            "unrealized_pnl": pnl,
+            "equity": equity,
+            "leverage": leverage,
+        }
+        for position, quantity, entry, mark, margin, notional, pnl, equity, leverage in zip(
+            positions, quantities, entries, marks_human, margins, notionals, pnls, equities, leverages
+        )
+    ]
+
+
+def summarize(metrics: List[Dict], key: Optional[str] = None) -> Dict:
+    """Totals of position metrics, overall or grouped by key such as "market_id" """
+    if key is not None:
+        groups: Dict[str, List[Dict]] = {}
+        for metric in metrics:
+            groups.setdefault(metric[key], []).append(metric)
+        return {value: summarize(group) for value, group in groups.items()}
+
+    margin = sum((metric["margin"] for metric in metrics), Decimal(0))
+    notional = sum((metric["notional"] for metric in metrics), Decimal(0))
+    pnl = sum((metric["unrealized_pnl"] for metric in metrics), Decimal(0))
+    equity = margin + pnl
+    summary = {
+        "positions": len(metrics),
+        "margin": margin,
+        "notional": notional,
+        "unrealized_pnl": pnl,
+        "equity": equity,
+        "leverage": round(notional / equity, 4) if equity > 0 else None,
+    }
+    if len({metric["market_id"] for metric in metrics}) == 1:
+        # quantities only add up within one market
+        summary["net_quantity"] = sum(
+            (
+                metric["quantity"] if metric["direction"] == "long" else -metric["quantity"]
+                for metric in metrics
+            ),
+            Decimal(0),
+        )
+    return summary
+
+
+def _as_strings(value):
+    if isinstance(value, dict):
+        return {key: _as_strings(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_as_strings(item) for item in value]
+    if isinstance(value, Decimal):
+        return f"{value.normalize():f}"
+    return value
+
+
+async def portfolio_snapshot(
+    client,
+    subaccount_ids: List[str],
+    formatter: AmountFormatter,
+    market_ids: List[str] = None,
+    max_concurrency: int = None,
+) -> Dict:
+    """
+    Positions of many subaccounts, fetched concurrently and aggregated into one snapshot.
+
+    Args:
+        client: AsyncClient used for the position queries
+        subaccount_ids (List[str]): Subaccounts to include
+        formatter (AmountFormatter): Decimals of the quote denoms
+        market_ids (List[str], optional): Markets to include. Defaults to every market.
+        max_concurrency (int, optional): Subaccount queries in flight. Defaults to FAN_OUT_CONCURRENCY.
+
+    Returns:
+        Dict: "positions", per "markets" and per "subaccounts" totals, overall "totals",
+            and under "errors" the subaccounts whose positions could not be fetched and
+            the positions that could not be valued
+    """
+    if market_ids:
+        market_ids = [market_id.lower() for market_id in market_ids]
+    fetched = await fan_out(
+        subaccount_ids,
+        lambda subaccount_id: fetch_positions(client, subaccount_id, market_ids),
+        max_concurrency,
+    )
+    positions, unpriced = priced_positions(
+        [
+            position
+            for subaccount_positions in fetched["result"].values()
+            for position in subaccount_positions
+        ],
+        formatter,
+    )
+    metrics = position_metrics(positions, formatter)
+    return _as_strings(
+        {
+            "positions": metrics,
+            "markets": summarize(metrics, "market_id"),
+            "subaccounts": summarize(metrics, "subaccount_id"),
+            "totals": summarize(metrics),
+            "errors": {**fetched["errors"], **unpriced},
+        }
+    )
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from injective_functions.utils.http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# CoinGecko id of the INJ token
+INJ_ASSET = "injective-protocol"
+
+COINGECKO_PRICE_URL = os.getenv(
+    "COINGECKO_PRICE_URL", "https://api.coingecko.com/api/v3/simple/price"
+)
+PRICE_REFRESH_INTERVAL = float(os.getenv("PRICE_REFRESH_INTERVAL", "30"))
+PRICE_MAX_STALENESS = float(os.getenv("PRICE_MAX_STALENESS", "300"))
+
+
+class StalePriceError(LookupError):
+    """Raised when no quote of an asset is fresh enough to use"""
+
+
+class PriceBackend(ABC):
+    """Source of USD prices, keyed by asset id"""
+
+    name = "backend"
+
+    @abstractmethod
+    async def fetch(self, assets: List[str]) -> Dict[str, float]:
+        """USD prices of the assets, leaving out those the backend has no price of"""
+
+
+class CoinGeckoBackend(PriceBackend):
+    name = "coingecko"
+
+    def __init__(self, url: str = COINGECKO_PRICE_URL) -> None:
+        self.url = url
+
+    async def fetch(self, assets: List[str]) -> Dict[str, float]:
+        params = {"ids": ",".join(assets), "vs_currencies": "usd"}
+        async with get_http_session().get(self.url, params=params) as response:
+            if response.status != 200:
+                logger.error(f"Error status code {response.status} from {self.url}")
+                return {}
+            data = await response.json()
+        return {
+            asset: float(data[asset]["usd"])
+            for asset in assets
+            if "usd" in data.get(asset, {})
+        }
+
+
+class StaticPriceBackend(PriceBackend):
+    """Fixed prices, for tests and local runs without network access"""
+
+    name = "static"
+
+    def __init__(self, prices: Dict[str, float]) -> None:
+        self.prices = dict(prices)
+
+    async def fetch(self, assets: List[str]) -> Dict[str, float]:
+        return {asset: self.prices[asset] for asset in assets if asset in self.prices}
+
+
+class PriceProvider:
+    """
+    Cached USD quotes of the tracked assets, refreshed in the background so
+    readers never wait on the price backend once the first quote is in.
+    """
+
+    def __init__(
+        self,
+        backend: PriceBackend,
+        assets: Iterable[str] = (INJ_ASSET,),
+        refresh_interval: float = PRICE_REFRESH_INTERVAL,
+        max_staleness: float = PRICE_MAX_STALENESS,
+    ) -> None:
+        """
+        Args:
+            backend (PriceBackend): Source of the prices
+            assets (Iterable[str], optional): Asset ids tracked from the start. Defaults to INJ.
+            refresh_interval (float, optional): Seconds between background refreshes. Defaults to PRICE_REFRESH_INTERVAL.
+            max_staleness (float, optional): Age in seconds after which a quote is refused. Defaults to PRICE_MAX_STALENESS.
+        """
+        self.backend = backend
+        self.assets = set(assets)
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.quotes: Dict[str, Dict] = {}
+        self.refreshes = 0
+        self.failures = 0
+        self._refresh_lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+
+    def track(self, *assets: str) -> None:
+        self.assets.update(assets)
+
+    def get_quote(self, asset: str = INJ_ASSET) -> Dict:
+        """
+        Cached quote of an asset, without any I/O.
+
+        Raises:
+            StalePriceError: if there is no quote yet or it is older than max_staleness
+        """
+        if asset not in self.assets:
+            self.track(asset)
+        quote = self.quotes.get(asset)
+        if quote is None:
+            raise StalePriceError(f"No price of {asset} yet")
+        age = time.monotonic() - quote["updated_at"]
+        if age > self.max_staleness:
+            raise StalePriceError(f"Price of {asset} is {age:.1f}s old")
+        return {**quote, "age": age}
+
+    async def get_price(self, asset: str = INJ_ASSET) -> float:
+        """USD price of an asset, only waiting on the backend before its first quote"""
+        self.start()
+        if asset not in self.quotes:
+            self.track(asset)
+            await self.refresh(only_missing=True)
+        return self.get_quote(asset)["price"]
+
+    async def refresh(self, only_missing: bool = False) -> None:
+        """
+        Fetch the tracked assets from the backend.
+
+        Raises:
+            StalePriceError: if the backend request failed
+        """
+        async with self._refresh_lock:
+            # readers queued behind another refresh reuse its result
+            if only_missing and self.assets.issubset(self.quotes):
+                return
+            try:
+                prices = await self.backend.fetch(sorted(self.assets))
+            except Exception as e:
+                self.failures += 1
+                raise StalePriceError(
+                    f"Refreshing prices from {self.backend.name} failed: {e}"
+                ) from e
+            if not prices:
+                # keep serving the previous quotes until they are too old
+                self.failures += 1
+                return
+            updated_at = time.monotonic()
+            for asset, price in prices.items():
+                self.quotes[asset] = {
+                    "price": price,
+                    "updated_at": updated_at,
+                    "source": self.backend.name,
+                }
+            self.refreshes += 1
+
+    def start(self) -> None:
+        """Start the background refresher if it is not running"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except StalePriceError as e:
+                logger.error(str(e))
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "backend": self.backend.name,
+            "assets": sorted(self.assets),
+            "ages": {asset: now - quote["updated_at"] for asset, quote in self.quotes.items()},
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+_provider: Optional[PriceProvider] = None
+
+
+def get_price_provider() -> PriceProvider:
+    """Return the process-wide price provider, backed by CoinGecko unless configured otherwise"""
+    global _provider
+    if _provider is None:
+        _provider = PriceProvider(CoinGeckoBackend())
+    return _provider
+
+
+def configure_price_provider(backend: PriceBackend, **kwargs) -> PriceProvider:
+    """Replace the process-wide price provider, e.g. with a StaticPriceBackend in tests"""
+    global _provider
+    _provider = PriceProvider(backend, **kwargs)
+    return _provider
+
@@ -0,0 +1,220 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from pyinjective.core.network import Network
+
+from injective_functions.utils.market_registry import get_market_registry, MarketRegistry
+from injective_functions.utils.metadata_registry import network_key
+
+# Quote symbols recognised at the end of concatenated tickers like "ethusdc",
+# longest first so "usdt" wins over "usd"
+QUOTE_SUFFIXES = ("USDT", "USDC", "INJ", "USD")
+DEFAULT_QUOTE = "USDT"
+
+_PERP_RE = re.compile(r"[\s/_-]*(perp(etual)?|futures?|swap)[\s/_-]*", re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"[\s/_:-]+")
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+_BASE_RE = re.compile(r"^[A-Z0-9]{2,10}$")
+
+PERP = "PERP"
+SPOT = "SPOT"
+
+# Contribution of base similarity, matching quote and matching market type to a confidence
+BASE_WEIGHT = 0.6
+QUOTE_WEIGHT = 0.2
+TYPE_WEIGHT = 0.2
+
+
+@lru_cache(maxsize=4096)
+def parse_ticker(ticker_symbol: str) -> Tuple[str, str, str]:
+    """
+    Split a free-form ticker into (base, quote, market_type), memoized.
+
+    Accepts 'btc', 'btc perp', 'BTC-USDT-PERP', 'btcusdt-perp', 'eth/usdc' and similar.
+    """
+    if not ticker_symbol or not ticker_symbol.strip():
+        raise ValueError("Market ID cannot be empty")
+
+    market = ticker_symbol.strip()
+    market, perp_count = _PERP_RE.subn(" ", market)
+    market_type = PERP if perp_count else SPOT
+
+    parts = [part for part in _SEPARATOR_RE.split(market.upper()) if part]
+    if len(parts) >= 2:
+        base, quote = parts[0], parts[1]
+    elif parts:
+        base, quote = parts[0], DEFAULT_QUOTE
+        for suffix in QUOTE_SUFFIXES:
+            if len(base) > len(suffix) and base.endswith(suffix):
+                base, quote = base[: -len(suffix)], suffix
+                break
+    else:
+        base, quote = "", DEFAULT_QUOTE
+
+    base = _NON_ALNUM_RE.sub("", base)
+    quote = _NON_ALNUM_RE.sub("", quote) or DEFAULT_QUOTE
+    if not _BASE_RE.match(base):
+        raise ValueError(f"Invalid base currency format: {base}")
+    return base, quote, market_type
+
+
+def format_ticker(base: str, quote: str, market_type: str) -> str:
+    """Exchange ticker format, e.g. 'BTC/USDT PERP' or 'INJ/USDT'"""
+    return f"{base}/{quote} {PERP}" if market_type == PERP else f"{base}/{quote}"
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TickerResolver:
+    """
+    Resolves free-form tickers to markets of one network with confidence scores.
+
+    Exact matches come straight from the market registry. Everything else is
+    ranked by trigram similarity and prefix matches of the base symbol, plus
+    agreement of quote and market type, over an index rebuilt whenever the
+    registry swaps in a new snapshot.
+    """
+
+    def __init__(self, registry: MarketRegistry, memo_size: int = 4096) -> None:
+        """
+        Args:
+            registry (MarketRegistry): Market registry of the network
+            memo_size (int, optional): Number of distinct queries memoized per snapshot. Defaults to 4096.
+        """
+        self.registry = registry
+        self.memo_size = memo_size
+        self._snapshot = None
+        self._trigram_index: Dict[str, List[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+        self._bases: List[str] = []
+        self._match = lru_cache(maxsize=memo_size)(self._rank)
+
+    async def resolve(self, ticker_symbol: str, limit: int = 5) -> List[Dict]:
+        """Load the markets if needed, then rank them against ticker_symbol"""
+        await self.registry.ensure_loaded()
+        return self.match(ticker_symbol, limit)
+
+    def match(self, ticker_symbol: str, limit: int = 5) -> List[Dict]:
+        """
+        Rank the markets of the current snapshot against ticker_symbol.
+
+        Args:
+            ticker_symbol (str): Free-form ticker, e.g. 'btc perp' or 'eth/usdc'
+            limit (int, optional): Maximum number of candidates. Defaults to 5.
+
+        Returns:
+            List[Dict]: candidates with market_id, ticker, market_type and a confidence in [0, 1]
+        """
+        self._ensure_index()
+        return [dict(candidate) for candidate in self._match(ticker_symbol, limit)]
+
+    def best(self, ticker_symbol: str, min_confidence: float = 1.0) -> Optional[str]:
+        """Market id of the best candidate if it is at least min_confidence"""
+        candidates = self.match(ticker_symbol, 1)
+        if candidates and candidates[0]["confidence"] >= min_confidence:
+            return candidates[0]["market_id"]
+        return None
+
+    def _ensure_index(self) -> None:
+        by_id = self.registry.by_id
+        if by_id is self._snapshot:
+            return
+        trigram_index: Dict[str, List[str]] = {}
+        trigram_counts: Dict[str, int] = {}
+        for base in self.registry.by_base:
+            grams = trigrams(base)
+            trigram_counts[base] = len(grams)
+            for gram in grams:
+                trigram_index.setdefault(gram, []).append(base)
+        self._trigram_index, self._trigram_counts = trigram_index, trigram_counts
+        self._bases = sorted(self.registry.by_base)
+        self._snapshot = by_id
+        # memoized answers belong to the previous snapshot
+        self._match = lru_cache(maxsize=self.memo_size)(self._rank)
+
+    def _rank(self, ticker_symbol: str, limit: int) -> Tuple[Dict, ...]:
+        try:
+            base, quote, market_type = parse_ticker(ticker_symbol)
+        except ValueError:
+            return ()
+
+        exact_id = self.registry.by_ticker.get(format_ticker(base, quote, market_type))
+        if exact_id is not None:
+            return (self._candidate(exact_id, 1.0),)
+
+        # similarity of the base symbols, the part users misspell
+        query_grams = trigrams(base)
+        overlaps = Counter()
+        for gram in query_grams:
+            for candidate_base in self._trigram_index.get(gram, ()):
+                overlaps[candidate_base] += 1
+        base_scores = {
+            candidate_base: 2 * overlap / (len(query_grams) + self._trigram_counts[candidate_base])
+            for candidate_base, overlap in overlaps.items()
+        }
+        # markets whose base starts with the queried base, e.g. 'sol' -> 'SOLV'
+        for candidate_base in self._bases_with_prefix(base):
+            base_scores[candidate_base] = max(base_scores.get(candidate_base, 0), 0.5)
+
+        wanted_type = "derivative" if market_type == PERP else "spot"
+        scored = []
+        for candidate_base, base_score in base_scores.items():
+            for market_id in self.registry.by_base.get(candidate_base, ()):
+                market = self.registry.by_id[market_id]
+                score = (
+                    BASE_WEIGHT * base_score
+                    + QUOTE_WEIGHT * (market["quote"] == quote)
+                    + TYPE_WEIGHT * (market["market_type"] == wanted_type)
+                )
+                # never report a fuzzy match as certain
+                scored.append((min(score, 0.99), market["ticker"], market_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return tuple(
+            self._candidate(market_id, round(score, 3))
+            for score, _, market_id in scored[:limit]
+        )
+
+    def _bases_with_prefix(self, base: str) -> List[str]:
+        bases = self._bases
+        index = bisect_left(bases, base)
+        matches = []
+        while index < len(bases) and bases[index].startswith(base):
+            matches.append(bases[index])
+            index += 1
+        return matches
+
+    def _candidate(self, market_id: str, confidence: float) -> Dict:
+        market = self.registry.by_id[market_id]
+        return {
+            "market_id": market_id,
+            "ticker": market["ticker"],
+            "market_type": market["market_type"],
+            "confidence": confidence,
+        }
+
+    def stats(self) -> Dict:
+        memo = self._match.cache_info()
+        return {
+            "indexed_bases": len(self._trigram_counts),
+            "memo_hits": memo.hits,
+            "memo_misses": memo.misses,
+            "memo_size": memo.currsize,
+        }
+
+
+_resolvers: Dict[str, TickerResolver] = {}
+
+
+def get_ticker_resolver(network: Union[str, bool, Network, None] = "mainnet") -> TickerResolver:
+    """Return the ticker resolver of a network, whichever way it is named"""
+    key = network_key(network)
+    resolver = _resolvers.get(key)
+    if resolver is None:
+        resolver = _resolvers[key] = TickerResolver(get_market_registry(key))
+    return resolver
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.metadata_registry import network_key
+
+logger = logging.getLogger(__name__)
+
+# Oldest mid price, in seconds, that order placement accepts without refetching
+TOB_MAX_AGE = float(os.getenv("TOB_MAX_AGE", "2"))
+TOB_POLL_INTERVAL = float(os.getenv("TOB_POLL_INTERVAL", "1"))
+
+
+class TopOfBookCache:
+    """
+    Mid price and best bid/ask of the markets in use on one network, polled
+    in the background and shared by every agent so order placement does not
+    wait on a query.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        poll_interval: float = TOB_POLL_INTERVAL,
+        max_age: float = TOB_MAX_AGE,
+        idle_ttl: float = 120.0,
+    ) -> None:
+        """
+        Args:
+            client: AsyncClient used to fetch mid prices
+            poll_interval (float, optional): Seconds between polls of the markets in use. Defaults to TOB_POLL_INTERVAL.
+            max_age (float, optional): Default oldest entry readers accept. Defaults to TOB_MAX_AGE.
+            idle_ttl (float, optional): Seconds without reads before a market stops being polled. Defaults to 120.
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self.idle_ttl = idle_ttl
+        # (market_id, market_type) -> {"result", "updated_at", "last_used"}
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.polls = 0
+
+    async def get(
+        self, market_id: str, market_type: str = SPOT, max_age: Optional[float] = None
+    ) -> Dict:
+        """
+        Mid price and top of book of a market, at most max_age seconds old.
+
+        Returns:
+            Dict: the chain's midPrice, bestBuyPrice and bestSellPrice
+        """
+        key = (market_id.lower(), market_type)
+        max_age = self.max_age if max_age is None else max_age
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            entry["last_used"] = now
+            if now - entry["updated_at"] <= max_age:
+                self.hits += 1
+                return entry["result"]
+        self.misses += 1
+        result = await self._fetch(key)
+        # keep the market warm for the next order
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        return result
+
+    async def _fetch(self, key: Tuple[str, str]) -> Dict:
+        # concurrent misses on one market share a single query
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._query(key))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _query(self, key: Tuple[str, str]) -> Dict:
+        market_id, market_type = key
+        fetch = (
+            self.client.fetch_derivative_mid_price_and_tob
+            if market_type == DERIVATIVE
+            else self.client.fetch_spot_mid_price_and_tob
+        )
+        result = await fetch(market_id=market_id)
+        now = time.monotonic()
+        entry = self._entries.setdefault(key, {"last_used": now})
+        entry["result"] = result
+        entry["updated_at"] = now
+        return result
+
+    async def _poll(self) -> None:
+        while self._entries:
+            await asyncio.sleep(self.poll_interval)
+            now = time.monotonic()
+            for key, entry in list(self._entries.items()):
+                if now - entry["last_used"] > self.idle_ttl:
+                    del self._entries[key]
+            results = await asyncio.gather(
+                *(self._fetch(key) for key in list(self._entries)),
+                return_exceptions=True,
+            )
+            self.polls += 1
+            for result in results:
+                if isinstance(result, Exception):
+                    # keep the previous entry, readers refetch once it is too old
+                    logger.error(f"Polling top of book failed: {result}")
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    def stats(self) -> Dict:
+        return {
+            "markets": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "polls": self.polls,
+        }
+
+
+_caches: Dict[str, TopOfBookCache] = {}
+
+
+def get_tob_cache(network_type: str = "mainnet") -> TopOfBookCache:
+    """Return the top-of-book cache shared by every agent on a network"""
+    key = network_key(network_type)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = TopOfBookCache(get_client_pool(key).get_client())
+    return cache
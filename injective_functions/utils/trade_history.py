@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from pyinjective.client.model.pagination import PaginationOption
+
+TRADE_PAGE_SIZE = int(os.getenv("TRADE_PAGE_SIZE", "100"))
+
+# Columns of CSV exports, nested fields flattened with dots
+SPOT_TRADE_FIELDS = (
+    "tradeId",
+    "executedAt",
+    "marketId",
+    "subaccountId",
+    "orderHash",
+    "cid",
+    "tradeExecutionType",
+    "executionSide",
+    "tradeDirection",
+    "price.price",
+    "price.quantity",
+    "fee",
+    "feeRecipient",
+)
+DERIVATIVE_TRADE_FIELDS = (
+    "tradeId",
+    "executedAt",
+    "marketId",
+    "subaccountId",
+    "orderHash",
+    "cid",
+    "tradeExecutionType",
+    "executionSide",
+    "isLiquidation",
+    "positionDelta.tradeDirection",
+    "positionDelta.executionPrice",
+    "positionDelta.executionQuantity",
+    "positionDelta.executionMargin",
+    "payout",
+    "fee",
+    "feeRecipient",
+)
+
+
+async def iter_trades(
+    fetch: Callable,
+    market_ids: List[str] = None,
+    subaccount_ids: List[str] = None,
+    account_address: str = None,
+    start_time: int = None,
+    end_time: int = None,
+    page_size: int = TRADE_PAGE_SIZE,
+    limit: int = None,
+) -> AsyncIterator[Dict]:
+    """
+    Historical trades from newest to oldest, one page in memory at a time.
+
+    Pages are walked with an executedAt cursor rather than a growing skip,
+    so trades executing during the walk do not shift the pages and deep
+    history costs the same per page as recent history.
+
+    Args:
+        fetch (Callable): client.fetch_spot_trades or client.fetch_derivative_trades
+        market_ids (List[str], optional): Markets to list. Defaults to every market.
+        subaccount_ids (List[str], optional): Subaccounts to list. Defaults to every subaccount.
+        account_address (str, optional): Account whose trades are listed
+        start_time (int, optional): Oldest executedAt to list, in milliseconds
+        end_time (int, optional): Newest executedAt to list, in milliseconds
+        page_size (int, optional): Trades per indexer query. Defaults to TRADE_PAGE_SIZE.
+        limit (int, optional): Stop after this many trades. Defaults to no limit.
+    """
+    cursor = end_time
+    # trades already yielded at the cursor timestamp, which the next page repeats
+    seen_at_cursor: Set[str] = set()
+    skip = 0
+    yielded = 0
+    while True:
+        res = await fetch(
+            market_ids=market_ids,
+            subaccount_ids=subaccount_ids,
+            account_address=account_address,
+            pagination=PaginationOption(
+                skip=skip or None,
+                limit=page_size,
+                start_time=start_time,
+                end_time=cursor,
+            ),
+        )
+        trades = res.get("trades", [])
+        fresh = 0
+        for trade in trades:
+            if trade["tradeId"] in seen_at_cursor:
+                continue
+            fresh += 1
+            yield trade
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        if len(trades) < page_size:
+            return
+
+        oldest = int(trades[-1]["executedAt"])
+        if oldest != cursor:
+            cursor, skip = oldest, 0
+            seen_at_cursor = set()
+        elif not fresh:
+            # a whole page within one block, step over it
+            skip += page_size
+        seen_at_cursor.update(
+            trade["tradeId"] for trade in trades if int(trade["executedAt"]) == oldest
+        )
+
+
+def flatten_trade(trade: Dict, prefix: str = "") -> Dict:
+    """Trade with nested fields such as price.quantity flattened into dotted keys"""
+    flat = {}
+    for key, value in trade.items():
+        if isinstance(value, dict):
+            flat.update(flatten_trade(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+async def ndjson_lines(trades: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for trade in trades:
+        yield json.dumps(trade, separators=(",", ":")) + "\n"
+
+
+async def csv_lines(
+    trades: AsyncIterator[Dict], fields: Optional[tuple] = SPOT_TRADE_FIELDS
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    async for trade in trades:
+        writer.writerow(flatten_trade(trade))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def is_accepted(result: Dict) -> bool:
+    """Check whether a broadcast result was accepted into the mempool"""
+    if not result.get("success"):
+        return False
+    tx_response = result.get("result", {}).get("txResponse", {})
+    return int(tx_response.get("code", 0)) == 0
+
+
+class TxBatcher:
+    """
+    Collects the messages of one agent over a short window and broadcasts
+    them as a single multi-message transaction.
+
+    Every caller awaits its own result, which is the shared tx result tagged
+    with the position of its message inside the batch. A batch that passes
+    CheckTx can still fail in the block, which reverts every message in it.
+    When that happens each message is broadcast again on its own, and the
+    callers waiting for inclusion get the outcome of their own retry.
+    Callers that did not wait already got the batch result, so their retries
+    only appear in the logs and in stats.
+    """
+
+    def __init__(
+        self,
+        broadcast: Callable[[List[Any]], Awaitable[Dict]],
+        window: float = 0.05,
+        max_batch_size: int = 16,
+        track: Callable[[str], Awaitable[Dict]] = None,
+    ) -> None:
+        """
+        Args:
+            broadcast: Coroutine function that signs and broadcasts a list of messages
+            window (float, optional): Seconds to wait for more messages. Defaults to 0.05.
+            max_batch_size (int, optional): Flush as soon as this many messages are queued. Defaults to 16.
+            track (Callable, optional): Coroutine function returning the inclusion receipt of a tx hash.
+                Without it, in-block failures of a batch are not retried.
+        """
+        self.broadcast = broadcast
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.track = track
+        self._pending: List[Tuple[Any, asyncio.Future, bool]] = []
+        self._timer = None
+        self._in_flight = set()
+        self.stats = {
+            "batches": 0,
+            "messages": 0,
+            "fallbacks": 0,
+            "in_block_failures": 0,
+            "retried_messages": 0,
+        }
+
+    async def submit(self, msg, wait_for_inclusion: bool = False) -> Dict:
+        """
+        Queue a message and wait for the result of the tx that carries it.
+
+        With wait_for_inclusion, the result also holds the block inclusion
+        receipt under "inclusion", of the retry if the batch failed in the block.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((msg, future, wait_for_inclusion))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush
+            )
+        return await future
+
+    async def close(self) -> None:
+        """Send whatever is still queued and wait for in-flight batches"""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[Any, asyncio.Future, bool]]) -> None:
+        msgs = [msg for msg, _, _ in batch]
+        try:
+            result = await self.broadcast(msgs)
+            if len(batch) > 1 and not is_accepted(result):
+                # one bad message fails the whole tx, so retry one by one
+                # and let every caller see only its own outcome
+                self.stats["fallbacks"] += 1
+                await self._send_each(batch)
+                return
+            self.stats["batches"] += 1
+            self.stats["messages"] += len(batch)
+            results = [
+                {**result, "msg_index": idx, "batch_size": len(batch)}
+                for idx in range(len(batch))
+            ]
+            for (_, future, wait), result_of_msg in zip(batch, results):
+                if not (wait and is_accepted(result)) and not future.done():
+                    future.set_result(result_of_msg)
+            if self.track is None or not is_accepted(result):
+                return
+
+            receipt = await self.track(result["tx_hash"])
+            if len(batch) > 1 and receipt.get("included") and receipt.get("code"):
+                # the whole batch was reverted in the block
+                self.stats["in_block_failures"] += 1
+                logger.warning(
+                    f"Batch tx {result['tx_hash']} failed in block with code "
+                    f"{receipt['code']}, retrying its {len(batch)} messages one by one"
+                )
+                await self._send_each(batch, failed_tx_hash=result["tx_hash"])
+                return
+            for (_, future, wait), result_of_msg in zip(batch, results):
+                if wait and not future.done():
+                    future.set_result({**result_of_msg, "inclusion": receipt})
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _send_each(
+        self, batch: List[Tuple[Any, asyncio.Future, bool]], failed_tx_hash: str = None
+    ) -> None:
+        results = []
+        for msg, _, _ in batch:
+            result = await self.broadcast([msg])
+            if failed_tx_hash is not None:
+                self.stats["retried_messages"] += 1
+                result = {**result, "retry_of": failed_tx_hash}
+            results.append(result)
+
+        async def finish(future: asyncio.Future, wait: bool, result: Dict) -> None:
+            if wait and self.track is not None and is_accepted(result):
+                result = {**result, "inclusion": await self.track(result["tx_hash"])}
+            # callers that did not wait already returned with the failed batch's result
+            if not future.done():
+                future.set_result(result)
+
+        await asyncio.gather(
+            *(finish(future, wait, result) for (_, future, wait), result in zip(batch, results))
+        )
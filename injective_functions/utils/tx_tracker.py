@@ -0,0 +1,231 @@
+import asyncio
+import base64
+import hashlib
+import time
+from typing import Callable, Dict, Optional, Set
+
+from injective_functions.utils.client_pool import get_client_pool
+from injective_functions.utils.metadata_registry import network_key
+from injective_functions.utils.gas_estimator import (
+    GasKey,
+    OUT_OF_GAS_CODE,
+    default_gas_estimator,
+)
+
+
+class PendingTx:
+    def __init__(
+        self,
+        future: asyncio.Future,
+        gas_key: GasKey,
+        gas_wanted: int,
+        broadcast_height: Optional[int] = None,
+    ):
+        self.future = future
+        self.gas_key = gas_key
+        self.gas_wanted = gas_wanted
+        self.broadcast_height = broadcast_height
+        self.submitted_at = time.monotonic()
+        self.callbacks = []
+
+
+def block_tx_hashes(block: Dict) -> Set[str]:
+    """Hashes of the txs of a fetched block, the uppercase hex SHA-256 of their bytes"""
+    return {
+        hashlib.sha256(base64.b64decode(tx)).hexdigest().upper()
+        for tx in block.get("block", {}).get("data", {}).get("txs", [])
+    }
+
+
+class TxConfirmationTracker:
+    """
+    Watches many broadcast transactions for block inclusion with a single
+    shared polling loop and resolves one future per tx hash.
+
+    Each round reads the latest height and does nothing more until a new
+    block is produced. New blocks are scanned for the pending hashes and
+    only the txs found in them are looked up, so the cost follows the
+    block rate and the included txs rather than the number of pending txs.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        poll_interval: float = 1.0,
+        timeout: float = 60.0,
+        max_concurrent_queries: int = 16,
+        gas_estimator=default_gas_estimator,
+        backfill_blocks: int = 5,
+        max_scanned_blocks: int = 50,
+    ) -> None:
+        """
+        Args:
+            client: AsyncClient used to look blocks and transactions up
+            poll_interval (float, optional): Seconds between latest height checks. Defaults to 1.0.
+            timeout (float, optional): Seconds after which a tx is reported as not included. Defaults to 60.0.
+            max_concurrent_queries (int, optional): Lookups in flight per round. Defaults to 16.
+            gas_estimator (GasEstimator, optional): Receives the gas used by included txs.
+            backfill_blocks (int, optional): Blocks scanned back from the first seen height for txs tracked without a broadcast height. Defaults to 5.
+            max_scanned_blocks (int, optional): New blocks past which every pending hash is looked up instead. Defaults to 50.
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.gas_estimator = gas_estimator
+        self.backfill_blocks = backfill_blocks
+        self.max_scanned_blocks = max_scanned_blocks
+        self._semaphore = asyncio.Semaphore(max_concurrent_queries)
+        self._pending: Dict[str, PendingTx] = {}
+        self._poller: Optional[asyncio.Task] = None
+        # last block height whose txs were checked against the pending hashes
+        self._scanned_height: Optional[int] = None
+
+    def track(
+        self,
+        tx_hash: str,
+        gas_key: GasKey = None,
+        gas_wanted: int = None,
+        callback: Callable[[Dict], None] = None,
+        broadcast_height: int = None,
+    ) -> asyncio.Future:
+        """
+        Start watching a tx hash. Tracking the same hash twice returns the same future.
+
+        Args:
+            broadcast_height (int, optional): A height at or before the broadcast, where
+                the block scan starts. Defaults to backfill_blocks before the latest height.
+
+        Returns:
+            asyncio.Future: Resolves with the inclusion height, gas used and result code
+        """
+        pending = self._pending.get(tx_hash)
+        if pending is None:
+            future = asyncio.get_running_loop().create_future()
+            pending = PendingTx(future, gas_key, gas_wanted, broadcast_height)
+            self._pending[tx_hash] = pending
+        if callback is not None:
+            pending.callbacks.append(callback)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        return pending.future
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    async def _poll(self) -> None:
+        try:
+            while self._pending:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    await self._poll_round()
+                except Exception:
+                    # node unreachable, try again next round
+                    pass
+        finally:
+            # the next poller backfills from wherever the chain is by then
+            self._scanned_height = None
+
+    async def _poll_round(self) -> None:
+        latest = await self.client.fetch_latest_block()
+        height = int(latest["block"]["header"]["height"])
+        if self._scanned_height is None:
+            self._scanned_height = height - self.backfill_blocks - 1
+            hints = [p.broadcast_height for p in self._pending.values() if p.broadcast_height]
+            if hints:
+                self._scanned_height = min(hints) - 1
+        if height > self._scanned_height:
+            if height - self._scanned_height > self.max_scanned_blocks:
+                # too far behind to scan, look every hash up directly
+                found = set(self._pending)
+            else:
+                found = block_tx_hashes(latest)
+                blocks = await asyncio.gather(
+                    *(
+                        self._fetch_block(block_height)
+                        for block_height in range(self._scanned_height + 1, height)
+                    )
+                )
+                for block in blocks:
+                    found |= block_tx_hashes(block)
+            self._scanned_height = height
+            hashes = [tx_hash for tx_hash in self._pending if tx_hash.upper() in found]
+            await asyncio.gather(*(self._check(tx_hash) for tx_hash in hashes))
+
+        now = time.monotonic()
+        expired = [
+            tx_hash
+            for tx_hash, pending in self._pending.items()
+            if now - pending.submitted_at > self.timeout
+        ]
+        # one last lookup in case the tx was included in a block that was not scanned
+        await asyncio.gather(*(self._check(tx_hash, final=True) for tx_hash in expired))
+
+    async def _fetch_block(self, height: int) -> Dict:
+        async with self._semaphore:
+            return await self.client.fetch_block_by_height(height=height)
+
+    async def _check(self, tx_hash: str, final: bool = False) -> None:
+        pending = self._pending.get(tx_hash)
+        if pending is None:
+            return
+        async with self._semaphore:
+            try:
+                res = await self.client.fetch_tx(hash=tx_hash)
+            except Exception:
+                # not indexed yet
+                res = None
+
+        if res is None or "txResponse" not in res:
+            if final:
+                self._resolve(tx_hash, {"tx_hash": tx_hash, "included": False})
+            return
+
+        tx_response = res["txResponse"]
+        code = int(tx_response.get("code", 0))
+        gas_used = int(tx_response.get("gasUsed", 0))
+        if pending.gas_key is not None:
+            if code == OUT_OF_GAS_CODE:
+                self.gas_estimator.record_out_of_gas(pending.gas_key)
+            elif code == 0 and pending.gas_wanted:
+                self.gas_estimator.record_receipt(
+                    pending.gas_key, pending.gas_wanted, gas_used
+                )
+        self._resolve(
+            tx_hash,
+            {
+                "tx_hash": tx_hash,
+                "included": True,
+                "height": int(tx_response.get("height", 0)),
+                "gas_wanted": int(tx_response.get("gasWanted", 0)),
+                "gas_used": gas_used,
+                "code": code,
+                "raw_log": tx_response.get("rawLog", ""),
+                # hex encoded TxMsgData with the message responses
+                "data": tx_response.get("data", ""),
+            },
+        )
+
+    def _resolve(self, tx_hash: str, receipt: Dict) -> None:
+        pending = self._pending.pop(tx_hash)
+        if not pending.future.done():
+            pending.future.set_result(receipt)
+        for callback in pending.callbacks:
+            callback(receipt)
+
+
+_trackers: Dict[str, TxConfirmationTracker] = {}
+
+
+def get_confirmation_tracker(network_type: str) -> TxConfirmationTracker:
+    """Return the tracker shared by every agent on a network"""
+    key = network_key(network_type)
+    tracker = _trackers.get(key)
+    if tracker is None:
+        tracker = _trackers[key] = TxConfirmationTracker(get_client_pool(key).get_client())
+    return tracker
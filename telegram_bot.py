@@ -13,10 +13,21 @@ import replicate
 import traceback
 from dotenv import load_dotenv
 import os
-import aiohttp
 from database_engine.wallet_model import StorageEngine
 
-from database_engine.utils.injective_utils import InjectiveTransaction
+from database_engine.utils.injective_utils import ENVIRONMENT, InjectiveTransaction
+from injective_functions.utils.agent_registry import AgentRegistry
+from injective_functions.utils.http_client import (
+    get_http_session,
+    telegram_post_init,
+    telegram_post_shutdown,
+)
+from injective_functions.utils.metadata_snapshot import warm_start
+from injective_functions.utils.price_provider import (
+    INJ_ASSET,
+    StalePriceError,
+    get_price_provider,
+)
 
 storage_engine = StorageEngine()
 
@@ -46,22 +57,26 @@ replicate.Client(api_token=REPLICATE_API_TOKEN)
 
 # Global conversation history dictionary
 conversation_history = {}
-agents= {}
+agents = AgentRegistry()
 
 if not BOT_TOKEN:
     logger.critical("Bot token is missing. Please set BOT_TOKEN in your .env file.")
     exit(1)
 
-async def get_or_create_agent(agent_id, private_key):
-    """Retrieve an existing agent or create a new one"""
-    if agent_id not in agents:
-        agents[agent_id] = await InjectiveTransaction.create(agent_id, private_key)
-    return agents[agent_id]
+def lease_agent(agent_id, private_key):
+    """Lease an existing agent or a new one, kept open until the lease is released"""
+    return agents.lease(
+        agent_id, lambda: InjectiveTransaction.create(agent_id, private_key)
+    )
 
 # Define your functions that return actual values (e.g., get_current_price, get_balance)
 def get_current_price():
-    # Placeholder function that returns current price
-    return ("The current price of the INJ token is $33.5")  # Example return value
+    # Cached quote, refreshed in the background by the price provider
+    try:
+        quote = get_price_provider().get_quote(INJ_ASSET)
+    except StalePriceError:
+        return "The current price of the INJ token is unavailable right now"
+    return f"The current price of the INJ token is ${quote['price']:.2f}"
 
 def get_balance():
     # Placeholder function that returns balance
@@ -152,10 +167,9 @@ async def balance(update: Update, context: CallbackContext) -> None:
         decrypted_private_key = await storage_engine.get_decrypted_private_key(user_id)
 
         # Get or create the agent for the user
-        agent = await get_or_create_agent(user_id, decrypted_private_key)
-
-        # Query balances using the agent
-        balance_response = await agent.query_balances()
+        async with lease_agent(user_id, decrypted_private_key) as agent:
+            # Query balances using the agent
+            balance_response = await agent.query_balances()
 
         # Extract the balance for the 'inj' token
         parsed_balances = [
@@ -227,22 +241,22 @@ async def handle_query(update: Update, context: CallbackContext) -> None:
         backend_url = f"{BASE_URL}/chat"  # Replace with your backend server's URL
         session_id = str(user_id)  # Using user_id as the session_id
 
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {SECRET_KEY}"  # Replace with your actual secret key
-            }
-            async with session.post(backend_url, json={
-                "message": f" {user_message}",
-                "session_id": session_id,
-                "agent_id": "example-agent",  # Optional, if you need to pass it
-                "agent_key": "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656",  # Optional, if you need to pass it
-            }, headers=headers) as response:
-                if response.status == 200:
-                    # Get the response from your backend
-                    response_data = await response.json()
-                    ai_response = response_data.get("response", "No response from AI.")
-                else:
-                    ai_response = "An error occurred while getting a response from the AI."
+        session = get_http_session()
+        headers = {
+            "Authorization": f"Bearer {SECRET_KEY}"  # Replace with your actual secret key
+        }
+        async with session.post(backend_url, json={
+            "message": f" {user_message}",
+            "session_id": session_id,
+            "agent_id": "example-agent",  # Optional, if you need to pass it
+            "agent_key": "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656",  # Optional, if you need to pass it
+        }, headers=headers) as response:
+            if response.status == 200:
+                # Get the response from your backend
+                response_data = await response.json()
+                ai_response = response_data.get("response", "No response from AI.")
+            else:
+                ai_response = "An error occurred while getting a response from the AI."
 
         # Log the raw AI response for debugging
         logger.info(f"Raw AI response: {ai_response}")
@@ -258,12 +272,29 @@ async def handle_query(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text(f"An error occurred while processing your query. Please try again. error: {e}")
 
 
+async def post_init(application: Application) -> None:
+    await telegram_post_init(application)
+    await warm_start(ENVIRONMENT)
+    get_price_provider().start()
+
+
+async def post_shutdown(application: Application) -> None:
+    await get_price_provider().close()
+    await telegram_post_shutdown(application)
+
+
 # Main function to run the bot
 def main():
     """Start the bot."""
     try:
         # Create the Application instance with your bot token
-        application = Application.builder().token(BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
 
         # Register command handlers
         application.add_handler(CommandHandler("start", start))
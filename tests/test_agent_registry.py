@@ -0,0 +1,61 @@
+import asyncio
+
+from injective_functions.utils.agent_registry import AgentRegistry
+
+
+class Agent:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_evicted_agent_is_closed_after_its_last_lease():
+    async def run():
+        registry = AgentRegistry(max_size=1)
+        first = Agent("first")
+        await registry.put("first", first)
+        agent = await registry.acquire("first")
+        # a new agent needs the only slot while the first is still in use
+        await registry.put("second", Agent("second"))
+        assert "first" not in registry
+        assert not agent.closed
+        await registry.release(agent)
+        assert agent.closed
+        return registry.stats()
+
+    stats = asyncio.run(run())
+    assert stats["deferred_closes"] == 1
+    assert stats["leased"] == 0
+
+
+def test_idle_agents_are_evicted_before_leased_ones():
+    async def run():
+        registry = AgentRegistry(max_size=2)
+        busy, idle = Agent("busy"), Agent("idle")
+        await registry.put("busy", busy)
+        await registry.put("idle", idle)
+        async with registry.lease("busy"):
+            await registry.put("new", Agent("new"))
+        return busy, idle, registry
+
+    busy, idle, registry = asyncio.run(run())
+    assert idle.closed and not busy.closed
+    assert "busy" in registry
+
+
+def test_lease_creates_missing_agents():
+    async def run():
+        registry = AgentRegistry()
+
+        async def create():
+            return Agent("created")
+
+        async with registry.lease("key", create) as agent:
+            assert agent.name == "created"
+            assert registry.stats()["leased"] == 1
+        return registry.stats()
+
+    assert asyncio.run(run())["leased"] == 0
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from injective_functions.utils.initializers import AccountSyncError, ChainInteractor
+
+# throwaway key, the fake client never talks to a node
+PRIVATE_KEY = "ec6d38c60720e5e20f6b0ab989c619652dee84f953250bbf291b3922c8b70656"
+
+
+class FakeClient:
+    def __init__(self, account=None, balances=None, balances_error=None):
+        self.account = account
+        self.balances = balances or []
+        self.balances_error = balances_error
+
+    async def fetch_account(self, address):
+        # like pyinjective, failures surface as None
+        return self.account
+
+    async def fetch_bank_balances(self, address):
+        if self.balances_error:
+            raise self.balances_error
+        return {"balances": self.balances}
+
+
+def synced_interactor(client):
+    interactor = ChainInteractor(network_type="testnet", private_key=PRIVATE_KEY)
+    interactor.client = client
+    interactor.account_number, interactor.sequence = 7, 42
+    return interactor
+
+
+def test_sync_reads_account_number_and_sequence():
+    account = SimpleNamespace(base_account=SimpleNamespace(account_number=9, sequence=3))
+    interactor = synced_interactor(FakeClient(account=account))
+    asyncio.run(interactor.sync_account())
+    assert (interactor.account_number, interactor.sequence) == (9, 3)
+
+
+def test_failed_fetch_of_funded_account_keeps_sequence():
+    interactor = synced_interactor(
+        FakeClient(balances=[{"denom": "inj", "amount": "1000"}])
+    )
+    with pytest.raises(AccountSyncError):
+        asyncio.run(interactor.sync_account())
+    assert (interactor.account_number, interactor.sequence) == (7, 42)
+
+
+def test_failed_fetch_and_failed_existence_check_keeps_sequence():
+    interactor = synced_interactor(FakeClient(balances_error=ConnectionError("unavailable")))
+    with pytest.raises(AccountSyncError):
+        asyncio.run(interactor.sync_account())
+    assert (interactor.account_number, interactor.sequence) == (7, 42)
+
+
+def test_unfunded_account_starts_at_zero():
+    interactor = synced_interactor(FakeClient())
+    asyncio.run(interactor.sync_account())
+    assert (interactor.account_number, interactor.sequence) == (0, 0)
@@ -0,0 +1,33 @@
+from pyinjective.proto.injective.exchange.v1beta1 import tx_pb2 as exchange_tx_pb
+
+from injective_functions.utils.gas_estimator import GasEstimator, gas_key, needs_simulation
+
+
+def batch_update(orders):
+    msg = exchange_tx_pb.MsgBatchUpdateOrders(sender="inj1sender")
+    for _ in range(orders):
+        msg.spot_orders_to_create.add()
+    return msg
+
+
+def test_batch_updates_only_share_estimates_with_the_same_order_counts():
+    assert gas_key([batch_update(3)]) == gas_key([batch_update(3)])
+    assert gas_key([batch_update(3)]) != gas_key([batch_update(5)])
+
+
+def test_a_learned_batch_size_does_not_estimate_a_larger_one():
+    estimator = GasEstimator(min_samples=3)
+    small = gas_key([batch_update(3)])
+    for _ in range(3):
+        estimator.record(small, 100_000)
+
+    assert estimator.estimate(small) == 105_000
+    assert estimator.estimate(gas_key([batch_update(5)])) is None
+
+
+def test_cancel_all_always_simulates():
+    msg = exchange_tx_pb.MsgBatchUpdateOrders(
+        sender="inj1sender", spot_market_ids_to_cancel_all=["0xmarket"]
+    )
+    assert needs_simulation([msg])
+    assert not needs_simulation([batch_update(3)])
@@ -0,0 +1,194 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from pyinjective.core.market import DerivativeMarket, SpotMarket
+from pyinjective.core.token import Token
+
+from injective_functions.utils import order_tracker
+from injective_functions.utils.market_registry import DERIVATIVE, SPOT
+from injective_functions.utils.order_tracker import (
+    OrderTracker,
+    OrderTrackerNotReady,
+    chain_order,
+    chain_subaccount_orders,
+    indexer_order,
+)
+
+SUBACCOUNT = "0xsub"
+
+
+def token(symbol, decimals):
+    return Token(
+        name=symbol, symbol=symbol, denom=symbol.lower(), address="",
+        decimals=decimals, logo="", updated=0,
+    )
+
+
+SPOT_MARKET = SpotMarket(
+    id="0xSPOT",
+    status="active",
+    ticker="INJ/USDT",
+    base_token=token("INJ", 18),
+    quote_token=token("USDT", 6),
+    maker_fee_rate=Decimal(0),
+    taker_fee_rate=Decimal(0),
+    service_provider_fee=Decimal(0),
+    min_price_tick_size=Decimal("0.000000000000001"),
+    min_quantity_tick_size=Decimal("1000000000000000"),
+    min_notional=Decimal(0),
+)
+
+DERIVATIVE_MARKET = DerivativeMarket(
+    id="0xperp",
+    status="active",
+    ticker="INJ/USDT PERP",
+    oracle_base="INJ",
+    oracle_quote="USDT",
+    oracle_type="pyth",
+    oracle_scale_factor=6,
+    initial_margin_ratio=Decimal("0.05"),
+    maintenance_margin_ratio=Decimal("0.02"),
+    quote_token=token("USDT", 6),
+    maker_fee_rate=Decimal(0),
+    taker_fee_rate=Decimal(0),
+    service_provider_fee=Decimal(0),
+    min_price_tick_size=Decimal("1000"),
+    min_quantity_tick_size=Decimal("0.01"),
+    min_notional=Decimal(0),
+)
+
+# the spot order below as the indexer reports it once it is booked
+BOOKED_SPOT_ORDER = {
+    "orderHash": "0xHASH",
+    "orderSide": "buy",
+    "marketId": "0xspot",
+    "subaccountId": SUBACCOUNT,
+    "price": "0.000000000012",
+    "quantity": "2000000000000000000",
+    "unfilledQuantity": "2000000000000000000",
+    "triggerPrice": "0",
+    "feeRecipient": "inj1fee",
+    "state": "booked",
+    "createdAt": "1",
+    "updatedAt": "1",
+    "txHash": "0xTX",
+    "cid": "spot-cid",
+}
+
+
+class FakeClient:
+    def __init__(self, orders=()):
+        self.orders = list(orders)
+        self.loaded = asyncio.Event()
+
+    async def fetch_spot_orders(self, market_ids, subaccount_id, pagination):
+        await self.loaded.wait()
+        return {"orders": self.orders}
+
+    async def fetch_derivative_orders(self, market_ids, subaccount_id, pagination):
+        await self.loaded.wait()
+        return {"orders": []}
+
+    async def listen_spot_orders_updates(self, callback, subaccount_id):
+        await asyncio.Event().wait()
+
+    async def listen_derivative_orders_updates(self, callback, subaccount_id):
+        await asyncio.Event().wait()
+
+
+def test_submitted_orders_use_the_indexer_shape_and_units():
+    spot = indexer_order(
+        SPOT_MARKET,
+        SPOT,
+        {"side": "BUY", "price": "12", "quantity": "2", "cid": "spot-cid"},
+        SUBACCOUNT,
+        fee_recipient="inj1fee",
+        tx_hash="0xTX",
+    )
+    assert spot.keys() == {**BOOKED_SPOT_ORDER, "marketType": SPOT}.keys()
+    assert spot["orderHash"] is None
+    assert spot["state"] == "submitted"
+    for key in ("orderSide", "marketId", "price", "quantity", "unfilledQuantity"):
+        assert spot[key] == BOOKED_SPOT_ORDER[key]
+
+    derivative = indexer_order(
+        DERIVATIVE_MARKET,
+        DERIVATIVE,
+        {"side": "SELL", "price": "25.5", "quantity": "1.5", "margin": "38.25", "cid": "c"},
+        SUBACCOUNT,
+    )
+    assert derivative["price"] == "25500000"
+    assert derivative["quantity"] == "1.5"
+    assert derivative["margin"] == "38250000"
+
+
+def test_reads_fall_back_until_loaded_and_replace_submitted_orders():
+    async def run():
+        client = FakeClient([BOOKED_SPOT_ORDER])
+        tracker = OrderTracker(client, SUBACCOUNT)
+        with pytest.raises(OrderTrackerNotReady):
+            await tracker.open_orders()
+
+        tracker.record_submitted(
+            [
+                indexer_order(
+                    SPOT_MARKET,
+                    SPOT,
+                    {"side": "BUY", "price": "12", "quantity": "2", "cid": "spot-cid"},
+                    SUBACCOUNT,
+                )
+            ]
+        )
+        submitted = tracker.submitted_orders(["0xSPOT"], SPOT)
+        client.loaded.set()
+        await asyncio.wait_for(tracker.ready.wait(), 1)
+        orders = await tracker.open_orders(["0xSPOT"], SPOT)
+        await tracker.close()
+        return submitted, orders, tracker.submitted_orders()
+
+    submitted, orders, submitted_after = asyncio.run(run())
+    assert [order["cid"] for order in submitted] == ["spot-cid"]
+    assert orders == [{**BOOKED_SPOT_ORDER, "marketType": SPOT}]
+    assert submitted_after == []
+
+
+def test_tracked_orders_convert_to_the_chain_query_shape():
+    order = {**BOOKED_SPOT_ORDER, "marketType": SPOT}
+    assert chain_order(order) == {
+        "price": "12000000",
+        "quantity": "2000000000000000000000000000000000000",
+        "fillable": "2000000000000000000000000000000000000",
+        "isBuy": True,
+        "orderHash": "0xHASH",
+        "cid": "spot-cid",
+    }
+    assert chain_subaccount_orders([order]) == {
+        "buyOrders": [
+            {
+                "order": {
+                    "price": "12000000",
+                    "quantity": "2000000000000000000000000000000000000",
+                    "isReduceOnly": False,
+                    "cid": "spot-cid",
+                },
+                "orderHash": "0xHASH",
+            }
+        ],
+        "sellOrders": [],
+    }
+
+
+def test_idle_trackers_leave_the_registry():
+    async def run():
+        client = FakeClient()
+        client.loaded.set()
+        tracker = OrderTracker(client, SUBACCOUNT, reconcile_interval=0.01, idle_ttl=0)
+        order_tracker._trackers[("testnet", SUBACCOUNT)] = tracker
+        tracker.start()
+        await asyncio.sleep(0.05)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert ("testnet", SUBACCOUNT) not in order_tracker._trackers
+    assert not tracker._tasks
@@ -0,0 +1,57 @@
+import asyncio
+
+from injective_functions.utils.orderbook_service import OrderbookService
+
+
+class FakeClient:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.snapshots = 0
+
+    async def listen_spot_orderbook_updates(self, market_ids, callback):
+        await asyncio.Event().wait()
+
+    async def fetch_spot_orderbook_v2(self, market_id):
+        self.snapshots += 1
+        if self.snapshots <= self.failures:
+            raise ConnectionError("indexer unavailable")
+        return {
+            "orderbook": {
+                "buys": [{"price": "0.000000000012", "quantity": "2000000000000000000"}],
+                "sells": [{"price": "0.0000000000125", "quantity": "1500000000000000000"}],
+                "sequence": "7",
+            }
+        }
+
+
+def test_replica_matches_the_chain_orderbook_response():
+    async def run():
+        service = OrderbookService(FakeClient())
+        orderbook = await service.get_orderbook("0xAB", depth=5)
+        await service.close()
+        return orderbook
+
+    assert asyncio.run(run()) == {
+        "buysPriceLevel": [{"p": "12000000", "q": "2000000000000000000000000000000000000"}],
+        "sellsPriceLevel": [{"p": "12500000", "q": "1500000000000000000000000000000000000"}],
+    }
+
+
+def test_failing_snapshots_give_up_and_unsubscribe():
+    async def run():
+        client = FakeClient(failures=100)
+        service = OrderbookService(
+            client, ready_timeout=0.05, reconnect_delay=0.001, max_snapshot_attempts=3
+        )
+        try:
+            await service.get_orderbook("0xab")
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+        await service.close()
+        return client.snapshots, service.stats()
+
+    snapshots, stats = asyncio.run(run())
+    assert snapshots == 3
+    assert stats["abandoned"] == 1
+    assert stats["markets"] == 0
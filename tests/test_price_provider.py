@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from injective_functions.utils.price_provider import (
+    INJ_ASSET,
+    PriceBackend,
+    PriceProvider,
+    StalePriceError,
+    StaticPriceBackend,
+)
+
+
+class FailingBackend(PriceBackend):
+    name = "failing"
+
+    async def fetch(self, assets):
+        raise ConnectionError("price api unavailable")
+
+
+def test_backends_must_implement_fetch():
+    with pytest.raises(TypeError):
+        PriceBackend()
+
+
+def test_a_failing_first_refresh_raises_stale_price():
+    async def run():
+        provider = PriceProvider(FailingBackend(), refresh_interval=60)
+        try:
+            with pytest.raises(StalePriceError):
+                await provider.get_price(INJ_ASSET)
+        finally:
+            await provider.close()
+        return provider.stats()
+
+    assert asyncio.run(run())["failures"] >= 1
+
+
+def test_prices_are_served_from_the_cache():
+    async def run():
+        provider = PriceProvider(StaticPriceBackend({INJ_ASSET: 25.0}), refresh_interval=60)
+        price = await provider.get_price(INJ_ASSET)
+        await provider.close()
+        return price, provider.get_quote(INJ_ASSET)["source"]
+
+    assert asyncio.run(run()) == (25.0, "static")
@@ -0,0 +1,54 @@
+import asyncio
+
+from injective_functions.utils.tx_batcher import TxBatcher
+
+
+class FakeChain:
+    """Accepts every tx and fails in the block any tx carrying the "bad" message"""
+
+    def __init__(self):
+        self.txs = {}
+
+    async def broadcast(self, msgs):
+        tx_hash = f"TX{len(self.txs)}"
+        self.txs[tx_hash] = list(msgs)
+        return {"success": True, "result": {"txResponse": {"code": 0}}, "tx_hash": tx_hash}
+
+    async def track(self, tx_hash):
+        code = 5 if "bad" in self.txs[tx_hash] else 0
+        return {"tx_hash": tx_hash, "included": True, "code": code}
+
+
+def test_in_block_failure_reaches_every_caller_and_retries_each_message():
+    async def run():
+        chain = FakeChain()
+        batcher = TxBatcher(chain.broadcast, window=0.01, track=chain.track)
+        results = await asyncio.gather(
+            batcher.submit("good-1", wait_for_inclusion=True),
+            batcher.submit("bad", wait_for_inclusion=True),
+            batcher.submit("good-2", wait_for_inclusion=True),
+        )
+        return chain, batcher, results
+
+    chain, batcher, results = asyncio.run(run())
+    # the batch and then one tx per message
+    assert list(chain.txs.values()) == [["good-1", "bad", "good-2"], ["good-1"], ["bad"], ["good-2"]]
+    assert all(result["retry_of"] == "TX0" for result in results)
+    assert [result["inclusion"]["code"] for result in results] == [0, 5, 0]
+    assert [result["tx_hash"] for result in results] == ["TX1", "TX2", "TX3"]
+    assert batcher.stats["in_block_failures"] == 1
+    assert batcher.stats["retried_messages"] == 3
+
+
+def test_included_batch_reports_its_receipt_to_waiting_callers():
+    async def run():
+        chain = FakeChain()
+        batcher = TxBatcher(chain.broadcast, window=0.01, track=chain.track)
+        return chain, await asyncio.gather(
+            batcher.submit("good-1"), batcher.submit("good-2", wait_for_inclusion=True)
+        )
+
+    chain, (first, second) = asyncio.run(run())
+    assert len(chain.txs) == 1
+    assert "inclusion" not in first and first["msg_index"] == 0
+    assert second["inclusion"] == {"tx_hash": "TX0", "included": True, "code": 0}
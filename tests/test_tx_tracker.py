@@ -0,0 +1,43 @@
+import asyncio
+
+from benchmark import FakeAsyncClient
+from injective_functions.utils.gas_estimator import GasEstimator
+from injective_functions.utils.tx_tracker import TxConfirmationTracker
+
+
+async def broadcast(client, payload: bytes) -> str:
+    res = await client.broadcast_tx_sync_mode(payload)
+    return res["txResponse"]["txhash"]
+
+
+def test_lookups_follow_blocks_not_pending_txs():
+    async def run():
+        client = FakeAsyncClient()
+        tracker = TxConfirmationTracker(client, poll_interval=0.001, gas_estimator=GasEstimator())
+        hashes = [await broadcast(client, f"tx{index}".encode()) for index in range(20)]
+        receipts = await asyncio.gather(
+            *(tracker.track(tx_hash, broadcast_height=client.height) for tx_hash in hashes)
+        )
+        await tracker.close()
+        return client.calls, receipts
+
+    calls, receipts = asyncio.run(run())
+    assert all(receipt["included"] and receipt["code"] == 0 for receipt in receipts)
+    # one latest block query produced and revealed all 20 txs
+    assert calls["fetch_latest_block"] == 1
+    assert calls["fetch_tx"] == 20
+
+
+def test_idle_rounds_query_only_the_height():
+    async def run():
+        client = FakeAsyncClient()
+        tracker = TxConfirmationTracker(client, poll_interval=0.001, timeout=0.05)
+        # never broadcast, so never included
+        receipt = await tracker.track("AB" * 32, broadcast_height=client.height)
+        await tracker.close()
+        return client.calls, receipt
+
+    calls, receipt = asyncio.run(run())
+    assert receipt == {"tx_hash": "AB" * 32, "included": False}
+    # a lookup only for the final check at the timeout
+    assert calls["fetch_tx"] == 1
@@ -4,7 +4,10 @@ from database_engine.wallet_model import StorageEngine
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-from database_engine.utils.injective_utils import InjectiveTransaction
+from database_engine.utils.injective_utils import ENVIRONMENT, InjectiveTransaction
+from injective_functions.utils.agent_registry import AgentRegistry
+from injective_functions.utils.http_client import register_quart
+from injective_functions.utils.metadata_snapshot import warm_start
 
 load_dotenv()
 
@@ -24,7 +27,14 @@ app = cors(
     allow_origin=["*", "http://localhost:5173"],  # Explicitly allow your frontend origin
 
 )
-agents = {}
+register_quart(app)
+agents = AgentRegistry()
+
+
+@app.before_serving
+async def warm_metadata():
+    await warm_start(ENVIRONMENT)
+
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 
@@ -117,11 +127,11 @@ async def get_user_details(user_id):
         return jsonify({"ok": False, "message": "Error fetching user details", "error": str(e)}), 500
     
 
-async def get_or_create_agent(agent_id, private_key):
-    """Retrieve an existing agent or create a new one"""
-    if agent_id not in agents:
-        agents[agent_id] = await InjectiveTransaction.create(agent_id, private_key)
-    return agents[agent_id]
+def lease_agent(agent_id, private_key):
+    """Lease an existing agent or a new one, kept open until the lease is released"""
+    return agents.lease(
+        agent_id, lambda: InjectiveTransaction.create(agent_id, private_key)
+    )
 
 
 @app.route("/query_balances", methods=["POST"])
@@ -137,10 +147,9 @@ async def query_balances():
         decrypted_private_key = await storage_engine.get_decrypted_private_key(user_id)
 
         # Get or create the agent
-        agent = await get_or_create_agent(user_id, decrypted_private_key)
-
-        # Call the query_balances method
-        balance_response = await agent.query_balances()
+        async with lease_agent(user_id, decrypted_private_key) as agent:
+            # Call the query_balances method
+            balance_response = await agent.query_balances()
         parsed_balances = [
             {
                 "token": token,
@@ -162,6 +171,7 @@ async def transfer_funds():
         user_id = data.get("user_id")
         recipient = data.get("recipient")
         amount = data.get("amount")
+        wait_for_inclusion = bool(data.get("wait_for_inclusion", False))
 
         if not user_id  or not recipient or not amount:
             return jsonify({"error": "user_id, recipient, and amount are required"}), 400
@@ -169,10 +179,9 @@ async def transfer_funds():
         decrypted_private_key = await storage_engine.get_decrypted_private_key(user_id)
 
         # Get or create the agent
-        agent = await get_or_create_agent(user_id, decrypted_private_key)
-
-        # Call the transfer_funds method
-        result = await agent.transfer_funds(recipient, amount)
+        async with lease_agent(user_id, decrypted_private_key) as agent:
+            # Call the transfer_funds method
+            result = await agent.transfer_funds(recipient, amount, wait_for_inclusion)
         print(result)
         return jsonify(result), 200
     except Exception as e: